@@ -1,8 +1,9 @@
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 import streamlit as st
-import geopandas as gpd
-import pandas as pd
-import matplotlib.pyplot as plt
-import leafmap.foliumap as leafmap
+import streamlit.components.v1 as components
 
 # Set up 
 st.set_page_config(page_title='Dashboard', layout='wide')
@@ -10,119 +11,159 @@ st.title('Highway Dashboard')
 st.sidebar.title('About')
 st.sidebar.info('Explore Highway Statistics')
 
+# Shared dashboard modules live at the repository root, they load after the title and sidebar are drawn
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from dashboard import tiles, tracing
+from dashboard.boundary_store import read_boundary
+from dashboard.disk_cache import disk_cache
+from dashboard.pages import HIGHWAY_BASEMAPS, HIGHWAY_COLORS, HIGHWAY_UNITS, highway_chart, highway_lengths, highway_map
+from dashboard.prerender import highway_manifest, highway_version, stored_part
+from dashboard.road_layers import ROAD_CLASSES, district_roads, road_index
+from dashboard.road_lengths import district_lengths
+from dashboard.viewport import region_catalog
+
+# Stage timings and cache results of this rerun, on with DASHBOARD_TRACE=1 or ?debug=1 in the URL
+tracing.start_run('highway', enabled=tracing.is_on(st.query_params.get('debug')))
+# Vector tile endpoint of this server process, started once when the map runs in tile mode (DASHBOARD_TILES=1)
+@st.cache_resource
+def start_tile_server():
+    return tiles.start_tile_server()
+if tiles.TILES_ENABLED:
+    start_tile_server()
 
 data_url = 'https://github.com/spatialthoughts/python-dataviz-web/releases/download/osm/'
         
 gpkg_file = 'karnataka.gpkg'
-csv_file = 'highway_lengths_by_district.csv'
+poll_seconds = 10
 
-@st.cache_data
-def read_gdf(url, layer):
-    gdf = gpd.read_file(url, layer=layer)
+@tracing.traced_cache(st.cache_resource)
+def read_gdf(url, layer, version):
+    # Memory-mapped Arrow IPC copy of the layer, the GeoPackage is downloaded and converted again when it changes
+    # upstream. Shared as is, read only, copying it per rerun would lose the memory map
+    gdf = read_boundary(url, layer)
     return gdf
 
-@st.cache_data
-def read_csv(url):
-    df = pd.read_csv(url)
-    return df
+# NH and SH kilometres per district from the road geometry, computed again when either layer changes
+@disk_cache()
+def read_lengths(url, version):
+    return district_lengths(read_boundary(url, 'karnataka_highways'), read_boundary(url, 'karnataka_districts'),
+                            'DISTRICT')
+
+def in_background(func, *args):
+    executor = ThreadPoolExecutor(1)
+    future = executor.submit(func, *args)
+    executor.shutdown(wait=False)
+    return future
+
+# Lengths computed once per data version in the background, the first session is not kept waiting on the overlay
+@st.cache_resource
+def lengths_job(url, version):
+    return in_background(read_lengths, url, version)
+
+# Reruns the page once a background job has finished
+@st.fragment(run_every=poll_seconds)
+def watch_job(future):
+    if future.done():
+        st.rerun()
 
 gpkg_url = data_url + gpkg_file
-csv_url = data_url + csv_file
-districts_gdf = read_gdf(gpkg_url, 'karnataka_districts')
-roads_gdf = read_gdf(gpkg_url, 'karnataka_highways')
-lengths_df = read_csv(csv_url)
+# Changes whenever either layer is converted again, every result derived from them is cached on it
+version = highway_version(gpkg_url)
+districts_gdf = read_gdf(gpkg_url, 'karnataka_districts', version)
+lengths_future = lengths_job(gpkg_url, version)
+lengths_df = None
+if not lengths_future.done():
+    st.sidebar.info('**Computing highway lengths**')
+    watch_job(lengths_future)
+elif lengths_future.exception() is not None:
+    # Dropped, so the next rerun computes them again
+    traceback.print_exception(lengths_future.exception())
+    lengths_job.clear(gpkg_url, version)
+    st.sidebar.warning('Highway lengths could not be computed')
+else:
+    lengths_df = lengths_future.result()
+tracing.checkpoint('load')
 
 # # # Create chart in side bar # # #
 
-districts = lengths_df['DISTRICT'].values
+districts = districts_gdf['DISTRICT'].values
 district = st.sidebar.selectbox('Select a district', districts)
-basemap_selection = st.sidebar.selectbox('Select a basemap', ['CartoDB.DarkMatter', 'CartoDB.Positron', 'openstreetmap','ESRI'])
+basemap_selection = st.sidebar.selectbox('Select a basemap', HIGHWAY_BASEMAPS)
 overlay = st.sidebar.checkbox('Overlay roads')
-filtered = lengths_df[lengths_df['DISTRICT'] == district] 
 
 col1, col2, col3 = st.sidebar.columns(3)
 
-nh_color = col1.color_picker('Pick NH Color', '#2e6f40', key='nh')
-sh_color = col2.color_picker('Pick SH Color', '#609C9E', key='sh')
+nh_color = col1.color_picker('Pick NH Color', HIGHWAY_COLORS['NH'], key='nh')
+sh_color = col2.color_picker('Pick SH Color', HIGHWAY_COLORS['SH'], key='sh')
 unit = col3.radio(
     "Select a Unit",
-    ['km', 'mi']
+    list(HIGHWAY_UNITS)
 )
-
-conversion_factor = 0.621371
-def correct_unit(filtered_df,unit_df):
-    if unit_df == 'km':  
-        df_final = filtered_df 
-        return df_final
-    elif unit_df == 'mi':
-        df_final = filtered_df
-        df_final['NH'] = filtered_df['NH'] * conversion_factor
-        df_final['SH'] = filtered_df['SH'] * conversion_factor
-        return df_final
-df_final = correct_unit(filtered,unit)
-
-# Calculate the upper limit for the y-axis
-max_sh = df_final['SH'].max()  # Find the max value in the SH column
-upper_limit = max_sh + 250  
-rounded_upper_limit = round(upper_limit / 100) * 100 
-
-# Create plot
-fig, ax = plt.subplots(1, 1)
-
-df_final.plot(kind='bar', ax=ax, color=[nh_color, sh_color],
-    ylabel=unit, xlabel='Category')
-ax.set_title('Length of Highways')
-ax.set_ylim(0, rounded_upper_limit)
-ax.set_xticklabels([])
-stats = st.sidebar.pyplot(fig)
+colors = {'NH': nh_color, 'SH': sh_color}
+
+# Chart and map of every district pre-rendered once per data version, in the background so the first session
+# is not kept waiting. Served in the default colors, the map only outside tile mode.
+@st.cache_resource
+def prerendered(url, version, _lengths_df):
+    return in_background(highway_manifest, url, _lengths_df)
+artifacts = None
+if lengths_df is not None:
+    future = prerendered(gpkg_url, version, lengths_df)
+    if future.done() and future.exception() is not None:
+        # Dropped, so the next rerun pre-renders again, the page renders live meanwhile
+        traceback.print_exception(future.exception())
+        prerendered.clear(gpkg_url, version, lengths_df)
+    elif future.done() and colors == HIGHWAY_COLORS:
+        artifacts = future.result()
+
+# Create plot, repeat selections reuse the cached image
+@tracing.traced_cache(st.cache_data(max_entries=256))
+def render_chart(df_final, unit, nh_color, sh_color):
+    return highway_chart(df_final, unit, nh_color, sh_color)
+if lengths_df is not None:
+    df_final = highway_lengths(lengths_df, district, unit)
+    tracing.checkpoint('aggregate')
+    chart = stored_part(artifacts, 'highway_chart', unit, district)
+    if chart is None:
+        chart = render_chart(df_final, unit, nh_color, sh_color)
+    stats = st.sidebar.image(chart)
+    tracing.checkpoint('chart')
 
 
 
 ## Create the map
 
-map = leafmap.Map(
-    layers_control=True,
-    draw_control=False,
-    measure_control=False,
-    fullscreen_control=False)
-
-map.add_basemap(basemap_selection)
-map.add_gdf(
-    gdf=districts_gdf,
-    zoom_to_layer=False,
-    layer_name='districts',
-    info_mode='on_click',
-    style={'color': '#B2BEB5', 'fillOpacity': 0.3, 'weight': 0.5},
-    )
-
-# Filter to both road types and add to map if overlay is checked
-sh_gdf = roads_gdf[roads_gdf['ref'].str.startswith('SH')]
-nh_gdf = roads_gdf[roads_gdf['ref'].str.startswith('NH')]
-if overlay:
-    map.add_gdf(
-        gdf=nh_gdf,
-        zoom_to_layer=False,
-        layer_name='highways',
-        info_mode=None,
-        style={'color': nh_color, 'weight': 3},
-    )
-    map.add_gdf(
-        gdf=sh_gdf,
-        zoom_to_layer=False,
-        layer_name='highways',
-        info_mode=None,
-        style={'color': sh_color, 'weight': 2},
-    )
-    
-selected_gdf = districts_gdf[districts_gdf['DISTRICT'] == district]
-
-map.add_gdf(
-    gdf=selected_gdf,
-    layer_name='selected',
-    zoom_to_layer=True,
-    info_mode=None,
-    style={'color': 'black', 'fill': None, 'weight': 2.5}
- )
-
-
-map_streamlit = map.to_streamlit(800, 600)
\ No newline at end of file
+# Bounds of every district, the viewport the roads are cut to
+@tracing.traced_cache(st.cache_data)
+@disk_cache()
+def read_catalog(url, version):
+    return region_catalog(read_gdf(url, 'karnataka_districts', version), 'DISTRICT')
+
+# NH and SH roads split once and indexed by district, shared by every session
+@tracing.traced_cache(st.cache_resource)
+def read_road_index(url, version):
+    return road_index(read_gdf(url, 'karnataka_highways', version), read_catalog(url, version))
+
+# Roads around the selected district, clipped and simplified, cached per district
+@tracing.traced_cache(st.cache_data(max_entries=64))
+def read_district_roads(url, version, district):
+    roads_idx = read_road_index(url, version)
+    return {road_class: district_roads(roads_idx, read_catalog(url, version), district, road_class)
+            for road_class in ROAD_CLASSES}
+
+# Tile mode: districts and roads come from the tile endpoint, the browser fetches only the tiles in view
+stored = None if tiles.TILES_ENABLED else stored_part(artifacts, 'highway_map', basemap_selection, overlay,
+                                                        district)
+if stored is not None:
+    map_html = stored.decode()
+else:
+    roads = read_district_roads(gpkg_url, version, district) if overlay and not tiles.TILES_ENABLED else None
+    map_html = highway_map(districts_gdf, district, basemap_selection, overlay, roads, colors, tiles.TILES_ENABLED)
+tracing.checkpoint('map build')
+
+
+map_streamlit = components.html(tracing.record_html(map_html), width=800, height=600)
+tracing.checkpoint('html')
+
+# Debug panel in the sidebar when this rerun was traced
+tracing.debug_panel(st.sidebar, tracing.finish_run())
\ No newline at end of file
@@ -0,0 +1,64 @@
+# Load time and peak memory of the boundary files: GeoJSON parse against the GeoArrow store
+# Run from the repository root: python -m benchmarks.boundary_benchmark
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import geopandas as gpd
+from shapely import Point
+
+from dashboard.boundary_store import CANADA_BOUNDARIES, US_BOUNDARIES, convert
+
+SOURCES = [CANADA_BOUNDARIES, US_BOUNDARIES]
+REPEAT = 5
+
+# Each load runs in a fresh interpreter, RSS is sampled every millisecond while it runs.
+# Both readers first load a one-row file, so library start-up is not counted against either.
+LOAD = """
+import os, threading, time
+import geopandas as gpd
+from dashboard.boundary_store import read_boundary
+gpd.read_file({warm_geojson!r})
+read_boundary({warm_geojson!r}, store_dir={store_dir!r})
+page = os.sysconf('SC_PAGE_SIZE')
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * page
+samples, done = [rss()], threading.Event()
+def sample():
+    while not done.is_set():
+        samples.append(rss())
+        time.sleep(0.001)
+sampler = threading.Thread(target=sample)
+sampler.start()
+start = time.perf_counter()
+gdf = {call}
+elapsed = time.perf_counter() - start
+done.set()
+sampler.join()
+print(elapsed, (max(samples + [rss()]) - samples[0]) // 1024, len(gdf))
+"""
+
+
+def load(call, store_dir):
+    code = LOAD.format(call=call, store_dir=store_dir, warm_geojson=str(Path(store_dir) / 'warm.geojson'))
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    elapsed, peak_kb, rows = result.stdout.split()
+    return float(elapsed), int(peak_kb) / 1024, int(rows)
+
+
+if __name__ == '__main__':
+    store_dir = tempfile.mkdtemp()
+    gpd.GeoDataFrame({'name': ['warm']}, geometry=[Point(0, 0)], crs=4326).to_file(Path(store_dir) / 'warm.geojson')
+    for source in SOURCES:
+        convert(source, store_dir=store_dir)
+        for label, call in [
+            ('geojson', f'gpd.read_file({source!r})'),
+            ('geoarrow', f'read_boundary({source!r}, store_dir={store_dir!r})'),
+        ]:
+            runs = [load(call, store_dir) for _ in range(REPEAT)]
+            best = min(elapsed for elapsed, _, _ in runs)
+            peak = max(peak for _, peak, _ in runs)
+            print(f'{source.rsplit("/", 1)[-1]:<24} {label:<11} {best * 1000:7.1f} ms  peak +{peak:6.1f} MB  '
+                  f'{runs[0][2]} rows')
@@ -0,0 +1,73 @@
+# Rule-table classifier against the old row-wise apply code
+# Run from the repository root: python -m benchmarks.classify_benchmark
+import time
+
+import numpy as np
+import pandas as pd
+
+from dashboard.classify import US_SIZE_BOUNDS, US_STATUS_RULES, classify, size_class
+
+N_FIRES = 1_000_000
+
+
+def update_type(row):
+    if row['Type'] == 'Prescribed':
+        return 'Prescribed'
+    elif pd.isna(row['PercentContained']):
+        return 'Unknown Containment'
+    elif 0 < row['PercentContained'] < 100:
+        return 'Actively Containing'
+    elif row['PercentContained'] == 0:
+        return 'Uncontained'
+    else:
+        return row['Type']
+
+
+def get_marker_size(daily_acres):
+    if daily_acres < 1000:
+        return 6
+    elif daily_acres < 10000:
+        return 9
+    elif daily_acres < 50000:
+        return 14
+    elif daily_acres < 300000:
+        return 19
+    else:
+        return 24
+
+
+def synthetic_fires(n):
+    rng = np.random.default_rng(0)
+    percent = rng.choice([0, 25, 50, 100, np.nan], n)
+    return pd.DataFrame({
+        'IncidentTypeCategory': rng.choice(['WF', 'RX', 'CX'], n, p=[0.8, 0.15, 0.05]),
+        'PercentContained': percent,
+        'DailyAcres': rng.lognormal(5, 3, n),
+    })
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    df = synthetic_fires(N_FIRES)
+
+    def old_status():
+        old = df.copy()
+        old['Type'] = old['IncidentTypeCategory'].map({'WF': 'Contained', 'RX': 'Prescribed'})
+        return old.apply(update_type, axis=1)
+
+    old_type, old_type_time = timed(old_status)
+    new_type, new_type_time = timed(lambda: classify(df, US_STATUS_RULES))
+    assert (old_type.fillna('-').to_numpy(dtype=object) == new_type.astype(object).fillna('-').to_numpy()).all()
+
+    old_size, old_size_time = timed(lambda: df['DailyAcres'].apply(get_marker_size))
+    new_size, new_size_time = timed(lambda: size_class(df['DailyAcres'], US_SIZE_BOUNDS))
+    assert (old_size.to_numpy() == np.array([6, 9, 14, 19, 24])[new_size.cat.codes]).all()
+
+    print(f'{N_FIRES:,} fires')
+    print(f'status  apply {old_type_time:7.3f} s  rules {new_type_time:7.3f} s  {old_type_time / new_type_time:6.0f}x')
+    print(f'size    apply {old_size_time:7.3f} s  rules {new_size_time:7.3f} s  {old_size_time / new_size_time:6.0f}x')
@@ -0,0 +1,177 @@
+# Every stage of both dashboard branches on synthetic fire layers, compared with stored baselines
+# Run from the repository root: python -m benchmarks.end_to_end_benchmark [--sizes 100 10000 100000 1000000] [--save]
+# Baselines are machine specific, save new ones before comparing on another host.
+import argparse
+import json
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.synthetic import canada_frame, us_frame
+from dashboard.boundaries import boundary_levels, level_for_zoom, viewport_level
+from dashboard.boundary_store import read_boundary
+from dashboard.charts import area_bar_chart, figure_bytes
+from dashboard.classify import CANADA_STATUS_COLORS, US_STATUS_COLORS, status_colors
+from dashboard.cube import area_cube, region_areas
+from dashboard.fire_grid import build_grid, grid_cells
+from dashboard.map_parts import base_map, compose_map, layer_fragment, selection_fragment
+from dashboard.markers import clustered_fire_script, fire_layer_script, summary_script
+from dashboard.pipeline import SOURCES, read_snapshot, transform, write_snapshot
+from dashboard.spatial_index import fires_in_bbox, point_index
+from dashboard.viewport import region_catalog, region_summary, viewport_bbox
+
+BASELINES = Path(__file__).with_name('baselines.json')
+SIZES = [100, 10_000, 100_000]
+REPEAT = 3
+# Slowdown or growth over the baseline reported as a regression, values below the floors count as the floor
+TOLERANCE = 1.25
+FLOORS = {'seconds': 0.05, 'peak_mb': 1, 'output_bytes': 0}
+
+# What each branch of wildfireApp.py shows for one selected region
+BRANCHES = {
+    'canada': {
+        'frame': canada_frame,
+        'region': 'British Columbia',
+        'statuses': ['Being Held', 'Out of Control', 'Prescribed', 'Under Control'],
+        'colors': CANADA_STATUS_COLORS,
+        'unit': 'Hectares',
+        'basemap': 'CartoDB.Positron',
+    },
+    'us': {
+        'frame': us_frame,
+        'region': 'California',
+        'statuses': ['Contained', 'Actively Containing', 'Prescribed', 'Uncontained', 'Unknown Containment'],
+        'colors': US_STATUS_COLORS,
+        'unit': 'Acres',
+        'basemap': 'CartoDB.Positron',
+    },
+}
+
+
+def output_bytes(result):
+    if isinstance(result, (bytes, str)):
+        return len(result)
+    if hasattr(result, 'memory_usage'):
+        return int(result.memory_usage(deep=True).sum())
+    return len(pickle.dumps(result))
+
+
+def measure(func, repeat=REPEAT):
+    # Best wall time of a few runs, then one traced run for the peak of Python and numpy allocations
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {'seconds': min(seconds), 'peak_mb': peak / 2**20, 'output_bytes': output_bytes(result)}
+
+
+def branch_stages(name, raw, boundaries_gdf, levels, catalog):
+    # Stages in the order the app runs them, each fed by the one before
+    source, branch = SOURCES[name], BRANCHES[name]
+    region_col, status_col, area_col = source['region_col'], source['status_col'], source['area_col']
+    region = branch['region']
+    zoom = catalog[region]['zoom']
+    results = {}
+
+    fires, results['transform'] = measure(lambda: transform(raw, source, boundaries_gdf))
+
+    # The table each session reads back and the cache holds, its output bytes are the per-snapshot memory
+    snapshot = write_snapshot(fires, name, tempfile.mkdtemp())
+    fires, results['snapshot read'] = measure(lambda: read_snapshot(snapshot))
+    grid, results['grid'] = measure(lambda: build_grid(fires, area_col))
+
+    def aggregate():
+        cube = area_cube(fires, region_col, status_col, area_col, branch['statuses'])
+        return region_areas(cube, region)
+    area_final, results['aggregate'] = measure(aggregate)
+
+    def chart():
+        fig = area_bar_chart(
+            area_final[status_col].tolist(),
+            area_final['Area'].tolist(),
+            status_colors(area_final[status_col], branch['colors']).tolist(),
+            branch['unit'],
+            f'{branch["unit"]} of fire within {region}',
+            max(area_final['Area'].max() * 1.1, 100),
+        )
+        return figure_bytes(fig)
+    _, results['chart'] = measure(chart)
+
+    def map_build():
+        index = point_index(fires['x'], fires['y'], fires[region_col])
+        bbox = viewport_bbox(catalog, region)
+        inside = fires_in_bbox(index, bbox)
+        level = level_for_zoom(levels, zoom)
+        return (
+            viewport_level(levels, zoom, bbox, region_col),
+            layer_fragment(clustered_fire_script(fire_layer_script(fires.iloc[inside], area_col, branch['unit']),
+                                                 grid_cells(grid, bbox), branch['unit'])),
+            layer_fragment(summary_script(region_summary(index, inside, catalog))),
+            selection_fragment(level['gdf'][level['gdf'][region_col] == region], region_col,
+                               list(catalog[region]['centroid']), zoom),
+        )
+    (boundary_level, *fragments), results['map build'] = measure(map_build)
+
+    def html_serialize():
+        base_html, map_name = base_map(branch['basemap'], boundary_level, region_col)
+        return compose_map(base_html, map_name, *fragments)
+    _, results['html serialize'] = measure(html_serialize)
+    return results
+
+
+def run(sizes):
+    results = {}
+    for name in BRANCHES:
+        boundaries_gdf = read_boundary(SOURCES[name]['boundaries'])
+        region_col = SOURCES[name]['region_col']
+        levels = boundary_levels(boundaries_gdf, region_col)
+        catalog = region_catalog(boundaries_gdf, region_col)
+        for size in sizes:
+            raw = BRANCHES[name]['frame'](size, boundaries_gdf=boundaries_gdf)
+            for stage, metrics in branch_stages(name, raw, boundaries_gdf, levels, catalog).items():
+                results[f'{name}/{size}/{stage}'] = metrics
+    return results
+
+
+def compare(results, baselines, tolerance=TOLERANCE):
+    # One line per stage, ratios to the baseline, and the stages that grew past the tolerance
+    regressions = []
+    print(f'{"stage":<32} {"ms":>9} {"peak MB":>8} {"out KB":>9}   vs baseline (time, peak, bytes)')
+    for key, metrics in results.items():
+        line = (f'{key:<32} {metrics["seconds"] * 1000:9.1f} {metrics["peak_mb"]:8.1f} '
+                f'{metrics["output_bytes"] / 1024:9.1f}')
+        base = baselines.get(key)
+        if base:
+            ratios = [max(metrics[m], floor) / max(base[m], floor) if max(base[m], floor) else 1
+                      for m, floor in FLOORS.items()]
+            line += '   ' + '  '.join(f'{ratio:5.2f}x' for ratio in ratios)
+            if max(ratios) > tolerance:
+                regressions.append(key)
+                line += '  REGRESSION'
+        print(line)
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time every dashboard stage on synthetic fires.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--save', action='store_true', help='store these results as the new baselines')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.sizes)
+    baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    regressions = compare(results, baselines, args.tolerance)
+    if args.save:
+        BASELINES.write_text(json.dumps({**baselines, **results}, indent=2, sort_keys=True) + '\n')
+        print(f'baselines saved to {BASELINES}')
+    elif regressions:
+        sys.exit(1)
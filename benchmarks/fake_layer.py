@@ -0,0 +1,187 @@
+# Local stand-in for an ArcGIS portal and feature layer, serving a DataFrame of fires over HTTP.
+# Answers item lookups, layer metadata, id lists, object id pages and outStatistics queries.
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import numpy as np
+import pandas as pd
+
+MAX_RECORD_COUNT = 2000
+FIELD_TYPES = {'i': 'esriFieldTypeInteger', 'f': 'esriFieldTypeDouble', 'M': 'esriFieldTypeDate'}
+# The edit date filter of an incremental sync
+EDITED_SINCE = re.compile(r"^(\w+) >= timestamp '([^']+)'$")
+
+
+def layer_fields(frame):
+    fields = []
+    for name, dtype in frame.drop(columns=['x', 'y']).dtypes.items():
+        field_type = 'esriFieldTypeOID' if name == 'OBJECTID' else FIELD_TYPES.get(dtype.kind, 'esriFieldTypeString')
+        fields.append({'name': name, 'type': field_type})
+    return fields
+
+
+def attribute_records(frame):
+    # JSON-ready attributes, dates as epoch milliseconds and missing values as null
+    frame = frame.copy()
+    for name in frame.columns[frame.dtypes.map(lambda dtype: dtype.kind == 'M')]:
+        frame[name] = frame[name].astype('datetime64[ms]').astype('int64')
+    return frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+
+def statistics(frame, group_by, out_statistics):
+    # Grouped sum/count/min/max/avg like the server, null groups included
+    grouped = frame.groupby(group_by, dropna=False)
+    result = pd.DataFrame(index=grouped.size().index)
+    for stat in out_statistics:
+        column = grouped[stat['onStatisticField']]
+        result[stat['outStatisticFieldName']] = getattr(column, {'avg': 'mean'}.get(stat['statisticType'],
+                                                                                  stat['statisticType']))()
+    return attribute_records(result.reset_index())
+
+
+class FakeLayer:
+    """One fire layer behind a fake portal item, on a local port."""
+
+    def __init__(self, frame, item_id='fake', latency=0.02, max_record_count=MAX_RECORD_COUNT, edit_field=None,
+                 statistics_paging=True, field_case=None):
+        self.item_id = item_id
+        self.latency = latency
+        self.max_record_count = max_record_count
+        # Servers that cannot page statistics send the first page for every offset, some change the case of
+        # the field names they return, field_case is applied to them
+        self.statistics_paging = statistics_paging
+        self.field_case = field_case
+        # Date field of editor tracking, None for a layer without it
+        self.edit_field = edit_field
+        # Parameters of every query received, in order
+        self.queries = []
+        # Object id page requests still to answer with a 503, and how many were
+        self.failing_pages = 0
+        self.failed_pages = 0
+        self.lock = threading.Lock()
+        self.set_frame(frame)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+
+    def set_frame(self, frame):
+        # Replaces the features, as edits on the server would
+        self.frame = frame.set_index('OBJECTID', drop=False)
+        self.fields = layer_fields(frame)
+        self.statistics_cache = {}
+
+    @property
+    def properties(self):
+        properties = {'maxRecordCount': self.max_record_count, 'objectIdField': 'OBJECTID', 'fields': self.fields}
+        if self.edit_field is not None:
+            properties['editFieldsInfo'] = {'editDateField': self.edit_field}
+        return properties
+
+    @property
+    def feature_layer(self):
+        # What sync_layer reads of an arcgis FeatureLayer
+        return SimpleNamespace(url=self.url, properties=self.properties)
+
+    @property
+    def portal_url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/sharing/rest'
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/FeatureServer/0'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+    def matching(self, where):
+        # Features of the where clauses the dashboard sends: all, none for the schema, or edited since a time
+        if where in (None, '', '1=1'):
+            return self.frame
+        if where == '1=0':
+            return self.frame.iloc[:0]
+        since = EDITED_SINCE.match(where)
+        if since is None or since[1] not in self.frame.columns:
+            raise ValueError(f'Unable to perform query, invalid where clause: {where}')
+        return self.frame[self.frame[since[1]] >= pd.Timestamp(since[2])]
+
+    def fail_page(self, params):
+        with self.lock:
+            if 'objectIds' not in params or not self.failing_pages:
+                return False
+            self.failing_pages -= 1
+            self.failed_pages += 1
+            return True
+
+    def respond(self, path, params):
+        if path.startswith('/sharing/rest/content/items/'):
+            return {'id': self.item_id, 'url': self.url.rsplit('/', 1)[0]}
+        if path.endswith('/FeatureServer'):
+            return {'layers': [{'id': 0, 'name': 'Fires'}]}
+        if not path.endswith('/query'):
+            return self.properties
+        self.queries.append(params)
+        if params.get('returnIdsOnly') == 'true':
+            try:
+                ids = self.matching(params.get('where'))['OBJECTID'].tolist()
+            except ValueError as exc:
+                # Reported in the body of a 200 response, as ArcGIS does
+                return {'error': {'code': 400, 'message': str(exc)}}
+            return {'objectIdFieldName': 'OBJECTID', 'objectIds': ids}
+        if 'outStatistics' in params:
+            # The grouping is cached like a server's query cache, so only the round trip is measured
+            key = (params['groupByFieldsForStatistics'], params['outStatistics'])
+            if key not in self.statistics_cache:
+                self.statistics_cache[key] = statistics(self.frame, params['groupByFieldsForStatistics'].split(','),
+                                                        json.loads(params['outStatistics']))
+            rows = self.statistics_cache[key]
+            offset = int(params.get('resultOffset') or 0) if self.statistics_paging else 0
+            page = rows[offset:offset + self.max_record_count]
+            case = self.field_case or (lambda name: name)
+            return {'features': [{'attributes': {case(name): value for name, value in row.items()}} for row in page],
+                    'exceededTransferLimit': offset + len(page) < len(rows)}
+        ids = [int(i) for i in params.get('objectIds', '').split(',') if i]
+        out_fields = params.get('outFields', '*')
+        columns = [field['name'] for field in self.fields] if out_fields == '*' else out_fields.split(',')
+        rows = self.frame.loc[ids[:self.max_record_count]]
+        precision = int(params.get('geometryPrecision') or 8)
+        xs, ys = np.round(rows['x'].to_numpy(), precision).tolist(), np.round(rows['y'].to_numpy(), precision).tolist()
+        return {
+            'objectIdFieldName': 'OBJECTID',
+            'geometryType': 'esriGeometryPoint',
+            'spatialReference': {'wkid': 4326},
+            'fields': [field for field in self.fields if field['name'] in columns],
+            'features': [
+                {'attributes': attributes, 'geometry': {'x': x, 'y': y}}
+                for attributes, x, y in zip(attribute_records(rows[columns]), xs, ys)
+            ],
+        }
+
+    def handler(self):
+        layer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+                params = {k: v[0] for k, v in parse_qs(body).items()}
+                time.sleep(layer.latency)
+                if layer.fail_page(params):
+                    self.send_error(503)
+                    return
+                payload = json.dumps(layer.respond(self.path, params)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,30 @@
+# Throughput of the paged fetch engine against a local fake feature layer
+# Run from the repository root: python -m benchmarks.fetch_benchmark
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fake_layer import FakeLayer
+from dashboard.fetch import fetch_layer
+
+N_FEATURES = 20000
+MAX_RECORD_COUNT = 1000
+LATENCY = 0.05
+
+
+def fires(n):
+    oid = np.arange(1, n + 1)
+    return pd.DataFrame({'OBJECTID': oid, 'Hectares__Ha_': oid * 1.5, 'Agency': 'bc',
+                         'x': -120 + oid % 100 / 10, 'y': 50 + oid % 50 / 10})
+
+
+if __name__ == '__main__':
+    print(f'{N_FEATURES} features, {MAX_RECORD_COUNT} per page, {LATENCY * 1000:.0f} ms latency')
+    with FakeLayer(fires(N_FEATURES), latency=LATENCY, max_record_count=MAX_RECORD_COUNT) as layer:
+        for workers in [1, 2, 4, 8, 16]:
+            start = time.perf_counter()
+            sdf = fetch_layer(layer.url, workers=workers)
+            elapsed = time.perf_counter() - start
+            assert len(sdf) == N_FEATURES
+            print(f'workers={workers:>2}  {elapsed:6.2f} s  {len(sdf) / elapsed:8.0f} features/s')
@@ -0,0 +1,65 @@
+# Fire grid: full build against the incremental update after a sync that touched a share of the fires
+# Run from the repository root: python -m benchmarks.grid_benchmark
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import canada_frame
+from dashboard.boundary_store import read_boundary
+from dashboard.fire_grid import build_grid, grid_cells, update_grid
+from dashboard.pipeline import SOURCES, transform
+
+N_FIRES = [100_000, 1_000_000]
+# Share of fires edited, deleted and added by one sync
+CHANGED_SHARES = [0.001, 0.01, 0.1]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def synced(raw, share, rng):
+    # The layer after one sync: some fires grown and moved, some deleted, some new
+    n = int(len(raw) * share)
+    raw = raw.copy()
+    edited = rng.choice(len(raw), n, replace=False)
+    edited_ids = raw['OBJECTID'].iloc[edited]
+    raw.loc[edited, 'Hectares__Ha_'] = raw.loc[edited, 'Hectares__Ha_'].fillna(0) * 2 + 1
+    raw.loc[edited, 'x'] += rng.normal(0, 0.01, n)
+    deleted = raw['OBJECTID'].iloc[rng.choice(len(raw), n, replace=False)]
+    new = raw.iloc[rng.choice(len(raw), n, replace=False)].assign(OBJECTID=np.arange(len(raw), len(raw) + n) + 1)
+    raw = pd.concat([raw[~raw['OBJECTID'].isin(deleted)], new], ignore_index=True)
+    return raw, np.concatenate([edited_ids, deleted, new['OBJECTID']])
+
+
+if __name__ == '__main__':
+    source = SOURCES['canada']
+    area_col = source['area_col']
+    boundaries_gdf = read_boundary(source['boundaries'])
+    rng = np.random.default_rng(0)
+    for n in N_FIRES:
+        raw = canada_frame(n, boundaries_gdf=boundaries_gdf)
+        fires = transform(raw, source, boundaries_gdf)
+        grid, build_time = timed(lambda: build_grid(fires, area_col))
+        _, cells_time = timed(lambda: grid_cells(grid, (-140, 45, -110, 62)))
+        print(f'{n:>9,} fires  build {build_time * 1000:6.0f} ms  {len(grid):,} cells  '
+              f'viewport cells {cells_time * 1000:.1f} ms')
+        for share in CHANGED_SHARES:
+            new_raw, ids = synced(raw, share, rng)
+            new_fires = transform(new_raw, source, boundaries_gdf)
+
+            # What the pipeline does: the changed ids' old and new rows, then the update
+            def update():
+                removed = fires[fires['OBJECTID'].isin(ids)]
+                added = new_fires[new_fires['OBJECTID'].isin(ids)]
+                return update_grid(grid, removed, added, area_col)
+            updated, update_time = timed(update)
+            rebuilt, rebuild_time = timed(lambda: build_grid(new_fires, area_col))
+            merged = updated.merge(rebuilt, on=['zoom', 'tx', 'ty'], how='outer')
+            same = len(merged) == len(rebuilt) and np.allclose(merged['fires_x'], merged['fires_y']) and \
+                np.allclose(merged['area_x'], merged['area_y'], rtol=1e-4)
+            print(f'  {share:6.1%} changed  update {update_time * 1000:6.0f} ms  rebuild {rebuild_time * 1000:6.0f} ms  '
+                  f'{"same cells" if same else "CELLS DIFFER"}')
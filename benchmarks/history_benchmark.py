@@ -0,0 +1,81 @@
+# A month of daily snapshots appended to the fire history: append time, history size against keeping every
+# snapshot, and the window queries answered from the rollups.
+# Run from the repository root: python -m benchmarks.history_benchmark [--fires 1000000] [--days 30]
+# Fires are synthetic, each day some grow or change status, a few are new and a few removed.
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import canada_frame
+from dashboard import history
+from dashboard.boundary_store import read_boundary
+from dashboard.pipeline import SOURCES, transform
+
+# Share of fires whose area or status changes each day, and of fires added and removed
+CHANGED_SHARE = 0.01
+TURNOVER_SHARE = 0.001
+FIRST_DAY = pd.Timestamp('2025-07-01', tz='UTC')
+
+
+def next_day(fires, rng, next_id):
+    fires = fires.copy()
+    changed = rng.random(len(fires)) < CHANGED_SHARE
+    growth = rng.uniform(1, 3, changed.sum()).astype('float32')
+    fires.loc[changed, 'Hectares__Ha_'] = fires.loc[changed, 'Hectares__Ha_'] * growth
+    fires.loc[changed & (rng.random(len(fires)) < 0.3), 'Stage_of_Control'] = 'Under Control'
+    removed = rng.random(len(fires)) < TURNOVER_SHARE
+    new = fires.sample(int(len(fires) * TURNOVER_SHARE), random_state=rng.integers(1 << 31)).copy()
+    new['OBJECTID'] = np.arange(next_id, next_id + len(new))
+    return pd.concat([fires[~removed], new], ignore_index=True), next_id + len(new)
+
+
+def timed(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fire history appends, size and window queries.')
+    parser.add_argument('--fires', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=30)
+    args = parser.parse_args()
+
+    source = SOURCES['canada']
+    boundaries_gdf = read_boundary(source['boundaries'])
+    fires = transform(canada_frame(args.fires, boundaries_gdf=boundaries_gdf), source, boundaries_gdf)
+    rng, next_id = np.random.default_rng(0), int(fires['OBJECTID'].max()) + 1
+    history_dir, snapshot_dir = Path(tempfile.mkdtemp()), Path(tempfile.mkdtemp())
+
+    append_times, snapshot_bytes = [], 0
+    for day in range(args.days):
+        if day:
+            fires, next_id = next_day(fires, rng, next_id)
+        fires.to_parquet(snapshot_dir / f'{day}.parquet')
+        snapshot_bytes += (snapshot_dir / f'{day}.parquet').stat().st_size
+        rows, seconds = timed(lambda: history.append_snapshot('canada', fires, source, FIRST_DAY + pd.Timedelta(days=day),
+                                                              history_dir))
+        append_times.append(seconds)
+    end = FIRST_DAY + pd.Timedelta(days=args.days - 1)
+
+    delta_bytes = history.history_bytes('canada', history_dir)
+    print(f'{args.fires:,} fires, {args.days} daily snapshots')
+    print(f'  append       first {append_times[0] * 1000:6.0f} ms  then {np.mean(append_times[1:]) * 1000:6.0f} ms')
+    print(f'  storage      snapshots {snapshot_bytes / 2**20:7.1f} MB  history deltas {delta_bytes / 2**20:7.1f} MB')
+    _, started_time = timed(lambda: history.started_areas('canada', 7, end, history_dir), 20)
+    _, daily_time = timed(lambda: history.area_history('canada', 30, end, history_dir), 20)
+    print(f'  queries      started in last 7 days {started_time * 1000:5.1f} ms  daily areas of 30 days '
+          f'{daily_time * 1000:5.1f} ms')
+
+    # The state replayed from the deltas matches the last snapshot
+    state = history.read_table(history_dir / 'canada' / 'state.parquet')
+    rebuilt, rebuild_time = timed(lambda: history.rebuild('canada', history_dir))
+    rebuilt, state = (frame.sort_values('OBJECTID').reset_index(drop=True).astype({col: object for col in
+                      ['region', 'status', 'start']}) for frame in (rebuilt, state))
+    same = rebuilt.equals(state)
+    print(f'  rebuild      {rebuild_time * 1000:6.0f} ms  {"same state" if same else "STATE DIFFERS"}')
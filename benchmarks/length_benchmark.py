@@ -0,0 +1,57 @@
+# Highway kilometres per district and road class: a GeoPandas overlay measured geodesically, against
+# the chunked length engine on one worker and on a process pool.
+# Run from the repository root: python -m benchmarks.length_benchmark [--sizes 20000 100000 300000]
+# US states stand in for districts and random-walk roads for the highway layer, so it runs offline.
+import argparse
+import os
+import time
+
+import geopandas as gpd
+import numpy as np
+from pyproj import Geod
+
+from benchmarks.synthetic import road_frame
+from dashboard.boundary_store import US_BOUNDARIES, read_boundary
+from dashboard.road_layers import ROAD_CLASSES
+from dashboard.road_lengths import district_lengths, road_class_codes
+
+SIZES = [20_000, 100_000, 300_000]
+# Above this the overlay is skipped, it only gets slower
+OVERLAY_LIMIT = 100_000
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def overlay_lengths(roads_gdf, states_gdf):
+    # The plain way: every road cut by every state it meets, each piece measured on the ellipsoid
+    codes = road_class_codes(roads_gdf['ref'])
+    roads = roads_gdf[codes >= 0].assign(road_class=np.array(ROAD_CLASSES)[codes[codes >= 0]])
+    parts = gpd.overlay(roads[['road_class', 'geometry']], states_gdf[['State', 'geometry']], keep_geom_type=True)
+    geod = Geod(ellps='WGS84')
+    parts['km'] = [geod.geometry_length(geom) / 1000 for geom in parts.geometry]
+    table = parts.groupby(['State', 'road_class'])['km'].sum().unstack(fill_value=0)
+    return table.reindex(index=states_gdf['State'], columns=ROAD_CLASSES, fill_value=0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='District highway lengths, overlay against the length engine.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    states_gdf = read_boundary(US_BOUNDARIES)
+    for size in args.sizes:
+        roads_gdf = road_frame(size, states_gdf, 'State')
+        one, one_time = timed(lambda: district_lengths(roads_gdf, states_gdf, 'State', workers=1))
+        _, pool_time = timed(lambda: district_lengths(roads_gdf, states_gdf, 'State', workers=args.workers))
+        line = (f'{size:>9,} roads  engine 1 worker {one_time:7.2f} s  '
+                f'{args.workers} workers {pool_time:7.2f} s')
+        if size <= OVERLAY_LIMIT:
+            reference, overlay_time = timed(lambda: overlay_lengths(roads_gdf, states_gdf))
+            error = np.abs(one[ROAD_CLASSES].to_numpy() - reference.to_numpy()).sum() / reference.to_numpy().sum()
+            line += f'  overlay {overlay_time:7.2f} s  difference {error:.4%}'
+        print(line)
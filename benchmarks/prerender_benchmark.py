@@ -0,0 +1,98 @@
+# Pre-rendered pages: the pre-render after a first and a following snapshot, its storage, and a selection's
+# chart and map served from the parts against rendered in the request.
+# Run from the repository root: python -m benchmarks.prerender_benchmark [--source us] [--fires 100000] [--workers 4]
+# Fires are synthetic, the following snapshot changes the area of a share of them.
+import argparse
+import functools
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import canada_frame, us_frame
+from dashboard import prerender
+from dashboard.boundary_store import read_boundary
+from dashboard.cube import area_cube
+from dashboard.fire_grid import build_grid
+from dashboard.map_parts import compose_map
+from dashboard.pages import (
+    BASEMAPS, PAGES, base_part, fire_part, read_catalog, read_levels, region_chart, selected_part,
+)
+from dashboard.pipeline import SOURCES, transform, write_snapshot
+from dashboard.spatial_index import point_index
+
+FRAMES = {'canada': canada_frame, 'us': us_frame}
+
+
+def live_page(page, data, basemap, region, unit):
+    # Chart and map of one selection rendered from the snapshot, as a session does on its first view
+    chart = region_chart(page, data['cube'], region, unit)
+    base_html, map_name = base_part(page, data['levels'], data['catalog'], basemap, region)
+    fragments = fire_part(page, data['fires'], data['fires_idx'], data['grid'], data['catalog'], region)
+    selected = selected_part(page, data['levels'], data['catalog'], region)
+    return chart, compose_map(base_html, map_name, *fragments, selected)
+
+
+def stored_page(manifest, basemap, region, unit, artifact_dir):
+    read = functools.partial(prerender.read_object, artifact_dir=artifact_dir)
+    chart = prerender.stored_part(manifest, 'chart', unit, region, read=read)
+    base_html, map_name, fragments, selected = prerender.stored_map(manifest, basemap, region, read=read)
+    return chart, compose_map(base_html, map_name, *fragments, selected)
+
+
+def object_bytes(artifact_dir):
+    return sum(path.stat().st_size for path in (Path(artifact_dir) / 'objects').glob('*/*'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-rendered charts and maps against rendering per request.')
+    parser.add_argument('--source', choices=list(FRAMES), default='us')
+    parser.add_argument('--fires', type=int, default=100_000)
+    parser.add_argument('--changed', type=float, default=0.01, help='share of fires changed in the next snapshot')
+    parser.add_argument('--workers', type=int, default=prerender.MAX_WORKERS)
+    args = parser.parse_args()
+
+    name, page, source = args.source, PAGES[args.source], SOURCES[args.source]
+    snapshot_dir, artifact_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    boundaries_gdf = read_boundary(source['boundaries'])
+    fires = transform(FRAMES[name](args.fires, boundaries_gdf=boundaries_gdf), source, boundaries_gdf)
+    print(f'{name}: {args.fires:,} fires, {args.workers} workers')
+
+    first = write_snapshot(fires, name, snapshot_dir)
+    start = time.perf_counter()
+    manifest = prerender.prerender_fires(name, first, args.workers, artifact_dir)
+    print(f'  first snapshot       {time.perf_counter() - start:6.1f} s  {object_bytes(artifact_dir) / 2**20:6.1f} MB')
+
+    # The next snapshot: a share of the fires grow, in a few regions
+    rng = np.random.default_rng(0)
+    regions = rng.choice(fires[page['region_col']].unique(), 3, replace=False)
+    changed = fires[page['region_col']].isin(regions).to_numpy() & (rng.random(len(fires)) < args.changed * 10)
+    fires.loc[changed, page['area_col']] *= np.float32(2)
+    second = write_snapshot(fires, name, snapshot_dir)
+    start = time.perf_counter()
+    manifest = prerender.prerender_fires(name, second, args.workers, artifact_dir)
+    print(f'  next snapshot        {time.perf_counter() - start:6.1f} s  {object_bytes(artifact_dir) / 2**20:6.1f} MB  '
+          f'({changed.sum():,} fires changed in {len(regions)} regions)')
+
+    # A session's first view of each region, in the first unit and basemap
+    catalog = read_catalog(source['boundaries'], page['region_col'])
+    data = {
+        'fires': fires, 'catalog': catalog, 'levels': read_levels(source['boundaries'], page['region_col']),
+        'cube': area_cube(fires, page['region_col'], page['status_col'], page['area_col'], page['statuses']),
+        'fires_idx': point_index(fires['x'], fires['y'], fires[page['region_col']]),
+        'grid': build_grid(fires, page['area_col']),
+    }
+    unit, basemap = next(iter(page['units'])), BASEMAPS[0]
+    live, stored, same = [], [], 0
+    for region in catalog:
+        start = time.perf_counter()
+        live_chart, _ = live_page(page, data, basemap, region, unit)
+        live.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        stored_chart, _ = stored_page(manifest, basemap, region, unit, artifact_dir)
+        stored.append(time.perf_counter() - start)
+        same += live_chart == stored_chart
+    print(f'  selection, rendered  median {np.median(live) * 1000:8.1f} ms  max {max(live) * 1000:8.1f} ms')
+    print(f'  selection, stored    median {np.median(stored) * 1000:8.1f} ms  max {max(stored) * 1000:8.1f} ms  '
+          f'(same chart for {same} of {len(catalog)} regions)')
@@ -0,0 +1,50 @@
+# Road overlay for one district: the whole NH/SH layers filtered and serialized on every rerun, against
+# the road index built once and the district's roads clipped and simplified.
+# Run from the repository root: python -m benchmarks.road_benchmark [--sizes 10000 100000 300000]
+# US states stand in for districts and random-walk roads for the highway layer, so it runs offline.
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import road_frame
+from dashboard.boundary_store import US_BOUNDARIES, read_boundary
+from dashboard.road_layers import ROAD_CLASSES, district_roads, road_index
+from dashboard.viewport import region_catalog
+
+SIZES = [10_000, 100_000, 300_000]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def full_layers(roads_gdf):
+    # What the app did before: both classes cut from the whole layer and sent to the map whole
+    refs = roads_gdf['ref']
+    return sum(len(roads_gdf[refs.str.startswith(road_class, na=False)].to_json()) for road_class in ROAD_CLASSES)
+
+
+def clipped_layers(roads_idx, catalog, district):
+    return sum(len(district_roads(roads_idx, catalog, district, road_class).to_json()) for road_class in ROAD_CLASSES)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Road overlay per district, whole layers against the road index.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--districts', type=int, default=10, help='districts timed per size')
+    args = parser.parse_args()
+
+    states_gdf = read_boundary(US_BOUNDARIES)
+    catalog = region_catalog(states_gdf, 'State')
+    districts = list(catalog)[::max(len(catalog) // args.districts, 1)][:args.districts]
+    for size in args.sizes:
+        roads_gdf = road_frame(size, states_gdf, 'State')
+        full_bytes, full_time = timed(lambda: full_layers(roads_gdf))
+        roads_idx, index_time = timed(lambda: road_index(roads_gdf, catalog))
+        runs = [timed(lambda: clipped_layers(roads_idx, catalog, district)) for district in districts]
+        clip_bytes, clip_time = np.mean([b for b, _ in runs]), np.mean([t for _, t in runs])
+        print(f'{size:>9,} roads  whole layers {full_time * 1000:8.0f} ms {full_bytes / 2**20:7.1f} MB  '
+              f'index {index_time * 1000:6.0f} ms once  district {clip_time * 1000:6.0f} ms {clip_bytes / 2**20:6.2f} MB')
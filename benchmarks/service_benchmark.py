@@ -0,0 +1,87 @@
+# Sessions arriving together on a cold process: each publishing the layer itself against asking the data service.
+# Run from the repository root: python -m benchmarks.service_benchmark [--sessions 50] [--latency 3]
+# The upstream layer is a fixed delay per download, counted, so it runs offline.
+import argparse
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from dashboard.data_service import DataService
+
+
+class Upstream:
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def publish(self, name, snapshot_dir):
+        with self.lock:
+            self.calls += 1
+            version = self.calls
+        time.sleep(self.latency)
+        return f'{name}/{version}.v2.parquet'
+
+    def statistics(self, name):
+        time.sleep(self.latency / 10)
+        return None
+
+
+def sessions(count, target):
+    # Runs target in count threads released together, returns each one's seconds
+    barrier, seconds = threading.Barrier(count), [0.0] * count
+
+    def run(i):
+        barrier.wait()
+        start = time.perf_counter()
+        target()
+        seconds[i] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(seconds)
+
+
+def report(label, seconds, calls):
+    print(f'  {label:<28} median {np.median(seconds) * 1000:9.3f} ms  max {seconds.max() * 1000:9.3f} ms  '
+          f'upstream downloads {calls}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Concurrent cold sessions with and without the data service.')
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=3.0, help='seconds per upstream download')
+    args = parser.parse_args()
+    snapshot_dir = tempfile.mkdtemp()
+    print(f'{args.sessions} sessions, {args.latency:g} s upstream')
+
+    # Before: every session that finds no snapshot downloads and publishes one
+    upstream = Upstream(args.latency)
+    seconds = sessions(args.sessions, lambda: upstream.publish('canada', snapshot_dir))
+    report('publish in the session', seconds, upstream.calls)
+
+    # After: sessions read the service's record and ask for a refresh, one download serves them all
+    upstream = Upstream(args.latency)
+    service = DataService(['canada'], 600, snapshot_dir, upstream.publish, upstream.statistics, prerender=None)
+
+    def cold_session():
+        if service.current('canada')['snapshot'] is None:
+            service.request('canada')
+
+    seconds = sessions(args.sessions, cold_session)
+    service.start()
+    service.request('canada').result()
+    report('data service, cold', seconds, upstream.calls)
+
+    # A scheduled refresh in flight: sessions are served the previous snapshot meanwhile
+    refresh = service.request('canada')
+    seconds = sessions(args.sessions, lambda: service.current('canada')['snapshot'])
+    served = service.current('canada')['snapshot']
+    refresh.result()
+    report('data service, refreshing', seconds, upstream.calls)
+    print(f'  served during the refresh: {served}, after it: {service.current("canada")["snapshot"]}')
@@ -0,0 +1,37 @@
+# Point-in-polygon join and region/bbox queries on random fires over the real boundaries
+# Run from the repository root: python -m benchmarks.spatial_benchmark
+import time
+
+import geopandas as gpd
+import numpy as np
+
+from dashboard.spatial_index import fire_index, fires_in_bbox, fires_in_region, region_index
+
+BOUNDARIES = [('CanadaProvinces.geojson', 'Province'), ('US_States.json', 'State')]
+N_FIRES = [100_000, 1_000_000]
+N_QUERIES = 1000
+
+
+def timed(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+    for path, name_col in BOUNDARIES:
+        boundaries = gpd.read_file(path)
+        regions_idx, build_time = timed(lambda: region_index(boundaries, name_col))
+        minx, miny, maxx, maxy = boundaries.total_bounds
+        print(f'{path}: region index {build_time * 1000:.1f} ms')
+        for n in N_FIRES:
+            rng = np.random.default_rng(0)
+            x, y = rng.uniform(minx, maxx, n), rng.uniform(miny, maxy, n)
+            index, join_time = timed(lambda: fire_index(x, y, regions_idx))
+            region = boundaries[name_col].iloc[0]
+            _, region_time = timed(lambda: fires_in_region(index, region), N_QUERIES)
+            bbox = (minx + 5, miny + 5, minx + 7, miny + 7)
+            _, bbox_time = timed(lambda: fires_in_bbox(index, bbox), N_QUERIES)
+            print(f'  {n:>9,} fires  join {join_time * 1000:7.0f} ms  '
+                  f'region {region_time * 1e6:5.1f} us  bbox {bbox_time * 1e6:5.1f} us')
@@ -0,0 +1,72 @@
+# Import-time breakdown of the first run of each app, before any selection is made
+# Run from the repository root: python -m benchmarks.startup_benchmark
+# Without network access the wildfire app stops at the first layer download, after its imports
+import subprocess
+import sys
+
+# Each app and the modules its first run must not import
+APPS = {
+    'wildfireApp.py': ['leafmap', 'gssapi'],
+    'HighwayDashboard/app.py': ['leafmap', 'gssapi', 'arcgis'],
+    'WildFirePortfolio/app.py': ['arcgis', 'geopandas', 'matplotlib', 'leafmap', 'gssapi'],
+}
+# Modules no app may import before its first element is drawn, without arcgis there is no GIS() either
+FIRST_PAINT_UNWANTED = ['leafmap', 'gssapi', 'arcgis', 'geopandas', 'matplotlib']
+FIRST_PAINT = 'first paint'
+TOP_N = 15
+
+RUN_APP = """
+import sys
+import time
+from streamlit.delta_generator import DeltaGenerator
+from streamlit.testing.v1 import AppTest
+enqueue = DeltaGenerator._enqueue
+def first_paint(*args, **kwargs):
+    # Marks the imports done before the app's first element, then steps aside
+    DeltaGenerator._enqueue = enqueue
+    print({marker!r}, file=sys.stderr, flush=True)
+    return enqueue(*args, **kwargs)
+DeltaGenerator._enqueue = first_paint
+start = time.perf_counter()
+AppTest.from_file({path!r}).run(timeout=120)
+print(f'first run {{(time.perf_counter() - start) * 1000:.0f}} ms')
+"""
+
+
+def import_profile(path, env=None):
+    # Run the app once under -X importtime, keep every imported module, those imported before the first element
+    # was drawn and the cumulative time of the outermost ones
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', RUN_APP.format(path=path, marker=FIRST_PAINT)],
+        capture_output=True, text=True, check=True, env=env,
+    )
+    modules, first_paint, cumulative = set(), None, {}
+    for line in result.stderr.splitlines():
+        if line == FIRST_PAINT and first_paint is None:
+            first_paint = set(modules)
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        package = name.strip().split('.')[0]
+        modules.add(package)
+        if not name.startswith('  '):
+            cumulative[package] = cumulative.get(package, 0) + int(cumulative_us)
+    return result.stdout.strip(), modules, first_paint if first_paint is not None else modules, cumulative
+
+
+if __name__ == '__main__':
+    failed = False
+    for path, unwanted in APPS.items():
+        first_run, modules, first_paint, cumulative = import_profile(path)
+        print(f'{path}: {first_run}')
+        for package, us in sorted(cumulative.items(), key=lambda item: -item[1])[:TOP_N]:
+            print(f'  {package:<24} {us / 1000:8.1f} ms')
+        loaded = [module for module in unwanted if module in modules]
+        if loaded:
+            failed = True
+            print(f'  imported at startup: {", ".join(loaded)}')
+        loaded = [module for module in FIRST_PAINT_UNWANTED if module in first_paint]
+        if loaded:
+            failed = True
+            print(f'  imported before the first element: {", ".join(loaded)}')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,82 @@
+# Time to first chart: the layer's grouped sums against downloading and transforming every fire
+# Run from the repository root: python -m benchmarks.statistics_benchmark [--sizes 1000 10000 100000 1000000]
+# The fires are served by a local fake layer with a fixed round trip, so it runs offline.
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.end_to_end_benchmark import BRANCHES
+from benchmarks.fake_layer import FakeLayer
+from dashboard.boundary_store import read_boundary
+from dashboard.charts import area_bar_chart, figure_bytes
+from dashboard.classify import status_colors
+from dashboard.cube import area_cube, region_areas
+from dashboard.fetch import fetch_layer, item_layer_url
+from dashboard.pipeline import SOURCES, fetch_statistics, transform
+
+SIZES = [1000, 10_000, 100_000, 1_000_000]
+# Above this the full download is skipped, it only gets slower
+FULL_DOWNLOAD_LIMIT = 100_000
+
+
+def chart(cube, name):
+    branch, status_col = BRANCHES[name], SOURCES[name]['status_col']
+    area_final = region_areas(cube, branch['region'])
+    fig = area_bar_chart(
+        area_final[status_col].tolist(),
+        area_final['Area'].tolist(),
+        status_colors(area_final[status_col], branch['colors']).tolist(),
+        branch['unit'],
+        f'{branch["unit"]} of fire within {branch["region"]}',
+        max(area_final['Area'].max() * 1.1, 100),
+    )
+    return figure_bytes(fig)
+
+
+def statistics_path(name, layer):
+    # Layer lookup from the item id included, as the app does on its first run
+    source = SOURCES[name]
+    stats = fetch_statistics(source, item_layer_url(source['item_id'], layer.portal_url))
+    return area_cube(stats, source['region_col'], source['status_col'], source['area_col'],
+                     BRANCHES[name]['statuses'], count_col='fires')
+
+
+def download_path(name, layer, boundaries_gdf):
+    source = SOURCES[name]
+    fires = transform(fetch_layer(layer.url, out_fields=[*source['columns'], 'OBJECTID']), source, boundaries_gdf)
+    return area_cube(fires, source['region_col'], source['status_col'], source['area_col'],
+                     BRANCHES[name]['statuses'])
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def same_areas(cube, other, region):
+    # Fires are generated inside the region their code names, so both paths should agree
+    a, b = cube['regions'][region], other['regions'][region]
+    return list(a.iloc[:, 0]) == list(b.iloc[:, 0]) and np.allclose(a['Area'], b['Area'], rtol=1e-4)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time to first chart, statistics query against full download.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    args = parser.parse_args()
+
+    for name, branch in BRANCHES.items():
+        boundaries_gdf = read_boundary(SOURCES[name]['boundaries'])
+        for size in args.sizes:
+            with FakeLayer(branch['frame'](size, boundaries_gdf=boundaries_gdf), SOURCES[name]['item_id']) as layer:
+                # The first query fills the fake layer's grouping cache
+                statistics_path(name, layer)
+                stats_cube, stats_time = timed(lambda: statistics_path(name, layer))
+                _, chart_time = timed(lambda: chart(stats_cube, name))
+                line = f'{name:<7} {size:>9,} fires  statistics {(stats_time + chart_time) * 1000:7.0f} ms'
+                if size <= FULL_DOWNLOAD_LIMIT:
+                    full_cube, full_time = timed(lambda: download_path(name, layer, boundaries_gdf))
+                    match = 'same areas' if same_areas(stats_cube, full_cube, branch['region']) else 'AREAS DIFFER'
+                    line += f'  full download {(full_time + chart_time) * 1000:7.0f} ms  {match}'
+                print(line)
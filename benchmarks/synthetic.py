@@ -0,0 +1,101 @@
+# Fake fire feature-layer frames as the fetch returns them, the fields each branch requests plus x/y, from 100 to 1M fires.
+# Points fall inside the real boundaries, with region, codes and statuses that agree with each other.
+# Also a highway layer of random-walk roads for the road overlay.
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from dashboard.boundary_store import CANADA_BOUNDARIES, US_BOUNDARIES, read_boundary
+from dashboard.pipeline import AGENCY_TO_PROVINCE, ORIGIN_TO_STATE
+
+# Share of Canadian layer rows that are US fires, which the transform filters out
+CANADA_US_SHARE = 0.05
+START = pd.Timestamp('2025-05-01')
+SEASON_DAYS = 150
+
+
+def points_in(geom, n, rng):
+    # Rejection sampling inside the polygon's bounds, oversampled by how little of the box it covers
+    if n == 0:
+        return np.empty((0, 2))
+    shapely.prepare(geom)
+    minx, miny, maxx, maxy = geom.bounds
+    cover = geom.area / ((maxx - minx) * (maxy - miny))
+    found = []
+    while sum(len(xy) for xy in found) < n:
+        batch = int(n / cover * 1.2) + 16
+        x, y = rng.uniform(minx, maxx, batch), rng.uniform(miny, maxy, batch)
+        inside = shapely.contains_xy(geom, x, y)
+        found.append(np.column_stack([x[inside], y[inside]]))
+    return np.concatenate(found)[:n]
+
+
+def region_points(boundaries_gdf, name_col, names, n, rng):
+    # Regions drawn with probability by equal-area size, so large provinces and states get most fires
+    regions = boundaries_gdf[boundaries_gdf[name_col].isin(names)].reset_index(drop=True)
+    weights = regions.geometry.to_crs(6933).area.to_numpy()
+    picks = rng.choice(len(regions), size=n, p=weights / weights.sum())
+    xy = np.empty((n, 2))
+    for i, geom in enumerate(regions.geometry):
+        rows = np.flatnonzero(picks == i)
+        xy[rows] = points_in(geom, len(rows), rng)
+    return regions[name_col].to_numpy(dtype=object)[picks], xy
+
+
+def fire_sizes(n, rng, median):
+    # Most fires are small, a few run to hundreds of thousands
+    return np.round(rng.lognormal(np.log(median), 2.2, n), 1)
+
+
+def canada_frame(n, seed=0, boundaries_gdf=None):
+    rng = np.random.default_rng(seed)
+    boundaries_gdf = boundaries_gdf if boundaries_gdf is not None else read_boundary(CANADA_BOUNDARIES)
+    province_to_agency = {province: agency for agency, province in AGENCY_TO_PROVINCE.items()}
+    n_us = int(n * CANADA_US_SHARE)
+    provinces, xy = region_points(boundaries_gdf, 'Province', list(province_to_agency), n - n_us, rng)
+    agencies = np.concatenate([
+        pd.Series(provinces).map(province_to_agency).to_numpy(dtype=object),
+        rng.choice(['conus', 'ak'], n_us, p=[0.8, 0.2]),
+    ])
+    return pd.DataFrame({
+        'OBJECTID': np.arange(1, n + 1),
+        'Agency': agencies,
+        'Hectares__Ha_': np.where(rng.random(n) < 0.03, np.nan, fire_sizes(n, rng, 5)),
+        'Stage_of_Control': rng.choice(['OC', 'BH', 'UC', 'Pre'], n, p=[0.3, 0.2, 0.45, 0.05]),
+        'Start_Date': START + pd.to_timedelta(rng.integers(0, SEASON_DAYS, n), unit='D'),
+        'x': np.concatenate([xy[:, 0], rng.uniform(-124, -70, n_us)]),
+        'y': np.concatenate([xy[:, 1], rng.uniform(30, 48, n_us)]),
+    })
+
+
+def us_frame(n, seed=0, boundaries_gdf=None):
+    rng = np.random.default_rng(seed)
+    boundaries_gdf = boundaries_gdf if boundaries_gdf is not None else read_boundary(US_BOUNDARIES)
+    state_to_origin = {state: origin for origin, state in ORIGIN_TO_STATE.items()}
+    states, xy = region_points(boundaries_gdf, 'State', list(state_to_origin), n, rng)
+    contained = rng.choice(4, n, p=[0.2, 0.2, 0.4, 0.2])
+    percent = np.select([contained == 0, contained == 1, contained == 2], [np.nan, 0, rng.integers(1, 100, n)], 100)
+    return pd.DataFrame({
+        'OBJECTID': np.arange(1, n + 1),
+        'POOState': pd.Series(states).map(state_to_origin).to_numpy(dtype=object),
+        'IncidentTypeCategory': rng.choice(['WF', 'RX'], n, p=[0.85, 0.15]),
+        'PercentContained': percent,
+        'DailyAcres': np.where(rng.random(n) < 0.1, np.nan, fire_sizes(n, rng, 10)),
+        'FireDiscoveryDateTime': START + pd.to_timedelta(rng.integers(0, SEASON_DAYS * 24, n), unit='h'),
+        'x': xy[:, 0],
+        'y': xy[:, 1],
+    })
+
+
+def road_frame(n, boundaries_gdf, name_col, seed=0, vertices=40, step=0.01):
+    # Highway layer with n roads starting inside the regions, each a random walk of vertices points about
+    # step degrees apart. Refs as OSM tags them: a third NH, half SH, the rest other roads or untagged.
+    rng = np.random.default_rng(seed)
+    _, start = region_points(boundaries_gdf, name_col, boundaries_gdf[name_col], n, rng)
+    heading = rng.uniform(0, 2 * np.pi, (n, 1)) + np.cumsum(rng.normal(0, 0.3, (n, vertices)), axis=1)
+    coords = start[:, None, :] + np.cumsum(step * np.stack([np.cos(heading), np.sin(heading)], axis=2), axis=1)
+    refs = np.where(rng.random(n) < 0.35, 'NH', np.where(rng.random(n) < 0.75, 'SH', 'MDR')).astype(object)
+    refs = refs + rng.integers(1, 300, n).astype(str)
+    refs[rng.random(n) < 0.05] = None
+    return gpd.GeoDataFrame({'ref': refs}, geometry=shapely.linestrings(coords), crs=boundaries_gdf.crs)
@@ -0,0 +1,61 @@
+# Bytes and time of the tiles one map viewport needs, against the fire layer inlined into the page.
+# Run from the repository root: python -m benchmarks.tile_benchmark [--sizes 100000 1000000]
+# Fires are synthetic and written to a temporary snapshot and tile folder, so it runs offline.
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic import canada_frame
+from dashboard import tiles
+from dashboard.boundary_store import read_boundary
+from dashboard.markers import fire_layer_script
+from dashboard.pipeline import SOURCES, transform, write_snapshot
+from dashboard.viewport import MAP_SIZE
+
+SIZES = [100_000, 1_000_000]
+# Map centre (Alberta) and the zooms the viewport is measured at
+CENTRE = (-114.5, 55.0)
+ZOOMS = [3, 5, 7, 9]
+
+
+def viewport_tiles(lon, lat, zoom, map_size=MAP_SIZE):
+    # Tiles a map of map_size pixels centred on lon/lat shows at zoom
+    n = 2 ** zoom
+    x = (lon + 180) / 360 * n
+    y = (1 - np.log(np.tan(np.radians(lat)) + 1 / np.cos(np.radians(lat))) / np.pi) / 2 * n
+    half_x, half_y = map_size[0] / 512, map_size[1] / 512
+    return [(zoom, tx, ty) for tx in range(int(x - half_x), int(x + half_x) + 1)
+            for ty in range(max(int(y - half_y), 0), min(int(y + half_y), n - 1) + 1)]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Vector tiles per viewport against the inlined fire layer.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    args = parser.parse_args()
+
+    source = SOURCES['canada']
+    boundaries_gdf = read_boundary(source['boundaries'])
+    for size in args.sizes:
+        snapshot_dir, tile_dir = tempfile.mkdtemp(), Path(tempfile.mkdtemp())
+        tiles.SNAPSHOT_DIR = snapshot_dir
+        fires = transform(canada_frame(size, boundaries_gdf=boundaries_gdf), source, boundaries_gdf)
+        snapshot = write_snapshot(fires, 'canada', snapshot_dir)
+        inline, inline_time = timed(lambda: fire_layer_script(fires, source['area_col'], 'Hectares'))
+        print(f'{size:>9,} fires  inline fire layer {len(inline) / 2**20:7.1f} MB {inline_time * 1000:6.0f} ms')
+        for layer in ['canada', tiles.fire_layer('canada', snapshot)]:
+            tiles.layer_index(layer, tiles.layer_version(layer))
+            for zoom in ZOOMS:
+                needed = viewport_tiles(*CENTRE, zoom)
+                cut, cut_time = timed(lambda: [tiles.read_tile(layer, *tile, tile_dir) for tile in needed])
+                _, read_time = timed(lambda: [tiles.read_tile(layer, *tile, tile_dir) for tile in needed])
+                print(f'  {layer.split("/")[0]:<7} z{zoom}  {len(needed):2} tiles {sum(map(len, cut)) / 1024:7.0f} KB  '
+                      f'cut {cut_time * 1000:6.0f} ms  cached {read_time * 1000:5.1f} ms')
@@ -0,0 +1,42 @@
+import pandas as pd
+import topojson as tp
+from shapely import box
+
+# Detail levels for boundary layers: (highest zoom served, simplify tolerance in degrees, quantization)
+BOUNDARY_LEVELS = [
+    (4, 0.1, 1e4),
+    (6, 0.02, 1e5),
+    (18, 0.005, 1e5),
+]
+
+
+def boundary_levels(gdf, name_col):
+    # Simplify on the shared-arc topology so neighbouring regions keep matching borders
+    levels = []
+    for max_zoom, tolerance, quantization in BOUNDARY_LEVELS:
+        topology = tp.Topology(gdf[[name_col, 'geometry']], prequantize=quantization, toposimplify=tolerance)
+        levels.append({
+            'max_zoom': max_zoom,
+            'topology': topology.to_dict(),
+            'gdf': topology.to_gdf(),
+        })
+    return levels
+
+
+def level_for_zoom(levels, zoom):
+    for level in levels:
+        if zoom <= level['max_zoom']:
+            return level
+    return levels[-1]
+
+
+def viewport_level(levels, zoom, bbox, name_col):
+    # Regions reaching into the viewport at the zoom's detail, every other region at the coarsest level
+    detail = level_for_zoom(levels, zoom)
+    inside = detail['gdf'].intersects(box(*bbox))
+    inside_names = detail['gdf'].loc[inside, name_col]
+    coarse = levels[0]['gdf']
+    gdf = pd.concat([detail['gdf'][inside], coarse[~coarse[name_col].isin(inside_names)]], ignore_index=True)
+    quantization = {max_zoom: q for max_zoom, _, q in BOUNDARY_LEVELS}[detail['max_zoom']]
+    topology = tp.Topology(gdf[[name_col, 'geometry']], prequantize=quantization)
+    return {'max_zoom': detail['max_zoom'], 'topology': topology.to_dict(), 'gdf': gdf}
@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from urllib.request import Request, urlopen
+
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+from dashboard.disk_cache import CACHE_DIR
+
+# Boundary files shipped with the repository
+REPO_DIR = Path(__file__).resolve().parents[1]
+CANADA_BOUNDARIES = str(REPO_DIR / 'CanadaProvinces.geojson')
+US_BOUNDARIES = str(REPO_DIR / 'US_States.json')
+# District and highway layers of the highway dashboard, downloaded again when they change upstream
+KARNATAKA_GPKG = 'https://github.com/spatialthoughts/python-dataviz-web/releases/download/osm/karnataka.gpkg'
+
+# Uncompressed GeoArrow (Feather v2) copies of boundary files, override with DASHBOARD_BOUNDARY_DIR
+STORE_DIR = Path(os.environ.get('DASHBOARD_BOUNDARY_DIR', CACHE_DIR / 'boundaries'))
+# Seconds between checks of a remote source for a new version, override with DASHBOARD_REMOTE_CHECK_SECONDS
+REMOTE_CHECK_SECONDS = float(os.environ.get('DASHBOARD_REMOTE_CHECK_SECONDS', 24 * 60 * 60))
+
+
+def store_path(source, layer=None, store_dir=STORE_DIR):
+    stem = Path(str(source)).stem
+    return Path(store_dir) / (f'{stem}-{layer}.arrow' if layer else f'{stem}.arrow')
+
+
+def is_remote(source):
+    return str(source).startswith(('http://', 'https://'))
+
+
+def source_path(path):
+    # The remote source's validator the stored copy was converted from, and when it was last checked
+    return path.with_name(f'{path.name}.source.json')
+
+
+def remote_validator(url, timeout=30):
+    # ETag, else Last-Modified, of the remote file, None when the server sends neither
+    with urlopen(Request(url, method='HEAD'), timeout=timeout) as response:
+        return response.headers.get('ETag') or response.headers.get('Last-Modified')
+
+
+def write_source(path, validator):
+    write_json(source_path(path), {'validator': validator, 'checked': time.time()})
+
+
+def write_json(path, value):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+def read_source(path):
+    try:
+        return json.loads(source_path(path).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        # Converted before sources were recorded, checked at once
+        return {'validator': None, 'checked': 0}
+
+
+def remote_changed(source, path, check_seconds=REMOTE_CHECK_SECONDS):
+    # Checked at most once per check_seconds, a server that sends no validator is downloaded again each time
+    recorded = read_source(path)
+    if time.time() - recorded['checked'] < check_seconds:
+        return False
+    write_source(path, recorded['validator'])
+    try:
+        validator = remote_validator(str(source))
+    except OSError:
+        # Unreachable, the stored copy is kept until the next check
+        return False
+    return validator is None or validator != recorded['validator']
+
+
+def is_stale(source, path, check_seconds=REMOTE_CHECK_SECONDS):
+    # Local sources are converted again when edited, remote ones when their ETag or Last-Modified changes
+    if not path.exists():
+        return True
+    if is_remote(source):
+        return remote_changed(source, path, check_seconds)
+    source = Path(str(source))
+    return source.exists() and source.stat().st_mtime > path.stat().st_mtime
+
+
+def convert(source, layer=None, store_dir=STORE_DIR):
+    # One full parse of the original file, written uncompressed with WKB geometry so it can be memory-mapped as is
+    path = store_path(source, layer, store_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Asked before the download, so a file replaced meanwhile is converted again at the next check
+    validator = remote_validator(str(source)) if is_remote(source) else None
+    gdf = gpd.read_file(source, layer=layer) if layer else gpd.read_file(source)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(fd)
+    try:
+        gdf.to_feather(tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    if is_remote(source):
+        write_source(path, validator)
+    return path
+
+
+def crs_code(crs):
+    # Parsing PROJJSON takes ~25 ms a time, the authority code gives the same CRS in well under 1 ms
+    crs_id = (crs or {}).get('id')
+    return f"{crs_id['authority']}:{crs_id['code']}" if crs_id else crs
+
+
+def table_to_gdf(table):
+    # Only the geometry WKB is decoded into new objects, other columns convert straight from Arrow
+    geo = json.loads(table.schema.metadata[b'geo'])
+    geometry_col = geo['primary_column']
+    df = table.drop_columns([geometry_col]).to_pandas()
+    df[geometry_col] = shapely.from_wkb(table[geometry_col].to_numpy())
+    return gpd.GeoDataFrame(df, geometry=geometry_col, crs=crs_code(geo['columns'][geometry_col].get('crs')))
+
+
+def with_geometry(schema, columns):
+    geometry_col = json.loads(schema.metadata[b'geo'])['primary_column']
+    return columns if columns is None or geometry_col in columns else [*columns, geometry_col]
+
+
+def read_geoparquet(path, columns=None):
+    # Parquet pages are decoded into new buffers, memory mapping only saves the file read
+    columns = with_geometry(pq.read_schema(path), columns)
+    return table_to_gdf(pq.read_table(path, columns=columns, memory_map=True))
+
+
+def read_geoarrow(path, columns=None):
+    # Uncompressed Arrow IPC is used in place from the memory map, no copy of the file's buffers
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    columns = with_geometry(table.schema, columns)
+    return table_to_gdf(table if columns is None else table.select(columns))
+
+
+def stored(source, layer=None, store_dir=STORE_DIR):
+    # Path of the stored copy, converted first when missing or stale
+    path = store_path(source, layer, store_dir)
+    if is_stale(source, path):
+        try:
+            convert(source, layer, store_dir)
+        except Exception:
+            # A copy already stored is served until the source can be converted again
+            if not path.exists():
+                raise
+            traceback.print_exc()
+    return path
+
+
+def store_version(source, layer=None, store_dir=STORE_DIR):
+    # Changes whenever the stored copy is converted again, so results derived from a layer can be cached on it.
+    # A remote source is converted again when it changes upstream, so the version follows it too.
+    stat = stored(source, layer, store_dir).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_boundary(source, layer=None, columns=None, store_dir=STORE_DIR):
+    return read_geoarrow(stored(source, layer, store_dir), columns)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert boundary files to the GeoArrow boundary store.')
+    parser.add_argument('sources', nargs='*', default=[CANADA_BOUNDARIES, US_BOUNDARIES],
+                        help='files or URLs, the repository boundary files by default')
+    parser.add_argument('--layer', help='layer to convert from a multi-layer source such as a GeoPackage')
+    parser.add_argument('--store-dir', type=Path, default=STORE_DIR)
+    args = parser.parse_args(argv)
+    for source in args.sources:
+        print(f'{source}: {convert(source, args.layer, args.store_dir)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import io
+
+import matplotlib
+from matplotlib.figure import Figure
+
+# Figures are built without pyplot so nothing is kept in its global figure registry
+
+
+def figure_bytes(fig, fmt='png'):
+    # Render to PNG/SVG bytes and release the figure's artists straight away
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format=fmt)
+    finally:
+        fig.clear()
+    return buffer.getvalue()
+
+
+def area_bar_chart(statuses, areas, colors, unit, title, upper_limit, rotate_ticks=False, bold_labels=False,
+                   clip_labels=False):
+    # Bar per control stage, labelled with its area
+    fig = Figure(dpi=100)
+    ax = fig.subplots(1, 1)
+    bars = ax.bar(statuses, areas, color=colors)
+
+    label_style = {'fontsize': 14, 'fontweight': 'bold'} if bold_labels else {}
+    if rotate_ticks:
+        for label in ax.get_xticklabels():
+            label.set_rotation(15)
+            label.set_ha('right')
+    ax.set_ylabel(f'Area ({unit})', **label_style)
+    ax.set_xlabel('Control Stage', **label_style)
+    ax.set_title(title)
+    ax.set_ylim(0, upper_limit)
+
+    ax.yaxis.set_major_formatter(matplotlib.ticker.StrMethodFormatter("{x:,.0f}"))
+
+    for bar, area in zip(bars, areas):
+        text_y = bar.get_height() + 0.02 * upper_limit
+        if clip_labels:
+            text_y = min(text_y, upper_limit)
+        ax.text(
+            bar.get_x() + bar.get_width() / 2,
+            text_y,
+            f'{area:,.0f} {unit}',
+            ha='center',
+            va='bottom',
+            fontsize=10
+        )
+    fig.tight_layout()
+    return fig
+
+
+def highway_bar_chart(df, nh_color, sh_color, unit, upper_limit):
+    fig = Figure()
+    ax = fig.subplots(1, 1)
+    df.plot(kind='bar', ax=ax, color=[nh_color, sh_color],
+        ylabel=unit, xlabel='Category')
+    ax.set_title('Length of Highways')
+    ax.set_ylim(0, upper_limit)
+    ax.set_xticklabels([])
+    return fig
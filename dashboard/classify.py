@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# Tests a rule can run against a column
+TESTS = {
+    'eq': lambda s, v: s == v,
+    'isna': lambda s, v: s.isna(),
+    'between': lambda s, v: (s > v[0]) & (s < v[1]),
+}
+
+# Status rules as (category, column, test, value), first match wins and no match is missing
+CANADA_STATUS_RULES = [
+    ('Being Held', 'Stage_of_Control', 'eq', 'BH'),
+    ('Out of Control', 'Stage_of_Control', 'eq', 'OC'),
+    ('Under Control', 'Stage_of_Control', 'eq', 'UC'),
+    ('Prescribed', 'Stage_of_Control', 'eq', 'Pre'),
+]
+US_STATUS_RULES = [
+    ('Prescribed', 'IncidentTypeCategory', 'eq', 'RX'),
+    ('Unknown Containment', 'PercentContained', 'isna', None),
+    ('Actively Containing', 'PercentContained', 'between', (0, 100)),
+    ('Uncontained', 'PercentContained', 'eq', 0),
+    ('Contained', 'IncidentTypeCategory', 'eq', 'WF'),
+]
+
+# Upper bounds of the marker size classes, hectares for Canada and acres for the US
+CANADA_SIZE_BOUNDS = [5000, 80000, 250000, 450000]
+US_SIZE_BOUNDS = [1000, 10000, 50000, 300000]
+
+# Chart colour of each status
+CANADA_STATUS_COLORS = {
+    "Being Held": "orange",
+    "Out of Control": "red",
+    "Under Control": "green",
+    "Prescribed": "yellow"
+}
+US_STATUS_COLORS = {
+    "Actively Containing": "orange",
+    "Uncontained": "red",
+    "Contained": "green",
+    "Prescribed": "#CCCC00",
+    "Unknown Containment": "gray"
+}
+
+
+def classify(df, rules):
+    # Every rule is one vectorized test over the whole column, nullable missing values never match
+    conditions = [
+        pd.Series(TESTS[test](df[column], value)).fillna(False).to_numpy(dtype=bool)
+        for _, column, test, value in rules
+    ]
+    categories = list(dict.fromkeys(category for category, *_ in rules))
+    codes = np.select(conditions, [categories.index(category) for category, *_ in rules], default=-1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=df.index)
+
+
+def size_class(values, bounds):
+    values = pd.Series(values)
+    codes = np.digitize(values.fillna(0).to_numpy(dtype=float), bounds)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=range(len(bounds) + 1)), index=values.index)
+
+
+def status_colors(statuses, colors):
+    return pd.Series(statuses).map(colors)
@@ -0,0 +1,28 @@
+import pandas as pd
+
+
+def area_cube(df, region_col, status_col, area_col, statuses, count_col=None):
+    # Region x status table of summed area and fire count, in the chart's status order.
+    # Rows are single fires, or groups already summed by the server with their fire count in count_col.
+    # Statuses missing from the whole snapshot are left out, missing per region are 0.
+    grouped = df.groupby([region_col, status_col], observed=True)
+    area = grouped[area_col].sum().unstack(fill_value=0)
+    fires = (grouped[count_col].sum() if count_col else grouped.size()).unstack(fill_value=0)
+    present = [status for status in statuses if status in area.columns]
+    regions = {
+        region: pd.DataFrame({
+            status_col: present,
+            'Area': area.loc[region, present].to_numpy(dtype=float),
+            'Fires': fires.loc[region, present].to_numpy(dtype=int),
+        })
+        for region in area.index
+    }
+    return {'status_col': status_col, 'regions': regions}
+
+
+def region_areas(cube, region, factor=1):
+    # Area per status for one region, with the unit factor applied at display time
+    table = cube['regions'].get(region)
+    if table is None:
+        return pd.DataFrame(columns=[cube['status_col'], 'Area'])
+    return pd.DataFrame({cube['status_col']: table[cube['status_col']], 'Area': table['Area'] * factor})
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+from dashboard.pipeline import SNAPSHOT_DIR, SOURCES, fetch_statistics, latest_snapshot, publish
+from dashboard.prerender import prerender_fires, read_manifest
+
+# Seconds between refreshes of a fire layer, override with DASHBOARD_REFRESH_SECONDS, and before a failed one is retried
+REFRESH_SECONDS = float(os.environ.get('DASHBOARD_REFRESH_SECONDS', 600))
+RETRY_SECONDS = 60
+
+
+def layer_statistics(name):
+    return fetch_statistics(SOURCES[name])
+
+
+def error_text(exc):
+    return f'{type(exc).__name__}: {exc}'
+
+
+# Fire layers of one server process, refreshed by a single daemon thread. Sessions read the layer's current
+# record, a dict the thread replaces whole and never changes, so a refresh serves the previous record until the
+# next is ready. Requests for a layer that is already being refreshed share the one refresh.
+# Each published snapshot's pages are pre-rendered by a second thread, so no refresh waits on a render,
+# prerender=None leaves them to the sessions.
+class DataService:
+    def __init__(self, names=tuple(SOURCES), interval=REFRESH_SECONDS, snapshot_dir=SNAPSHOT_DIR,
+                 publish=publish, statistics=layer_statistics, prerender=prerender_fires):
+        self.interval = interval
+        self.snapshot_dir = snapshot_dir
+        self._publish = publish
+        self._statistics = statistics
+        self._prerender = prerender
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._render_wake = threading.Event()
+        self._inflight = {}
+        self._queue = []
+        self._records, self._due, self._unrendered = {}, {}, []
+        for name in names:
+            # A snapshot published before this process started is served at once and refreshed when it is due,
+            # with the pages pre-rendered for it if any process has
+            snapshot = latest_snapshot(name, snapshot_dir)
+            refreshed = snapshot.stat().st_mtime if snapshot is not None else None
+            artifacts = read_manifest(name, snapshot.name) if snapshot is not None and prerender else None
+            self._records[name] = {'snapshot': snapshot, 'statistics': None, 'refreshed': refreshed,
+                                   'artifacts': artifacts, 'error': None}
+            self._due[name] = refreshed + interval if snapshot is not None else 0
+            if snapshot is not None and prerender and artifacts is None:
+                self._unrendered.append(name)
+                self._render_wake.set()
+        self._thread = threading.Thread(target=self._run, name='dashboard-data', daemon=True)
+        self._render_thread = threading.Thread(target=self._render_pages, name='dashboard-prerender', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        if self._prerender:
+            self._render_thread.start()
+        return self
+
+    def current(self, name):
+        # The layer's record: snapshot path, or the server's area sums while the first snapshot downloads,
+        # when it was refreshed, the manifest of its pre-rendered pages and the last refresh's error. Never waits.
+        return self._records[name]
+
+    def request(self, name):
+        # Asks for a refresh now, returns its future, the one already in flight if there is one
+        with self._lock:
+            future = self._inflight.get(name)
+            if future is None:
+                future = self._inflight[name] = Future()
+                self._queue.append(name)
+                self._wake.set()
+        return future
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            now = time.time()
+            for name, due in self._due.items():
+                if due <= now:
+                    self.request(name)
+            with self._lock:
+                names, self._queue = self._queue, []
+            for name in names:
+                self._refresh(name)
+            if not self._queue:
+                self._wake.wait(max(min(self._due.values()) - time.time(), 0))
+
+    def _render_pages(self):
+        while True:
+            self._render_wake.wait()
+            self._render_wake.clear()
+            while True:
+                with self._lock:
+                    if not self._unrendered:
+                        break
+                    name = self._unrendered.pop(0)
+                self._render(name)
+
+    def _refresh(self, name):
+        record = self._records[name]
+        if record['snapshot'] is None and record['statistics'] is None:
+            # First load: the server's sums take a round trip, the chart shows them while the fires download
+            try:
+                statistics, error = self._statistics(name), None
+            except Exception as exc:
+                # The fires are downloaded all the same, the chart waits for them instead
+                statistics, error = None, error_text(exc)
+            with self._lock:
+                self._records[name] = {**self._records[name], 'statistics': statistics, 'error': error}
+        try:
+            snapshot = self._publish(name, self.snapshot_dir)
+            error = None
+            self._due[name] = time.time() + self.interval
+        except Exception as exc:
+            error = error_text(exc)
+            self._due[name] = time.time() + RETRY_SECONDS
+        with self._lock:
+            if error is None:
+                record = {'snapshot': snapshot, 'statistics': None, 'refreshed': time.time(), 'artifacts': None,
+                          'error': None}
+                # Only a new snapshot is queued, a failed refresh leaves the one it kept as it was
+                if self._prerender and name not in self._unrendered:
+                    self._unrendered.append(name)
+                    self._render_wake.set()
+            else:
+                # The stale record stays, with the error for the page to show
+                record = {**self._records[name], 'error': error}
+            self._records[name] = record
+            future = self._inflight.pop(name)
+        future.set_result(record)
+
+    def _render(self, name):
+        # Pre-renders the pages of the layer's current snapshot, sessions render them live until the manifest is in
+        record = self._records[name]
+        if record['snapshot'] is None or record['artifacts'] is not None:
+            return
+        try:
+            artifacts = self._prerender(name, record['snapshot'])
+        except Exception:
+            # Not the layer's error, its pages are still rendered live
+            traceback.print_exc()
+            return
+        with self._lock:
+            # A refresh that published meanwhile has queued its own snapshot, this one's pages are not its
+            if self._records[name] is record:
+                self._records[name] = {**record, 'artifacts': artifacts}
@@ -0,0 +1,77 @@
+import pandas as pd
+
+from dashboard.disk_cache import CACHE_DIR, read_entry, write_entry
+from dashboard.fetch import fetch_layer, query_ids
+
+# Local materialized copies of synced feature layers
+SYNC_DIR = CACHE_DIR / 'sync'
+
+
+def layer_fields(feature_layer):
+    # Object id field and, when editor tracking is on, the last edit date field
+    props = feature_layer.properties
+    oid_field = props.get('objectIdField') or 'OBJECTID'
+    edit_info = props.get('editFieldsInfo') or {}
+    return oid_field, edit_info.get('editDateField')
+
+
+def sync_fields(out_fields, oid_field, edit_field):
+    # The id and edit date fields are always needed to merge changes, whatever the caller uses
+    if out_fields == '*':
+        return out_fields
+    return list(dict.fromkeys([*out_fields, oid_field, *([edit_field] if edit_field else [])]))
+
+
+def full_query(feature_layer, edit_field, out_fields='*'):
+    sdf = fetch_layer(feature_layer.url, out_fields=out_fields)
+    return sdf, watermark(sdf, edit_field, None)
+
+
+def watermark(sdf, edit_field, previous):
+    if edit_field is None or edit_field not in sdf.columns or sdf[edit_field].dropna().empty:
+        return previous
+    latest = pd.to_datetime(sdf[edit_field]).max()
+    return latest if previous is None else max(latest, previous)
+
+
+def merge_changes(copy_sdf, changed_sdf, current_ids, oid_field):
+    # Deletes: drop ids the server no longer has. Inserts/updates: changed rows replace the copy's rows
+    kept = copy_sdf[copy_sdf[oid_field].isin(current_ids)]
+    if changed_sdf.empty:
+        return kept.reset_index(drop=True)
+    kept = kept[~kept[oid_field].isin(changed_sdf[oid_field])]
+    return pd.concat([kept, changed_sdf[copy_sdf.columns]], ignore_index=True)
+
+
+def sync_layer(feature_layer, name, out_fields='*'):
+    # The layer's rows, and what changed: every sync has a version, and an incremental one names the
+    # version it started from and the object ids it touched, so derived data can be updated the same way
+    path = SYNC_DIR / f'{name}.pkl'
+    SYNC_DIR.mkdir(parents=True, exist_ok=True)
+    oid_field, edit_field = layer_fields(feature_layer)
+    fields = sync_fields(out_fields, oid_field, edit_field)
+    state = read_entry(path, None)
+    version = (state or {}).get('version', 0) + 1
+
+    # A copy synced with other fields cannot take the changed rows, it is replaced by a full query
+    full = state is None or edit_field is None or state['watermark'] is None or state.get('fields') != fields
+    if not full:
+        # Only features edited since the last sync, plus the id list to catch deletes
+        since = state['watermark'].strftime('%Y-%m-%d %H:%M:%S')
+        changed = fetch_layer(feature_layer.url, where=f"{edit_field} >= timestamp '{since}'", out_fields=fields)
+        # Nor can it when a field was added or dropped on the server since
+        full = set(changed.columns) != set(state['sdf'].columns)
+    if full:
+        sdf, mark = full_query(feature_layer, edit_field, fields)
+        changes = {'version': version, 'base': None, 'ids': None}
+    else:
+        current_ids = query_ids(feature_layer.url)
+        sdf = merge_changes(state['sdf'], changed, current_ids, oid_field)
+        mark = watermark(changed, edit_field, state['watermark'])
+        copy_ids = state['sdf'][oid_field]
+        deleted = copy_ids[~copy_ids.isin(current_ids)]
+        changes = {'version': version, 'base': state.get('version'),
+                   'ids': pd.concat([changed[oid_field], deleted]).unique()}
+
+    write_entry(path, {'sdf': sdf, 'watermark': mark, 'fields': fields, 'version': version})
+    return sdf, changes
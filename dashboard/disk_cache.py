@@ -0,0 +1,100 @@
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+# Shared by every server process on the host, override with DASHBOARD_CACHE_DIR
+CACHE_DIR = Path(os.environ.get('DASHBOARD_CACHE_DIR', Path.home() / '.cache' / 'dashboard'))
+MAX_CACHE_BYTES = int(os.environ.get('DASHBOARD_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+# Returned by read_entry for a miss, so a function that returns None is cached too
+MISS = object()
+
+
+# Arguments are keyed by their repr, which is whole only for scalars: a DataFrame's or an array's is cut short,
+# so different inputs would share an entry
+KEY_TYPES = (str, int, float, type(None))
+
+
+def check_key(value):
+    if isinstance(value, tuple):
+        for item in value:
+            check_key(item)
+    elif not isinstance(value, KEY_TYPES):
+        raise TypeError(f'disk_cache cannot key an argument of type {type(value).__name__}, '
+                        'only str, int, float, None and tuples of them')
+
+
+def cache_key(func, args, kwargs):
+    check_key((*args, *kwargs.values()))
+    name = f'{func.__module__}.{func.__qualname__}'
+    return hashlib.sha256(repr((name, args, sorted(kwargs.items()))).encode()).hexdigest()
+
+
+def read_entry(path, ttl, default=None):
+    # The file mtime is the write time (TTL) and the atime is the last read (LRU)
+    try:
+        stat = path.stat()
+        if ttl is not None and time.time() - stat.st_mtime > ttl:
+            return default
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+        os.utime(path, (time.time(), stat.st_mtime))
+    except FileNotFoundError:
+        return default
+    except Exception:
+        # Truncated, or pickled by code that has changed since: recomputed, and the entry dropped
+        path.unlink(missing_ok=True)
+        return default
+    return value
+
+
+def write_entry(path, value):
+    # Write to a temp file in the same directory and rename, so readers never see a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def evict(cache_dir, max_bytes):
+    # Drop least recently read entries until the cache fits, other processes may delete the same files
+    entries = []
+    for path in cache_dir.glob('*.pkl'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_atime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def disk_cache(ttl=None, max_bytes=MAX_CACHE_BYTES, cache_dir=CACHE_DIR):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            directory = Path(cache_dir)
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f'{cache_key(func, args, kwargs)}.pkl'
+            value = read_entry(path, ttl, MISS)
+            if value is MISS:
+                value = func(*args, **kwargs)
+                write_entry(path, value)
+                evict(directory, max_bytes)
+            return value
+        return wrapper
+    return decorator
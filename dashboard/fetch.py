@@ -0,0 +1,123 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+
+# Concurrent page requests per layer and attempts per page
+MAX_WORKERS = 8
+RETRIES = 3
+# Decimal places of the returned coordinates, 5 is about a metre
+GEOMETRY_PRECISION = 5
+# Portal that resolves item ids to service URLs, override with DASHBOARD_PORTAL_URL
+PORTAL_URL = os.environ.get('DASHBOARD_PORTAL_URL', 'https://www.arcgis.com/sharing/rest')
+
+
+def post_json(url, params, retries=RETRIES, backoff=0.5, timeout=60):
+    # POST so long objectIds lists never hit URL length limits, retrying with exponential backoff
+    data = urlencode({**params, 'f': 'json'}).encode()
+    for attempt in range(retries + 1):
+        try:
+            with urlopen(url, data=data, timeout=timeout) as response:
+                result = json.load(response)
+            # ArcGIS reports query errors in the body of a 200 response
+            if 'error' in result:
+                raise OSError(f"Query failed: {result['error'].get('message')}")
+            return result
+        except OSError:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def layer_page_size(url):
+    return post_json(url, {}).get('maxRecordCount') or 1000
+
+
+def item_layer_url(item_id, portal_url=PORTAL_URL):
+    # First layer of the item's service, the same layer as GIS().content.get(item_id).layers[0]
+    service_url = post_json(f'{portal_url}/content/items/{item_id}', {})['url'].rstrip('/')
+    layers = post_json(service_url, {}).get('layers') or [{'id': 0}]
+    return f"{service_url}/{layers[0]['id']}"
+
+
+def query_ids(url, where="1=1"):
+    result = post_json(f'{url}/query', {'where': where, 'returnIdsOnly': 'true'})
+    return sorted(result.get('objectIds') or [])
+
+
+def query_statistics(url, group_by, statistics, where="1=1"):
+    # Grouped statistics computed by the server, one row per group whatever the number of features.
+    # statistics are (type, field, out name) like ('sum', 'DailyAcres', 'area').
+    params = {
+        'where': where,
+        'groupByFieldsForStatistics': ','.join(group_by),
+        'outStatistics': json.dumps([
+            {'statisticType': stat, 'onStatisticField': field, 'outStatisticFieldName': name}
+            for stat, field, name in statistics
+        ]),
+        'returnGeometry': 'false',
+    }
+    columns = [*group_by, *(name for *_, name in statistics)]
+    rows = []
+    # Some servers change the case of field names, and long group lists come in pages
+    while True:
+        result = post_json(f'{url}/query', {**params, 'resultOffset': len(rows)})
+        page = []
+        for feature in result.get('features', []):
+            attributes = {key.lower(): value for key, value in feature['attributes'].items()}
+            page.append([attributes.get(column.lower()) for column in columns])
+        # A server that cannot page statistics sends the first page again
+        if rows and page[:1] == rows[:1]:
+            break
+        rows += page
+        if not (result.get('exceededTransferLimit') and page):
+            break
+    return pd.DataFrame(rows, columns=columns)
+
+
+def fetch_layer(url, where="1=1", out_fields='*', page_size=None, workers=MAX_WORKERS,
+                geometry_precision=GEOMETRY_PRECISION):
+    # Ids first, then fixed-size id pages fetched in parallel and assembled once.
+    # out_fields is '*' or a list of the fields the caller uses, the server leaves out the rest.
+    ids = query_ids(url, where)
+    page_size = page_size or layer_page_size(url)
+    query_url = f'{url}/query'
+    params = {
+        'outFields': out_fields if isinstance(out_fields, str) else ','.join(out_fields),
+        'outSR': 4326,
+        'returnGeometry': 'true',
+        'geometryPrecision': geometry_precision,
+    }
+
+    def fetch_page(page_ids):
+        return post_json(query_url, {**params, 'objectIds': ','.join(map(str, page_ids))})
+
+    if ids:
+        pages_ids = [ids[i:i + page_size] for i in range(0, len(ids), page_size)]
+        with ThreadPoolExecutor(max_workers=min(workers, len(pages_ids))) as pool:
+            pages = list(pool.map(fetch_page, pages_ids))
+    else:
+        # Still ask for the schema so an empty layer has its columns
+        pages = [post_json(query_url, {**params, 'where': '1=0'})]
+    return features_frame(pages)
+
+
+def features_frame(pages):
+    # Attribute columns plus the point coordinates as x and y, no geometry object per row
+    fields = pages[0].get('fields') or []
+    features = [feature for page in pages for feature in page.get('features', [])]
+    df = pd.DataFrame.from_records([feature['attributes'] for feature in features],
+                                   columns=[field['name'] for field in fields] or None)
+    # Dates come as epoch milliseconds
+    for field in fields:
+        if field['type'] == 'esriFieldTypeDate':
+            df[field['name']] = pd.to_datetime(df[field['name']], unit='ms')
+    geometries = [feature.get('geometry') or {} for feature in features]
+    df['x'] = np.array([geometry.get('x', np.nan) for geometry in geometries], dtype=float)
+    df['y'] = np.array([geometry.get('y', np.nan) for geometry in geometries], dtype=float)
+    return df
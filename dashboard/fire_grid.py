@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+# Map zooms that show fire cells, above the last one the map shows the fires themselves
+CELL_ZOOMS = range(2, 8)
+# Cells are the Web Mercator tiles this many levels below the map zoom, 3 gives 32 px cells
+CELL_OFFSET = 3
+# Past this share of changed fires building the grid again is as fast as updating it
+UPDATE_SHARE = 0.05
+# Additive per-cell statistics, so cells merge into their parents and take changes by addition
+STATS = ['fires', 'area', 'sum_x', 'sum_y']
+
+
+def tile_xy(x, y, level):
+    # Web Mercator tile of every point at one tile level, points off the map are clipped to its edge
+    n = 2 ** level
+    lat = np.radians(np.clip(np.asarray(y, dtype=float), -85.05112878, 85.05112878))
+    tx = np.floor((np.asarray(x, dtype=float) + 180) / 360 * n)
+    ty = np.floor((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * n)
+    return np.clip(tx, 0, n - 1).astype(np.int32), np.clip(ty, 0, n - 1).astype(np.int32)
+
+
+def fire_cells(fires, area_col, sign=1):
+    # Finest-level cell statistics of a fire table, sign=-1 for fires being taken out
+    fires = fires[fires['x'].notna() & fires['y'].notna()]
+    tx, ty = tile_xy(fires['x'], fires['y'], CELL_ZOOMS[-1] + CELL_OFFSET)
+    cells = pd.DataFrame({
+        'tx': tx,
+        'ty': ty,
+        'fires': sign,
+        'area': sign * fires[area_col].to_numpy(dtype=float),
+        'sum_x': sign * fires['x'].to_numpy(dtype=float),
+        'sum_y': sign * fires['y'].to_numpy(dtype=float),
+    })
+    return cells.groupby(['tx', 'ty'], as_index=False)[STATS].sum()
+
+
+def grid_levels(finest):
+    # Every coarser level is its children summed under the parent tile, one shift of the finest keys
+    levels = []
+    for zoom in reversed(CELL_ZOOMS):
+        shift = CELL_ZOOMS[-1] - zoom
+        level = finest.assign(tx=finest['tx'].to_numpy() >> shift, ty=finest['ty'].to_numpy() >> shift)
+        level = level.groupby(['tx', 'ty'], as_index=False)[STATS].sum() if shift else level
+        levels.append(level.assign(zoom=np.int8(zoom)))
+    grid = pd.concat(levels, ignore_index=True)
+    return grid[['zoom', 'tx', 'ty', *STATS]]
+
+
+def build_grid(fires, area_col):
+    return grid_levels(fire_cells(fires, area_col))
+
+
+def update_grid(grid, removed, added, area_col):
+    # The grid with the old rows of changed or deleted fires taken out and their new rows put in,
+    # the same cells build_grid gives for the new table, at the cost of the changed fires only
+    finest = grid[grid['zoom'] == CELL_ZOOMS[-1]].drop(columns='zoom')
+    parts = [finest, fire_cells(removed, area_col, sign=-1), fire_cells(added, area_col)]
+    finest = pd.concat(parts, ignore_index=True).groupby(['tx', 'ty'], as_index=False)[STATS].sum()
+    return grid_levels(finest[finest['fires'] > 0].reset_index(drop=True))
+
+
+def grid_cells(grid, bbox):
+    # Cells reaching into the bbox for every zoom, as {zoom: [[lat, lon, fires, area]]} at the fires' mean position
+    minx, miny, maxx, maxy = bbox
+    cells = {}
+    for zoom in CELL_ZOOMS:
+        # Tile rows count from the north, so the bbox top is the smaller row
+        tx, ty = tile_xy([minx, maxx], [miny, maxy], zoom + CELL_OFFSET)
+        level = grid[(grid['zoom'] == zoom) & grid['tx'].between(tx[0], tx[1]) & grid['ty'].between(ty[1], ty[0])]
+        fires = level['fires'].to_numpy()
+        cells[zoom] = [
+            [lat, lon, count, area] for lat, lon, count, area in zip(
+                np.round(level['sum_y'].to_numpy() / fires, 5).tolist(),
+                np.round(level['sum_x'].to_numpy() / fires, 5).tolist(),
+                fires.tolist(),
+                np.round(level['area'].to_numpy(), 1).tolist(),
+            )
+        ]
+    return cells
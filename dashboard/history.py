@@ -0,0 +1,155 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dashboard.disk_cache import CACHE_DIR
+
+# Fire history, one folder per source, override with DASHBOARD_HISTORY_DIR. Each published snapshot appends
+# the rows that changed since the one before under deltas/date=<day>/, the other files are derived from them.
+HISTORY_DIR = Path(os.environ.get('DASHBOARD_HISTORY_DIR', CACHE_DIR / 'history'))
+# Columns the history keeps of every fire, a row is appended whenever one of them changes
+VALUE_COLUMNS = ['region', 'status', 'area', 'start']
+ROLLUP_KEYS = ['region', 'status']
+
+
+def history_frame(fires, source):
+    # The snapshot's fires under the history's column names, Start_Date is the layer's discovery or start date
+    return pd.DataFrame({
+        'OBJECTID': fires['OBJECTID'].to_numpy(dtype='int64'),
+        'region': fires[source['region_col']].astype(object).to_numpy(),
+        'status': fires[source['status_col']].astype(object).to_numpy(),
+        'area': fires[source['area_col']].to_numpy(dtype='float32'),
+        'start': fires['Start_Date'].astype(object).to_numpy(),
+    })
+
+
+def snapshot_delta(state, current):
+    # Rows of fires that are new or changed since state, plus the ids of removed fires flagged as deleted
+    merged = current.merge(state, on='OBJECTID', how='outer', suffixes=('', '_old'), indicator=True)
+    both = (merged['_merge'] == 'both').to_numpy()
+    changed = (merged['_merge'] == 'left_only').to_numpy()
+    for col in VALUE_COLUMNS:
+        new, old = merged[col], merged[f'{col}_old']
+        same = ((new == old) | (new.isna() & old.isna())).to_numpy()
+        changed = changed | (both & ~same)
+    deleted = (merged['_merge'] == 'right_only').to_numpy()
+    delta = merged.loc[changed | deleted, ['OBJECTID', *VALUE_COLUMNS]].reset_index(drop=True)
+    delta['deleted'] = deleted[changed | deleted]
+    return delta.astype({'OBJECTID': 'int64', 'area': 'float32'})
+
+
+def apply_delta(state, delta):
+    kept = state[~state['OBJECTID'].isin(delta['OBJECTID'])]
+    return pd.concat([kept, delta.loc[~delta['deleted'], ['OBJECTID', *VALUE_COLUMNS]]], ignore_index=True)
+
+
+def totals(state, keys):
+    return state.groupby(keys, as_index=False, dropna=False).agg(fires=('OBJECTID', 'size'), area=('area', 'sum'))
+
+
+def write_table(frame, path):
+    # Strings dictionary-encoded, written under a temporary name and renamed so readers never see half a file
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def read_table(path, columns=None):
+    return pq.read_table(path, columns=columns).to_pandas() if path.exists() else None
+
+
+def empty_state():
+    return pd.DataFrame({'OBJECTID': pd.Series(dtype='int64'), 'region': pd.Series(dtype=object),
+                         'status': pd.Series(dtype=object), 'area': pd.Series(dtype='float32'),
+                         'start': pd.Series(dtype=object)})
+
+
+def update_rollups(folder, state, observed):
+    # Region x status totals as of the day's last snapshot, and the current fires by start day.
+    # Both are small enough to rewrite whole.
+    day = observed.strftime('%Y-%m-%d')
+    daily = read_table(folder / 'daily.parquet')
+    today = totals(state, ROLLUP_KEYS).assign(day=day)
+    daily = today if daily is None else pd.concat([daily[daily['day'] != day], today], ignore_index=True)
+    write_table(daily.sort_values('day', kind='stable'), folder / 'daily.parquet')
+    write_table(totals(state, ['start', *ROLLUP_KEYS]), folder / 'started.parquet')
+
+
+def delta_path(partition, observed):
+    # Named to the microsecond and never reused, so appends at the same time each keep their delta, in order
+    while True:
+        path = partition / f'{observed.strftime("%Y%m%dT%H%M%S%fZ")}.parquet'
+        if not path.exists():
+            return path
+        observed += pd.Timedelta(microseconds=1)
+
+
+def append_snapshot(name, fires, source, observed=None, history_dir=HISTORY_DIR):
+    # Appends the snapshot's changes to the history and updates the rollups, returns the number of rows appended
+    folder = Path(history_dir) / name
+    observed = pd.Timestamp.now(tz='UTC') if observed is None else pd.Timestamp(observed)
+    state = read_table(folder / 'state.parquet')
+    state = empty_state() if state is None else state
+    current = history_frame(fires, source)
+    delta = snapshot_delta(state, current)
+    if len(delta):
+        write_table(delta, delta_path(folder / 'deltas' / f'date={observed.strftime("%Y-%m-%d")}', observed))
+    write_table(current, folder / 'state.parquet')
+    update_rollups(folder, current, observed)
+    return len(delta)
+
+
+def rebuild(name, history_dir=HISTORY_DIR):
+    # State and rollups replayed from the deltas alone, for a history whose derived files were lost
+    folder = Path(history_dir) / name
+    state, daily = empty_state(), {}
+    for path in sorted((folder / 'deltas').glob('date=*/*.parquet')):
+        state = apply_delta(state, read_table(path))
+        # The day's last snapshot stands for the day
+        day = path.parent.name.removeprefix('date=')
+        daily[day] = totals(state, ROLLUP_KEYS).assign(day=day)
+    write_table(state, folder / 'state.parquet')
+    if daily:
+        write_table(pd.concat(daily.values(), ignore_index=True), folder / 'daily.parquet')
+    write_table(totals(state, ['start', *ROLLUP_KEYS]), folder / 'started.parquet')
+    return state
+
+
+def window(days, end=None):
+    # First and last day of the `days` days up to end, today by default
+    end = pd.Timestamp.now(tz='UTC') if end is None else pd.Timestamp(end)
+    return (end - pd.Timedelta(days=days - 1)).strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+
+def started_areas(name, days, end=None, history_dir=HISTORY_DIR):
+    # Region x status fire count and area of the fires that started in the last `days` days, as they stand now
+    started = read_table(Path(history_dir) / name / 'started.parquet')
+    if started is None:
+        return None
+    first, last = window(days, end)
+    recent = started[started['start'].notna() & started['start'].between(first, last)]
+    return recent.groupby(ROLLUP_KEYS, as_index=False)[['fires', 'area']].sum()
+
+
+def area_history(name, days, end=None, history_dir=HISTORY_DIR):
+    # Region x status fire count and area at the end of every day of the last `days` days, for growth over time
+    daily = read_table(Path(history_dir) / name / 'daily.parquet')
+    if daily is None:
+        return None
+    first, last = window(days, end)
+    return daily[daily['day'].between(first, last)].reset_index(drop=True)
+
+
+def history_bytes(name, history_dir=HISTORY_DIR):
+    # Size of the appended deltas, what the history costs beyond the latest state
+    return sum(path.stat().st_size for path in (Path(history_dir) / name / 'deltas').glob('date=*/*.parquet'))
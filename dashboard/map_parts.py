@@ -0,0 +1,57 @@
+import json
+
+import folium
+from folium.plugins import VectorGridProtobuf
+
+# The map is assembled from independently cached parts: a base page (basemap and boundaries),
+# then fragments that are functions of the Leaflet map and get appended as script blocks.
+
+BOUNDARY_STYLE = {'color': '#B2BEB5', 'fillColor': '#B2BEB5', 'fillOpacity': 0.3, 'weight': 1}
+SELECTED_STYLE = {'color': 'black', 'fillColor': '#B2BEB5', 'fillOpacity': 0.2, 'weight': 2.5}
+
+
+def base_map(basemap, boundary_level, name_col, style=BOUNDARY_STYLE):
+    # Full HTML page and the name of its Leaflet map variable
+    map = folium.Map(location=[0, 0], zoom_start=3)
+    folium.TileLayer(f'{basemap}').add_to(map)
+    folium.TopoJson(
+        boundary_level['topology'],
+        'objects.data',
+        name=name_col,
+        style_function=lambda x: style,
+        tooltip=folium.GeoJsonTooltip(fields=[name_col], aliases=[f'{name_col}:']),
+    ).add_to(map)
+    return map.get_root().render(), map.get_name()
+
+
+def tile_base_map(basemap, url, layer, max_zoom, style=BOUNDARY_STYLE):
+    # Base page with the boundaries as a vector tile layer, the browser fetches only the tiles in view
+    map = folium.Map(location=[0, 0], zoom_start=3)
+    folium.TileLayer(f'{basemap}').add_to(map)
+    VectorGridProtobuf(url, layer, {
+        'vectorTileLayerStyles': {layer: {**style, 'fill': True}},
+        'maxNativeZoom': max_zoom,
+    }).add_to(map)
+    return map.get_root().render(), map.get_name()
+
+
+def layer_fragment(layer_expression):
+    return f'function(map) {{ ({layer_expression}).addTo(map); }}'
+
+
+def selection_fragment(selected_gdf, name_col, location, zoom, style=SELECTED_STYLE):
+    # Selected region outline plus the viewport, the only part that changes with every selection
+    tooltip = f'{name_col}: ' + ', '.join(selected_gdf[name_col].astype(str))
+    return f"""function(map) {{
+    L.geoJson({selected_gdf.to_json()}, {{style: {json.dumps(style)}}})
+        .bindTooltip({json.dumps(tooltip)}, {{sticky: true}})
+        .addTo(map);
+    map.setView({json.dumps(list(location))}, {json.dumps(zoom)});
+}}"""
+
+
+def compose_map(base_html, map_name, *fragments):
+    # Append each fragment after folium's own script so the map variable already exists
+    calls = ''.join(f'<script>({fragment})({map_name});</script>\n' for fragment in fragments)
+    end = base_html.rindex('</html>')
+    return base_html[:end] + calls + base_html[end:]
@@ -0,0 +1,143 @@
+import json
+
+import numpy as np
+import folium
+from jinja2 import Template
+
+# Path to the fire icon image and the marker size of each size class
+FIRE_ICON_URL = "https://github.com/zkasson/Portfolio/blob/main/Fire2.png?raw=true"
+MARKER_SIZES = [6, 9, 14, 19, 24]
+COUNT_BADGE_STYLE = (
+    'background: #ff4500; color: white; border-radius: 15px; opacity: 0.85; '
+    'text-align: center; line-height: 30px; font-weight: bold;'
+)
+CELL_BADGE_STYLE = (
+    'background: #b22222; color: white; border-radius: 50%; opacity: 0.8; '
+    'text-align: center; font-size: 11px; font-weight: bold;'
+)
+
+
+class FireLayer(folium.map.Layer):
+    """All fires as one GeoJSON layer, with one icon per size class."""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = {{ this.script }};
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, script, name='Fires'):
+        super().__init__(name=name, overlay=True)
+        self._name = 'FireLayer'
+        self.script = script
+
+
+def fire_script(data, icon_sizes, icon_url=FIRE_ICON_URL):
+    # JS expression that builds the fire layer, shared by FireLayer and the cached map fragments
+    return f"""(function() {{
+    var icons = {json.dumps(icon_sizes)}.map(function(size) {{
+        return L.icon({{iconUrl: {json.dumps(icon_url)}, iconSize: [size, size]}});
+    }});
+    return L.geoJson({data}, {{
+        pointToLayer: function(feature, latlng) {{
+            return L.marker(latlng, {{icon: icons[feature.properties.size_class]}})
+                .bindTooltip(feature.properties.tooltip);
+        }}
+    }});
+}})()"""
+
+
+def summary_script(summary):
+    # JS expression for a layer of fire counts, one badge per [lat, lon, region, count]
+    return f"""L.layerGroup({json.dumps(summary)}.map(function(r) {{
+    return L.marker([r[0], r[1]], {{icon: L.divIcon({{
+        className: 'fire-count',
+        html: '<div style="{COUNT_BADGE_STYLE}">' + r[3] + '</div>',
+        iconSize: [30, 30]
+    }})}}).bindTooltip(r[2] + ': ' + r[3] + ' fires');
+}}))"""
+
+
+def clustered_fire_script(fire_expression, cells, label):
+    # JS expression for a layer that shows fire cells while zoomed out and the fires once zoomed past the cells.
+    # cells is {zoom: [[lat, lon, fires, area]]}, each zoom's layer is only built the first time it is shown.
+    zooms = sorted(int(zoom) for zoom in cells)
+    return f"""(function() {{
+    var cells = {json.dumps(cells, separators=(',', ':'))};
+    var fires = {fire_expression};
+    var layers = {{}}, group = L.layerGroup(), map = null;
+    function cellLayer(zoom) {{
+        return L.layerGroup(cells[zoom].map(function(c) {{
+            var size = 20 + 6 * Math.min(String(c[2]).length - 1, 4);
+            return L.marker([c[0], c[1]], {{icon: L.divIcon({{
+                className: 'fire-cell',
+                html: '<div style="{CELL_BADGE_STYLE} width: ' + size + 'px; line-height: ' + size + 'px;">' + c[2] + '</div>',
+                iconSize: [size, size]
+            }})}}).bindTooltip(c[2] + ' fires, ' + c[3] + ' {label}');
+        }}));
+    }}
+    function update() {{
+        var zoom = Math.max(Math.floor(map.getZoom()), {zooms[0]});
+        var layer = zoom > {zooms[-1]} ? fires : (layers[zoom] = layers[zoom] || cellLayer(zoom));
+        if (!group.hasLayer(layer)) {{
+            group.clearLayers();
+            group.addLayer(layer);
+        }}
+    }}
+    group.on('add', function() {{ map = group._map; map.on('zoomend', update); update(); }});
+    group.on('remove', function() {{ map.off('zoomend', update); }});
+    return group;
+}})()"""
+
+
+def fire_tile_script(url, label, max_zoom):
+    # JS expression for the fires as a vector tile layer, one circle per tile cell sized by its fire count
+    return f"""L.vectorGrid.protobuf({json.dumps(url)}, {{
+    rendererFactory: L.canvas.tile,
+    maxNativeZoom: {max_zoom},
+    interactive: true,
+    vectorTileLayerStyles: {{
+        fires: function(p) {{
+            return {{radius: 3 + 2 * Math.log2(p.fires), fill: true, fillColor: '#ff4500', fillOpacity: 0.8,
+                     color: '#b22222', weight: 1}};
+        }}
+    }}
+}}).on('click', function(e) {{
+    var p = e.layer.properties;
+    L.popup().setLatLng(e.latlng).setContent(p.fires + ' fires, ' + p.area + ' {label}').openOn(this._map);
+}})"""
+
+
+def fire_features(lat, lon, values, size_class, label):
+    # Tooltip for every fire in one pass, then a compact GeoJSON string
+    # Values keep their own float type, so float32 areas print as stored and not as their float64 expansion
+    values = np.asarray(values)
+    size_class = np.asarray(size_class, dtype=int)
+    lon = np.round(np.asarray(lon, dtype=float), 5)
+    lat = np.round(np.asarray(lat, dtype=float), 5)
+    tooltips = np.char.add(f'{label}: ', values.astype(str))
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [x, y]},
+            'properties': {'size_class': s, 'tooltip': t},
+        }
+        for x, y, s, t in zip(lon.tolist(), lat.tolist(), size_class.tolist(), tooltips.tolist())
+    ]
+    return json.dumps({'type': 'FeatureCollection', 'features': features}, separators=(',', ':'))
+
+
+def fire_layer_script(fires, value_col, label, size_col='size_class'):
+    # Icons are defined once per size class and scaled the same way as the old per-fire markers.
+    # Size classes are categorical, or their int codes when read back from a snapshot.
+    sizes = fires[size_col]
+    codes = sizes.cat.codes if sizes.dtype == 'category' else sizes
+    data = fire_features(fires['y'], fires['x'], fires[value_col], codes, label)
+    icon_sizes = [size * 2 for size in MARKER_SIZES]
+    return fire_script(data, icon_sizes)
+
+
+def fire_layer(fires, value_col, label, size_col='size_class', name='Fires'):
+    return FireLayer(fire_layer_script(fires, value_col, label, size_col), name=name)
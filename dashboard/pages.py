@@ -0,0 +1,208 @@
+import json
+
+from folium.plugins import VectorGridProtobuf
+
+from dashboard import tiles
+from dashboard.boundaries import boundary_levels, level_for_zoom, viewport_level
+from dashboard.boundary_store import read_boundary
+from dashboard.charts import area_bar_chart, figure_bytes, highway_bar_chart
+from dashboard.classify import CANADA_STATUS_COLORS, US_STATUS_COLORS, status_colors
+from dashboard.cube import region_areas
+from dashboard.disk_cache import disk_cache
+from dashboard.map_parts import base_map, layer_fragment, selection_fragment
+from dashboard.fire_grid import grid_cells
+from dashboard.markers import clustered_fire_script, fire_layer_script, summary_script
+from dashboard.spatial_index import fires_in_bbox
+from dashboard.viewport import region_catalog, region_summary, viewport_bbox
+
+# Page parts the dashboards draw for a selection, built the same way live and by the pre-render workers
+
+ACRES_PER_HECTARE = 2.47105
+BASEMAPS = ['CartoDB.Positron', 'CartoDB.DarkMatter', 'openstreetmap']
+
+# What differs between the wildfire branches
+PAGES = {
+    'canada': {
+        'heading': 'Canadian Wildfire Dashboard',
+        'about': 'Explore Active Wildfire in Canada',
+        'region_col': 'Province',
+        'status_col': 'Stage_of_Control',
+        'area_col': 'Hectares__Ha_',
+        'statuses': ['Being Held', 'Out of Control', 'Prescribed', 'Under Control'],
+        'colors': CANADA_STATUS_COLORS,
+        # Unit options in the sidebar's order, with their factor from the snapshot's unit
+        'units': {'Hectares': 1, 'Acres': ACRES_PER_HECTARE},
+        'title': '{unit} of fire within {region}',
+        'chart_options': {},
+        # Axis top when every status has 0 area
+        'zero_limit': 0,
+        'boundary_weight': 1,
+    },
+    'us': {
+        'heading': 'US Wildfire Dashboard',
+        'about': 'Explore Active Wildfire in the US',
+        'region_col': 'State',
+        'status_col': 'Type',
+        'area_col': 'DailyAcres',
+        'statuses': ['Contained', 'Actively Containing', 'Prescribed', 'Uncontained', 'Unknown Containment'],
+        'colors': US_STATUS_COLORS,
+        'units': {'Acres': 1, 'Hectares': 1 / ACRES_PER_HECTARE},
+        'title': '{unit} of fire within {region} by control stage',
+        'chart_options': {'rotate_ticks': True, 'bold_labels': True, 'clip_labels': True},
+        'zero_limit': 1000,
+        'boundary_weight': 0.5,
+    },
+}
+
+HIGHWAY_BASEMAPS = ['CartoDB.DarkMatter', 'CartoDB.Positron', 'openstreetmap', 'ESRI']
+HIGHWAY_COLORS = {'NH': '#2e6f40', 'SH': '#609C9E'}
+HIGHWAY_UNITS = {'km': 1, 'mi': 0.621371}
+# Line width of each road class on the map
+ROAD_WEIGHTS = {'NH': 3, 'SH': 2}
+
+
+@disk_cache()
+def read_levels(url, name_col):
+    return boundary_levels(read_boundary(url), name_col)
+
+
+@disk_cache()
+def read_catalog(url, name_col):
+    return region_catalog(read_boundary(url), name_col)
+
+
+def boundary_style(page):
+    return {'color': '#B2BEB5', 'fillColor': '#B2BEB5', 'fillOpacity': 0.3, 'weight': page['boundary_weight']}
+
+
+def chart_limit(page, area_final):
+    # Top of the y axis, a tenth above the largest area rounded to hundreds
+    max_area = area_final['Area'].max()
+    upper_limit = max_area + (max_area / 10) if max_area > 0 else page['zero_limit']
+    return round(upper_limit / 100) * 100 if upper_limit > 99 else 100
+
+
+def chart_image(page, area_final, unit, region):
+    # PNG of the region's area per control stage, area_final as region_areas gives it
+    status_col = page['status_col']
+    fig = area_bar_chart(
+        area_final[status_col].tolist(),
+        area_final['Area'].tolist(),
+        status_colors(area_final[status_col], page['colors']).tolist(),
+        unit,
+        page['title'].format(unit=unit, region=region),
+        chart_limit(page, area_final),
+        **page['chart_options']
+    )
+    return figure_bytes(fig)
+
+
+def region_chart(page, cube, region, unit):
+    # The region's chart, None when it has no fires
+    area_final = region_areas(cube, region, page['units'][unit])
+    return None if area_final['Area'].dropna().empty else chart_image(page, area_final, unit, region)
+
+
+def base_part(page, levels, catalog, basemap, region):
+    # Basemap and boundaries, full detail only inside the region's viewport
+    level = viewport_level(levels, catalog[region]['zoom'], viewport_bbox(catalog, region), page['region_col'])
+    return base_map(basemap, level, page['region_col'], boundary_style(page))
+
+
+def fire_part(page, fires, fires_idx, grid, catalog, region):
+    # Wildfires inside the viewport as cells while zoomed out and markers zoomed in, the rest as counts per region
+    bbox = viewport_bbox(catalog, region)
+    inside = fires_in_bbox(fires_idx, bbox)
+    unit = next(iter(page['units']))
+    return (
+        layer_fragment(clustered_fire_script(
+            fire_layer_script(fires.iloc[inside], page['area_col'], unit), grid_cells(grid, bbox), unit
+        )),
+        layer_fragment(summary_script(region_summary(fires_idx, inside, catalog))),
+    )
+
+
+def selected_part(page, levels, catalog, region):
+    # Selected region and viewport
+    level = level_for_zoom(levels, catalog[region]['zoom'])
+    gdf = level['gdf']
+    return selection_fragment(gdf[gdf[page['region_col']] == region], page['region_col'],
+                              list(catalog[region]['centroid']), catalog[region]['zoom'])
+
+
+def highway_lengths(lengths_df, district, unit):
+    # The district's NH and SH lengths in the unit
+    filtered = lengths_df[lengths_df['DISTRICT'] == district].copy()
+    filtered[['NH', 'SH']] = filtered[['NH', 'SH']] * HIGHWAY_UNITS[unit]
+    return filtered
+
+
+def highway_chart(df_final, unit, nh_color=HIGHWAY_COLORS['NH'], sh_color=HIGHWAY_COLORS['SH']):
+    # Calculate the upper limit for the y-axis
+    upper_limit = df_final['SH'].max() + 250
+    rounded_upper_limit = round(upper_limit / 100) * 100
+    return figure_bytes(highway_bar_chart(df_final, nh_color, sh_color, unit, rounded_upper_limit))
+
+
+def highway_map(districts_gdf, district, basemap, overlay=False, roads=None, colors=HIGHWAY_COLORS,
+                tile_mode=False):
+    # Map page of the district, roads is its clipped roads per class for the overlay.
+    # In tile mode districts and roads come from the tile endpoint instead.
+    # leafmap is imported here, the wildfire dashboard does not need it
+    import leafmap.foliumap as leafmap
+    map = leafmap.Map(
+        layers_control=True,
+        draw_control=False,
+        measure_control=False,
+        fullscreen_control=False)
+    map.add_basemap(basemap)
+    if tile_mode:
+        VectorGridProtobuf(tiles.tile_url('karnataka_districts'), 'districts', {
+            'vectorTileLayerStyles': {'karnataka_districts': {
+                'color': '#B2BEB5', 'fillColor': '#B2BEB5', 'fill': True, 'fillOpacity': 0.3, 'weight': 0.5,
+            }},
+            'maxNativeZoom': tiles.MAX_ZOOM,
+        }).add_to(map)
+    else:
+        map.add_gdf(
+            gdf=districts_gdf,
+            zoom_to_layer=False,
+            layer_name='districts',
+            info_mode='on_click',
+            style={'color': '#B2BEB5', 'fillOpacity': 0.3, 'weight': 0.5},
+        )
+
+    # Roads colored in the browser in tile mode, so a new color fetches no tiles
+    if overlay and tile_mode:
+        road_colors = json.dumps({road_class: [color, ROAD_WEIGHTS[road_class]]
+                                  for road_class, color in colors.items()})
+        VectorGridProtobuf(tiles.tile_url('karnataka_highways'), 'highways', f'''{{
+            "maxNativeZoom": {tiles.MAX_ZOOM},
+            "vectorTileLayerStyles": {{
+                "karnataka_highways": function(p) {{
+                    var style = {road_colors}[p.road_class];
+                    return {{color: style[0], weight: style[1]}};
+                }}
+            }}
+        }}''').add_to(map)
+    elif overlay:
+        for road_class, color in colors.items():
+            if len(roads[road_class]):
+                map.add_gdf(
+                    gdf=roads[road_class],
+                    zoom_to_layer=False,
+                    layer_name='highways',
+                    info_mode=None,
+                    style={'color': color, 'weight': ROAD_WEIGHTS[road_class]},
+                )
+
+    map.add_gdf(
+        gdf=districts_gdf[districts_gdf['DISTRICT'] == district],
+        layer_name='selected',
+        zoom_to_layer=True,
+        info_mode=None,
+        style={'color': 'black', 'fill': None, 'weight': 2.5}
+    )
+    # As map.to_streamlit draws it
+    map.add_layer_control()
+    return map.to_html()
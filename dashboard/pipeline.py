@@ -0,0 +1,273 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dashboard import tracing
+from dashboard.boundary_store import CANADA_BOUNDARIES, US_BOUNDARIES, read_boundary
+from dashboard.classify import (CANADA_SIZE_BOUNDS, CANADA_STATUS_RULES, US_SIZE_BOUNDS, US_STATUS_RULES, classify,
+                                size_class)
+from dashboard.delta_sync import sync_layer
+from dashboard.disk_cache import CACHE_DIR
+from dashboard.fetch import item_layer_url, query_statistics
+from dashboard.fire_grid import UPDATE_SHARE, build_grid, update_grid
+from dashboard.history import HISTORY_DIR, append_snapshot
+from dashboard.spatial_index import locate_regions, region_index
+
+# Published fire snapshots, one folder per source, and how many versions each folder keeps
+SNAPSHOT_DIR = Path(os.environ.get('DASHBOARD_SNAPSHOT_DIR', CACHE_DIR / 'snapshots'))
+KEEP_SNAPSHOTS = 5
+# Bumped when the snapshot columns change, older snapshots are republished instead of read
+SNAPSHOT_FORMAT = 2
+
+# Agency codes to province names
+AGENCY_TO_PROVINCE = {
+    'ab': 'Alberta',
+    'bc': 'British Columbia',
+    'mb': 'Manitoba',
+    'nb': 'New Brunswick',
+    'nl': 'Newfoundland and Labrador',
+    'ns': 'Nova Scotia',
+    'on': 'Ontario',
+    'pe': 'Prince Edward Island',
+    'nt': 'Northwest Territories',
+    'qc': 'Quebec',
+    'sk': 'Saskatchewan',
+    'yt': 'Yukon Territory'
+}
+
+# Origin codes to state names
+ORIGIN_TO_STATE = {
+    'US-AL': 'Alabama','US-AK': 'Alaska','US-AZ': 'Arizona','US-AR': 'Arkansas','US-CA': 'California','US-CO': 'Colorado','US-CT': 'Connecticut',
+    'US-DE': 'Delaware', 'US-FL': 'Florida', 'US-GA': 'Georgia','US-HI': 'Hawaii','US-ID': 'Idaho','US-IL': 'Illinois','US-IN': 'Indiana',
+    'US-IA': 'Iowa','US-KS': 'Kansas','US-KY': 'Kentucky','US-LA': 'Louisiana','US-ME': 'Maine','US-MD': 'Maryland','US-MA': 'Massachusetts','US-MI': 'Michigan','US-MN': 'Minnesota',
+    'US-MS': 'Mississippi','US-MO': 'Missouri','US-MT': 'Montana','US-NE': 'Nebraska','US-NV': 'Nevada','US-NH': 'New Hampshire','US-NJ': 'New Jersey','US-NM': 'New Mexico',
+    'US-NY': 'New York','US-NC': 'North Carolina','US-ND': 'North Dakota','US-OH': 'Ohio','US-OK': 'Oklahoma','US-OR': 'Oregon','US-PA': 'Pennsylvania',
+    'US-RI': 'Rhode Island','US-SC': 'South Carolina','US-SD': 'South Dakota','US-TN': 'Tennessee','US-TX': 'Texas','US-UT': 'Utah','US-VT': 'Vermont',
+    'US-VA': 'Virginia','US-WA': 'Washington','US-WV': 'West Virginia','US-WI': 'Wisconsin','US-WY': 'Wyoming','US-DC': 'District of Columbia','US-PR': 'Puerto Rico'
+}
+
+# Everything the transform needs to know about each fire layer
+SOURCES = {
+    'canada': {
+        'item_id': '21638fcd54d14a25b6f1affdef812146',
+        'boundaries': CANADA_BOUNDARIES,
+        # Fields requested from the layer, everything else stays on the server
+        'columns': ['Agency', 'Stage_of_Control', 'Hectares__Ha_', 'Start_Date'],
+        # Fields the server groups area sums by, enough to tell the region and status of every group
+        'stat_groups': ['Agency', 'Stage_of_Control'],
+        'region_col': 'Province',
+        'code_col': 'Agency',
+        'codes': AGENCY_TO_PROVINCE,
+        # US fires are published in the same layer
+        'exclude_codes': ['conus', 'ak'],
+        'status_col': 'Stage_of_Control',
+        'status_rules': CANADA_STATUS_RULES,
+        'area_col': 'Hectares__Ha_',
+        'size_bounds': CANADA_SIZE_BOUNDS,
+        'date_col': 'Start_Date',
+    },
+    'us': {
+        'item_id': 'd957997ccee7408287a963600a77f61f',
+        'boundaries': US_BOUNDARIES,
+        'columns': ['POOState', 'IncidentTypeCategory', 'PercentContained', 'DailyAcres', 'FireDiscoveryDateTime'],
+        'stat_groups': ['POOState', 'IncidentTypeCategory', 'PercentContained'],
+        'region_col': 'State',
+        'code_col': 'POOState',
+        'codes': ORIGIN_TO_STATE,
+        'exclude_codes': [],
+        'status_col': 'Type',
+        'status_rules': US_STATUS_RULES,
+        'area_col': 'DailyAcres',
+        'size_bounds': US_SIZE_BOUNDS,
+        'date_col': 'FireDiscoveryDateTime',
+    },
+}
+
+
+def fetch(source):
+    # Only features edited since the last run are downloaded, returns the rows and what changed
+    from arcgis.gis import GIS
+    feature_layer = GIS().content.get(source['item_id']).layers[0]
+    return sync_layer(feature_layer, source['item_id'], source['columns'])
+
+
+def transform(sdf, source, boundaries_gdf):
+    # Raw layer rows to the dashboard's fire table: region, status, size class and display date.
+    # Strings are categoricals, numbers the smallest type that holds them and the location plain x/y.
+    sdf = sdf[~sdf[source['code_col']].isin(source['exclude_codes'])].reset_index(drop=True)
+
+    # Region from the fire location, the layer's code covers fires just outside the polygons
+    regions = locate_regions(sdf['x'], sdf['y'], region_index(boundaries_gdf, source['region_col']))
+    regions = pd.Series(regions, dtype=object).fillna(sdf[source['code_col']].map(source['codes']))
+    area = sdf[source['area_col']].fillna(0)
+    return pd.DataFrame({
+        # Kept to find the rows the next sync changes
+        'OBJECTID': sdf['OBJECTID'].to_numpy(dtype='int64'),
+        source['region_col']: regions.astype('category'),
+        source['status_col']: classify(sdf, source['status_rules']),
+        source['area_col']: area.astype('float32'),
+        # Parquet keeps only string categories, so the size class is stored as its int8 code
+        'size_class': size_class(area, source['size_bounds']).cat.codes,
+        'Start_Date': sdf[source['date_col']].dt.strftime('%Y-%m-%d').astype('category'),
+        # float32 keeps coordinates to about a metre, the precision they are fetched at
+        'x': sdf['x'].astype('float32'),
+        'y': sdf['y'].astype('float32'),
+    })
+
+
+def fetch_statistics(source, url=None):
+    # Area and fire count per region and status, summed by the server without downloading a feature.
+    # Regions come from the layer's codes, the snapshot places fires by their location instead.
+    stats = query_statistics(url or item_layer_url(source['item_id']), source['stat_groups'],
+                             [('sum', source['area_col'], source['area_col']), ('count', 'OBJECTID', 'fires')])
+    stats = stats[~stats[source['code_col']].isin(source['exclude_codes'])].reset_index(drop=True)
+    return pd.DataFrame({
+        source['region_col']: stats[source['code_col']].map(source['codes']),
+        source['status_col']: classify(stats, source['status_rules']),
+        source['area_col']: stats[source['area_col']].fillna(0),
+        'fires': stats['fires'].fillna(0).astype(int),
+    })
+
+
+def write_snapshot(fires, name, snapshot_dir=SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS, grid=None, sync_version=None):
+    # New version under a timestamped name, its fire grid next to it, then the latest pointer is swapped to it
+    folder = Path(snapshot_dir) / name
+    folder.mkdir(parents=True, exist_ok=True)
+    path = claim_file(folder, lambda tmp: fires.to_parquet(tmp))
+    if grid is not None:
+        replace_file(folder, grid_path(path), lambda tmp: write_grid(grid, tmp, sync_version))
+    replace_file(folder, folder / 'latest', lambda tmp: Path(tmp).write_text(path.name))
+
+    # Old versions stay readable for sessions still holding them, up to keep
+    snapshots = sorted(p for p in folder.glob('*.parquet') if not p.name.endswith('.grid.parquet'))
+    for old in snapshots[:-keep]:
+        old.unlink(missing_ok=True)
+        grid_path(old).unlink(missing_ok=True)
+    return path
+
+
+def snapshot_name(stamp_us):
+    # UTC time to the microsecond, so names sort in publish order
+    seconds, micros = divmod(stamp_us, 1_000_000)
+    return f'{time.strftime("%Y%m%dT%H%M%S", time.gmtime(seconds))}{micros:06d}Z.v{SNAPSHOT_FORMAT}.parquet'
+
+
+def claim_file(folder, write):
+    # Written under a temp name, then linked to a snapshot name no file holds yet. Two publishes at the same
+    # time, another process or a retry, each get their own name and never replace a file the latest pointer
+    # or a manifest may already name.
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        stamp_us = time.time_ns() // 1000
+        while True:
+            path = folder / snapshot_name(stamp_us)
+            try:
+                os.link(tmp, path)
+                return path
+            except FileExistsError:
+                stamp_us += 1
+    finally:
+        Path(tmp).unlink(missing_ok=True)
+
+
+def grid_path(path):
+    return path.with_name(path.name.replace('.parquet', '.grid.parquet'))
+
+
+def write_grid(grid, path, sync_version=None):
+    # The sync version the grid reflects, so the next publish knows whether it can update it
+    table = pa.Table.from_pandas(grid, preserve_index=False)
+    metadata = {**table.schema.metadata, b'sync_version': json.dumps(sync_version).encode()}
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def read_grid(path):
+    # Fire grid published with a snapshot and its sync version, None for snapshots published without one
+    path = grid_path(Path(path))
+    if not path.exists():
+        return None, None
+    table = pq.read_table(path)
+    return table.to_pandas(), json.loads(table.schema.metadata.get(b'sync_version', b'null'))
+
+
+def snapshot_grid(name, fires, changes, area_col, snapshot_dir=SNAPSHOT_DIR):
+    # The previous snapshot's grid with only the synced changes applied, when it was built from the sync
+    # this one started from. Anything else, a full query, a missing grid or a large sync, builds it from every fire.
+    previous = latest_snapshot(name, snapshot_dir)
+    grid, version = read_grid(previous) if previous is not None else (None, None)
+    if (grid is None or changes['base'] is None or version != changes['base']
+            or len(changes['ids']) > len(fires) * UPDATE_SHARE):
+        return build_grid(fires, area_col)
+    old = read_snapshot(previous)
+    ids = changes['ids']
+    return update_grid(grid, old[old['OBJECTID'].isin(ids)], fires[fires['OBJECTID'].isin(ids)], area_col)
+
+
+def replace_file(folder, path, write):
+    fd, tmp = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def latest_snapshot(name, snapshot_dir=SNAPSHOT_DIR):
+    pointer = Path(snapshot_dir) / name / 'latest'
+    if not pointer.exists():
+        return None
+    path = pointer.parent / pointer.read_text().strip()
+    return path if path.name.endswith(f'.v{SNAPSHOT_FORMAT}.parquet') else None
+
+
+def read_snapshot(path):
+    # Categoricals and the small number types come back as written, from the pandas metadata
+    return pq.read_table(path, memory_map=True).to_pandas()
+
+
+def publish(name, snapshot_dir=SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS, history_dir=HISTORY_DIR):
+    # Each step is a tracing stage, so a first run's publish shows up in the app's trace
+    source = SOURCES[name]
+    with tracing.stage(f'{name}/fetch'):
+        sdf, changes = fetch(source)
+    with tracing.stage(f'{name}/transform'):
+        fires = transform(sdf, source, read_boundary(source['boundaries']))
+    with tracing.stage(f'{name}/grid'):
+        grid = snapshot_grid(name, fires, changes, source['area_col'], snapshot_dir)
+    with tracing.stage(f'{name}/write'):
+        path = write_snapshot(fires, name, snapshot_dir, keep, grid, changes['version'])
+    # Snapshots are pruned, their changes stay in the history
+    with tracing.stage(f'{name}/history'):
+        append_snapshot(name, fires, source, history_dir=history_dir)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch, transform and publish wildfire snapshots.')
+    parser.add_argument('sources', nargs='*', metavar='source', help=f'any of {", ".join(SOURCES)}, all by default')
+    parser.add_argument('--snapshot-dir', type=Path, default=SNAPSHOT_DIR)
+    parser.add_argument('--keep', type=int, default=KEEP_SNAPSHOTS)
+    parser.add_argument('--history-dir', type=Path, default=HISTORY_DIR)
+    args = parser.parse_args(argv)
+    unknown = set(args.sources) - set(SOURCES)
+    if unknown:
+        parser.error(f'unknown source: {", ".join(sorted(unknown))}')
+    for name in args.sources or SOURCES:
+        start = time.perf_counter()
+        path = publish(name, args.snapshot_dir, args.keep, args.history_dir)
+        print(f'{name}: {path} ({time.perf_counter() - start:.1f}s)')
+
+
+if __name__ == '__main__':
+    main()
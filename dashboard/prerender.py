@@ -0,0 +1,319 @@
+import argparse
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from dashboard.boundary_store import KARNATAKA_GPKG, read_boundary, store_version
+from dashboard.cube import area_cube
+from dashboard.disk_cache import CACHE_DIR
+from dashboard.fire_grid import build_grid
+from dashboard.pages import (BASEMAPS, HIGHWAY_BASEMAPS, HIGHWAY_UNITS, PAGES, base_part, fire_part, highway_chart,
+                             highway_lengths, highway_map, read_catalog, read_levels, region_chart, selected_part)
+from dashboard.pipeline import KEEP_SNAPSHOTS, SOURCES, latest_snapshot, read_grid, read_snapshot
+from dashboard.road_layers import ROAD_CLASSES, district_roads, road_index
+from dashboard.spatial_index import point_index
+from dashboard.viewport import region_catalog
+
+# Page parts pre-rendered for every standard selection, override with DASHBOARD_ARTIFACT_DIR. Parts are stored
+# under the SHA-256 of their bytes, so a part that renders the same as before is stored once, and a manifest
+# per fire snapshot (or highway data version) names the part of every selection.
+ARTIFACT_DIR = Path(os.environ.get('DASHBOARD_ARTIFACT_DIR', CACHE_DIR / 'artifacts'))
+# Worker processes, and parts per batch sent to a worker
+MAX_WORKERS = os.cpu_count() or 1
+CHUNK_TASKS = 8
+# Bumped when parts render differently, parts of older manifests are rendered again instead of kept
+PARTS_FORMAT = 1
+# Unreferenced parts younger than this are kept, another process may be writing the manifest that names them
+PRUNE_SECONDS = 3600
+
+# The data of the job a worker process renders parts of
+_job = {}
+
+
+def object_path(digest, artifact_dir=ARTIFACT_DIR):
+    return Path(artifact_dir) / 'objects' / digest[:2] / digest
+
+
+def put_object(data, artifact_dir=ARTIFACT_DIR):
+    # Stores the bytes once under their hash, a part already stored only has its mtime renewed for the pruning
+    digest = hashlib.sha256(data).hexdigest()
+    path = object_path(digest, artifact_dir)
+    if path.exists():
+        os.utime(path)
+        return digest
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{digest}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return digest
+
+
+def read_object(digest, artifact_dir=ARTIFACT_DIR):
+    # Bytes of a part, None when it has been pruned
+    try:
+        return object_path(digest, artifact_dir).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def manifest_path(name, version, artifact_dir=ARTIFACT_DIR):
+    return Path(artifact_dir) / 'manifests' / name / f'{version}.json'
+
+
+def read_manifest(name, version, artifact_dir=ARTIFACT_DIR):
+    path = manifest_path(name, version, artifact_dir)
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def write_text(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def write_manifest(name, version, manifest, artifact_dir=ARTIFACT_DIR):
+    write_text(manifest_path(name, version, artifact_dir), json.dumps(manifest))
+
+
+def lookup(manifest, kind, *keys):
+    # Stored entry of one selection, None when the manifest has none
+    entry = manifest['parts'].get(kind) if manifest is not None else None
+    for key in keys:
+        if entry is None:
+            return None
+        entry = entry.get(str(key))
+    return entry
+
+
+def stored_part(manifest, kind, *keys, read=read_object):
+    # Bytes of a pre-rendered part, None when the selection has none
+    digest = lookup(manifest, kind, *keys)
+    return read(digest) if digest is not None else None
+
+
+def stored_map(manifest, basemap, region, read=read_object):
+    # Base page, map name, fire fragments and selection of a pre-rendered wildfire map, None when a part is missing
+    base, fires, selected = (lookup(manifest, 'base', basemap, region), lookup(manifest, 'fires', region),
+                             lookup(manifest, 'selected', region))
+    if base is None or fires is None or selected is None:
+        return None
+    base_html, fire_json, selected_fragment = read(base[0]), read(fires), read(selected)
+    if base_html is None or fire_json is None or selected_fragment is None:
+        return None
+    return base_html.decode(), base[1], json.loads(fire_json), selected_fragment.decode()
+
+
+def manifest_parts(results):
+    # Task results nested by their keys, {kind: {key: ... {key: entry}}}
+    parts = {}
+    for (kind, *keys), entry in results:
+        level = parts.setdefault(kind, {})
+        for key in keys[:-1]:
+            level = level.setdefault(str(key), {})
+        level[str(keys[-1])] = entry
+    return parts
+
+
+def fire_job(name, snapshot, artifact_dir):
+    page, source = PAGES[name], SOURCES[name]
+    fires = read_snapshot(snapshot)
+    grid, _ = read_grid(snapshot)
+    return {
+        'name': name, 'page': page, 'artifact_dir': artifact_dir, 'fires': fires,
+        'grid': grid if grid is not None else build_grid(fires, page['area_col']),
+        'fires_idx': point_index(fires['x'], fires['y'], fires[page['region_col']]),
+        'cube': area_cube(fires, page['region_col'], page['status_col'], page['area_col'], page['statuses']),
+        'levels': read_levels(source['boundaries'], page['region_col']),
+        'catalog': read_catalog(source['boundaries'], page['region_col']),
+    }
+
+
+def highway_job(url, lengths_df, artifact_dir):
+    districts_gdf = read_boundary(url, 'karnataka_districts')
+    catalog = region_catalog(districts_gdf, 'DISTRICT')
+    return {
+        'artifact_dir': artifact_dir, 'districts_gdf': districts_gdf, 'lengths_df': lengths_df, 'catalog': catalog,
+        'roads_idx': road_index(read_boundary(url, 'karnataka_highways'), catalog),
+    }
+
+
+def render_part(task, job=None):
+    # Renders and stores one part, returns the task and its manifest entry
+    job = _job if job is None else job
+    kind, *keys = task
+    store = functools.partial(put_object, artifact_dir=job['artifact_dir'])
+    if kind == 'chart':
+        unit, region = keys
+        chart = region_chart(job['page'], job['cube'], region, unit)
+        return task, store(chart) if chart is not None else None
+    if kind == 'fires':
+        fragments = fire_part(job['page'], job['fires'], job['fires_idx'], job['grid'], job['catalog'], keys[0])
+        return task, store(json.dumps(fragments).encode())
+    if kind == 'base':
+        base_html, map_name = base_part(job['page'], job['levels'], job['catalog'], *keys)
+        return task, [store(base_html.encode()), map_name]
+    if kind == 'selected':
+        return task, store(selected_part(job['page'], job['levels'], job['catalog'], keys[0]).encode())
+    if kind == 'highway_chart':
+        unit, district = keys
+        return task, store(highway_chart(highway_lengths(job['lengths_df'], district, unit), unit))
+    if kind == 'highway_map':
+        basemap, overlay, district = keys
+        roads = ({road_class: district_roads(job['roads_idx'], job['catalog'], district, road_class)
+                  for road_class in ROAD_CLASSES} if overlay else None)
+        return task, store(highway_map(job['districts_gdf'], district, basemap, overlay, roads).encode())
+    raise ValueError(f'unknown part: {kind}')
+
+
+def start_worker(load, args):
+    _job.update(load(*args))
+
+
+def render_parts(load, args, tasks, workers=MAX_WORKERS):
+    # Every task rendered with the job's data loaded once per process. With several workers the tasks are
+    # spread over a process pool, the job's data is loaded by each worker and parts are stored by the worker.
+    if workers <= 1 or len(tasks) < 2:
+        job = load(*args)
+        return [render_part(task, job) for task in tasks]
+    # Spawned, not forked, the app's server process has threads running
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=start_worker, initargs=(load, args)) as pool:
+        return list(pool.map(render_part, tasks, chunksize=CHUNK_TASKS))
+
+
+def chart_key(page, cube, region, unit):
+    # What a region's chart is drawn from, None when it has no fires. Charts of the same key are the same image.
+    table = cube['regions'].get(region)
+    if table is None or table['Area'].dropna().empty:
+        return None
+    data = [PARTS_FORMAT, page['title'], unit, region, table[[cube['status_col'], 'Area']].to_json()]
+    return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+
+
+def prerender_fires(name, snapshot, workers=MAX_WORKERS, artifact_dir=ARTIFACT_DIR):
+    # Charts, fire layers, base maps and selections of every region, basemap and unit of a fire snapshot.
+    # Only the charts of regions whose areas changed are drawn again, and base maps and selections only
+    # when the boundaries changed, the rest is kept from the previous manifest.
+    page, source = PAGES[name], SOURCES[name]
+    regions = list(read_catalog(source['boundaries'], page['region_col']))
+    boundaries = list(store_version(source['boundaries']))
+    previous = latest_manifest(name, artifact_dir)
+    if previous is not None and previous.get('format') != PARTS_FORMAT:
+        previous = None
+    cube = area_cube(read_snapshot(snapshot), page['region_col'], page['status_col'], page['area_col'],
+                     page['statuses'])
+    chart_keys = {(unit, region): chart_key(page, cube, region, unit) for unit in page['units'] for region in regions}
+    charts = {key: digest for key, digest in (previous['charts'] if previous else {}).items()
+              if key in chart_keys.values()}
+    tasks = [('chart', unit, region) for (unit, region), key in chart_keys.items()
+             if key is not None and key not in charts]
+    tasks += [('fires', region) for region in regions]
+    if previous is not None and previous['boundaries'] == boundaries:
+        kept = {kind: previous['parts'][kind] for kind in ['base', 'selected']}
+    else:
+        kept = {}
+        tasks += [('base', basemap, region) for basemap in BASEMAPS for region in regions]
+        tasks += [('selected', region) for region in regions]
+    results = render_parts(fire_job, (name, snapshot, artifact_dir), tasks, workers)
+    charts.update((chart_keys[tuple(keys)], digest) for (kind, *keys), digest in results if kind == 'chart')
+    chart_parts = [(('chart', unit, region), charts.get(key)) for (unit, region), key in chart_keys.items()]
+    manifest = {'version': Path(snapshot).name, 'format': PARTS_FORMAT, 'boundaries': boundaries, 'charts': charts,
+                'parts': {**kept, **manifest_parts(results), **manifest_parts(chart_parts)}}
+    write_manifest(name, manifest['version'], manifest, artifact_dir)
+    write_text(Path(artifact_dir) / 'manifests' / name / 'latest', manifest['version'])
+    prune(name, artifact_dir)
+    return manifest
+
+
+def latest_manifest(name, artifact_dir=ARTIFACT_DIR):
+    pointer = Path(artifact_dir) / 'manifests' / name / 'latest'
+    return read_manifest(name, pointer.read_text().strip(), artifact_dir) if pointer.exists() else None
+
+
+def highway_version(url):
+    # Changes whenever either layer is converted again, as the lengths do
+    return '-'.join(str(part) for part in store_version(url, 'karnataka_highways') +
+                    store_version(url, 'karnataka_districts'))
+
+
+def prerender_highways(url, lengths_df, workers=MAX_WORKERS, artifact_dir=ARTIFACT_DIR):
+    # Chart of every district and unit, and map of every district, basemap and overlay, in the default colors
+    version = highway_version(url)
+    districts = lengths_df['DISTRICT'].tolist()
+    tasks = [('highway_chart', unit, district) for unit in HIGHWAY_UNITS for district in districts]
+    tasks += [('highway_map', basemap, overlay, district)
+              for basemap in HIGHWAY_BASEMAPS for overlay in [False, True] for district in districts]
+    results = render_parts(highway_job, (url, lengths_df, artifact_dir), tasks, workers)
+    manifest = {'version': version, 'parts': manifest_parts(results)}
+    write_manifest('highway', version, manifest, artifact_dir)
+    prune('highway', artifact_dir)
+    return manifest
+
+
+def highway_manifest(url, lengths_df, workers=MAX_WORKERS, artifact_dir=ARTIFACT_DIR):
+    # Manifest of the current highway data, pre-rendered first when no process has yet
+    manifest = read_manifest('highway', highway_version(url), artifact_dir)
+    return manifest if manifest is not None else prerender_highways(url, lengths_df, workers, artifact_dir)
+
+
+def prune(name, artifact_dir=ARTIFACT_DIR, keep=KEEP_SNAPSHOTS):
+    # Keeps the newest manifests of the name, then drops parts no manifest names any more
+    folder = Path(artifact_dir) / 'manifests' / name
+    for path in sorted(folder.glob('*.json'), key=lambda path: path.stat().st_mtime)[:-keep]:
+        path.unlink(missing_ok=True)
+    used = set()
+    for path in (Path(artifact_dir) / 'manifests').glob('*/*.json'):
+        try:
+            used.update(manifest_digests(json.loads(path.read_text())['parts']))
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+    cutoff = time.time() - PRUNE_SECONDS
+    for path in (Path(artifact_dir) / 'objects').glob('*/*'):
+        try:
+            if path.name not in used and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            continue
+
+
+def manifest_digests(entry):
+    # Every digest in a manifest's parts, base maps are [digest, map name]
+    if isinstance(entry, dict):
+        for value in entry.values():
+            yield from manifest_digests(value)
+    elif isinstance(entry, list):
+        yield entry[0]
+    elif entry is not None:
+        yield entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-render the dashboard pages of every standard selection.')
+    parser.add_argument('sources', nargs='*', metavar='source', help=f'any of {", ".join(SOURCES)} and highway, '
+                                                                     'all by default')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    args = parser.parse_args(argv)
+    for name in args.sources or [*SOURCES, 'highway']:
+        start = time.perf_counter()
+        if name == 'highway':
+            from dashboard.road_lengths import district_lengths
+            lengths_df = district_lengths(read_boundary(KARNATAKA_GPKG, 'karnataka_highways'),
+                                          read_boundary(KARNATAKA_GPKG, 'karnataka_districts'), 'DISTRICT')
+            manifest = prerender_highways(KARNATAKA_GPKG, lengths_df, args.workers)
+        else:
+            snapshot = latest_snapshot(name)
+            if snapshot is None:
+                parser.error(f'no published snapshot of {name}, run python -m dashboard.pipeline {name} first')
+            manifest = prerender_fires(name, snapshot, args.workers)
+        print(f'{name}: {manifest["version"]} ({time.perf_counter() - start:.1f}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from dashboard.viewport import MAP_SIZE, viewport_bbox
+
+# Road classes of the highway layer, a road is in a class when its ref starts with the prefix
+ROAD_CLASSES = ['NH', 'SH']
+# Zoom levels past the district's fit the simplified roads stay within a pixel at
+SIMPLIFY_ZOOMS = 2
+
+
+def road_index(roads_gdf, catalog, ref_col='ref', classes=ROAD_CLASSES):
+    # Road geometry of every class, split from the layer once, and the roads of each class reaching into
+    # every district's viewport, found with one STRtree query per class for all districts at once
+    refs = roads_gdf[ref_col].fillna('').astype(str)
+    names = list(catalog)
+    boxes = shapely.box(*np.array([viewport_bbox(catalog, name) for name in names]).T)
+    geoms, by_district = {}, {name: {} for name in names}
+    for road_class in classes:
+        geoms[road_class] = roads_gdf.geometry.to_numpy()[refs.str.startswith(road_class).to_numpy()]
+        box_pos, road_pos = shapely.STRtree(geoms[road_class]).query(boxes, predicate='intersects')
+        order = np.lexsort((road_pos, box_pos))
+        used, starts = np.unique(box_pos[order], return_index=True)
+        for pos, rows in zip(used, np.split(road_pos[order], starts[1:])):
+            by_district[names[pos]][road_class] = rows
+    return {'geoms': geoms, 'by_district': by_district, 'crs': roads_gdf.crs}
+
+
+def district_roads(index, catalog, district, road_class, map_size=MAP_SIZE):
+    # Roads of one class around the district, cut to its viewport and simplified for the map's zoom,
+    # so the map gets the roads in view whatever the size of the whole layer
+    minx, miny, maxx, maxy = bbox = viewport_bbox(catalog, district)
+    rows = index['by_district'][district].get(road_class, np.empty(0, dtype=int))
+    geoms = shapely.clip_by_rect(index['geoms'][road_class][rows], *bbox)
+    tolerance = max((maxx - minx) / map_size[0], (maxy - miny) / map_size[1]) / 2 ** SIMPLIFY_ZOOMS
+    # Lines need no topology kept, which is 20 times faster than the default
+    geoms = shapely.simplify(geoms, tolerance, preserve_topology=False)
+    return gpd.GeoDataFrame(geometry=geoms[~shapely.is_empty(geoms)], crs=index['crs'])
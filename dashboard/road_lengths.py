@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+from pyproj import Transformer
+
+from dashboard.road_layers import ROAD_CLASSES
+
+# Worker processes for the overlay, and roads per chunk, a layer of one chunk is measured in this process
+MAX_WORKERS = os.cpu_count() or 1
+CHUNK_ROADS = 20_000
+
+# District polygons of a worker process, sent once per process instead of with every chunk
+_districts = {}
+
+
+def utm_epsg(lon, lat):
+    # UTM zone of every point, lengths within its zone are off by under 0.1%
+    zone = np.clip((np.nan_to_num(lon) + 180) // 6 + 1, 1, 60).astype(int)
+    return np.where(np.nan_to_num(lat) >= 0, 32600, 32700) + zone
+
+
+def utm_lengths(geoms):
+    # Metres of every line measured in the UTM zone of its centre, one projection per zone
+    bounds = shapely.bounds(geoms)
+    epsg = utm_epsg((bounds[:, 0] + bounds[:, 2]) / 2, (bounds[:, 1] + bounds[:, 3]) / 2)
+    lengths = np.zeros(len(geoms))
+    for code in np.unique(epsg):
+        rows = epsg == code
+        transformer = Transformer.from_crs(4326, int(code), always_xy=True)
+        projected = shapely.transform(geoms[rows], lambda coords: np.column_stack(
+            transformer.transform(coords[:, 0], coords[:, 1])))
+        lengths[rows] = shapely.length(projected)
+    return lengths
+
+
+def set_districts(geoms):
+    _districts['geoms'] = geoms
+    _districts['tree'] = shapely.STRtree(geoms)
+    shapely.prepare(geoms)
+
+
+def chunk_lengths(geoms, codes):
+    # Metres of road per district and class for one chunk of roads. The overlay runs on degrees,
+    # the parts are measured in their UTM zones.
+    districts = _districts['geoms']
+    # Box overlaps from the tree, then the tests on the prepared districts, which the tree's predicate would not use
+    road_pos, district_pos = _districts['tree'].query(geoms)
+    meets = shapely.intersects(districts[district_pos], geoms[road_pos])
+    road_pos, district_pos = road_pos[meets], district_pos[meets]
+    roads = geoms[road_pos]
+    # Roads inside one district count whole, only those crossing a border are cut
+    inside = shapely.contains_properly(districts[district_pos], roads)
+    parts = roads.copy()
+    parts[~inside] = shapely.intersection(roads[~inside], districts[district_pos[~inside]])
+    lengths = pd.DataFrame({'district': district_pos, 'class': codes[road_pos], 'length': utm_lengths(parts)})
+    return lengths.groupby(['district', 'class'])['length'].sum()
+
+
+def road_class_codes(refs, classes=ROAD_CLASSES):
+    # Position of the first class a road's ref starts with, -1 for roads in no class
+    refs = refs.fillna('').astype(str)
+    codes = np.full(len(refs), -1)
+    for code, road_class in reversed(list(enumerate(classes))):
+        codes[refs.str.startswith(road_class).to_numpy()] = code
+    return codes
+
+
+def district_lengths(roads_gdf, districts_gdf, name_col, ref_col='ref', classes=ROAD_CLASSES,
+                     workers=MAX_WORKERS, chunk_roads=CHUNK_ROADS):
+    # Kilometres of every road class within every district, a row per district and a column per class.
+    # Roads are split into chunks along a space-filling curve, so each chunk's roads lie close together
+    # and meet few districts, and the chunks are overlaid on the districts in parallel worker processes.
+    codes = road_class_codes(roads_gdf[ref_col], classes)
+    roads = roads_gdf.geometry[codes >= 0].to_crs(4326)
+    codes = codes[codes >= 0]
+    order = np.argsort(roads.hilbert_distance().to_numpy(), kind='stable') if len(roads) else []
+    geoms, codes = roads.to_numpy()[order], codes[order]
+    chunks = [(geoms[i:i + chunk_roads], codes[i:i + chunk_roads]) for i in range(0, len(geoms), chunk_roads)]
+    district_geoms = districts_gdf.geometry.to_crs(4326).to_numpy()
+
+    if len(chunks) <= 1 or workers <= 1:
+        set_districts(district_geoms)
+        results = [chunk_lengths(*chunk) for chunk in chunks]
+    else:
+        # Spawned, not forked, the app's server process has threads running
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=set_districts, initargs=(district_geoms,)) as pool:
+            results = list(pool.map(chunk_lengths, *zip(*chunks)))
+
+    table = np.zeros((len(district_geoms), len(classes)))
+    for result in results:
+        np.add.at(table, (result.index.get_level_values(0), result.index.get_level_values(1)), result.to_numpy())
+    lengths = pd.DataFrame(table / 1000, columns=classes)
+    lengths.insert(0, name_col, districts_gdf[name_col].to_numpy())
+    return lengths
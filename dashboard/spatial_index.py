@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+
+def region_index(boundaries_gdf, name_col):
+    # Prepared region polygons, built once per boundary dataset
+    geoms = boundaries_gdf.geometry.values.copy()
+    shapely.prepare(geoms)
+    return {'geoms': geoms, 'names': boundaries_gdf[name_col].to_numpy(dtype=object)}
+
+
+def locate_regions(x, y, regions_idx):
+    # STRtree over the fire points, queried once with every prepared region polygon.
+    # Gives each fire its region, None outside all regions. The points only live for the query.
+    points = shapely.points(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    region_pos, point_pos = shapely.STRtree(points).query(regions_idx['geoms'], predicate='intersects')
+
+    # A point on a shared border keeps the first region found
+    regions = np.full(len(points), None, dtype=object)
+    regions[point_pos[::-1]] = regions_idx['names'][region_pos[::-1]]
+    return regions
+
+
+def fire_index(x, y, regions_idx):
+    return point_index(x, y, locate_regions(x, y, regions_idx))
+
+
+def point_index(x, y, regions):
+    # Fire rows of every region, and the fires sorted by x so a bbox is a binary search and a y filter.
+    # Plain arrays, no geometry objects, so a million fires index in tens of MB.
+    regions = pd.Categorical(regions)
+    codes = regions.codes
+    known = np.flatnonzero(codes >= 0)
+    order = known[np.argsort(codes[known], kind='stable')]
+    used, starts = np.unique(codes[order], return_index=True)
+    by_region = dict(zip(regions.categories[used], np.split(order, starts[1:]))) if len(order) else {}
+    x = np.asarray(x, dtype=float)
+    x_order = np.argsort(x, kind='stable')
+    return {
+        'x_order': x_order,
+        'x_sorted': x[x_order],
+        'y': np.asarray(y, dtype=float),
+        'regions': regions,
+        'by_region': by_region,
+    }
+
+
+def fires_in_region(index, region):
+    return index['by_region'].get(region, np.empty(0, dtype=int))
+
+
+def fires_in_bbox(index, bbox):
+    # bbox is (minx, miny, maxx, maxy) in the fire coordinates
+    minx, miny, maxx, maxy = bbox
+    start = np.searchsorted(index['x_sorted'], minx, side='left')
+    stop = np.searchsorted(index['x_sorted'], maxx, side='right')
+    rows = index['x_order'][start:stop]
+    y = index['y'][rows]
+    return np.sort(rows[(y >= miny) & (y <= maxy)])
@@ -0,0 +1,306 @@
+import argparse
+import os
+import re
+import shutil
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from dashboard.boundary_store import CANADA_BOUNDARIES, KARNATAKA_GPKG, US_BOUNDARIES, read_boundary, store_version
+from dashboard.disk_cache import CACHE_DIR
+from dashboard.pipeline import SNAPSHOT_DIR, SNAPSHOT_FORMAT, SOURCES, latest_snapshot, read_snapshot
+from dashboard.road_lengths import road_class_codes
+from dashboard.road_layers import ROAD_CLASSES
+from dashboard.spatial_index import fires_in_bbox
+
+# Tile mode: maps load boundaries, roads and fires as vector tiles instead of inlining them, on with DASHBOARD_TILES=1
+TILES_ENABLED = os.environ.get('DASHBOARD_TILES', '') not in ('', '0')
+# The tile endpoint, and the URL the browser reaches it at, override DASHBOARD_TILE_URL behind a proxy
+TILE_HOST = os.environ.get('DASHBOARD_TILE_HOST', '127.0.0.1')
+TILE_PORT = int(os.environ.get('DASHBOARD_TILE_PORT', 8765))
+TILE_URL = os.environ.get('DASHBOARD_TILE_URL', f'http://localhost:{TILE_PORT}')
+# Cut tiles, one folder per layer version, override with DASHBOARD_TILE_DIR
+TILE_DIR = Path(os.environ.get('DASHBOARD_TILE_DIR', CACHE_DIR / 'tiles'))
+
+# Tile grid: coordinates per tile side, geometry kept past the tile edge so lines and fills join,
+# the deepest zoom cut (the map overzooms past it) and fire cells per tile side
+EXTENT = 4096
+BUFFER = 64
+MAX_ZOOM = 14
+FIRE_CELLS = 64
+# Layer indexes kept in memory, the fire layers get a new one with every snapshot
+MAX_INDEXES = 8
+
+EARTH_HALF = 20037508.342789244
+
+
+def boundary_frame(name_col):
+    return lambda gdf: gdf[[name_col, 'geometry']]
+
+
+def highway_frame(gdf):
+    # NH and SH roads only, with their class for styling
+    codes = road_class_codes(gdf['ref'])
+    roads = gdf[codes >= 0].assign(road_class=np.array(ROAD_CLASSES)[codes[codes >= 0]])
+    return roads[['road_class', 'ref', 'geometry']]
+
+
+# Vector layers cut from the boundary store, the name in the URL is also the layer name inside the tile
+TILE_LAYERS = {
+    'canada': {'source': CANADA_BOUNDARIES, 'layer': None, 'frame': boundary_frame('Province')},
+    'us': {'source': US_BOUNDARIES, 'layer': None, 'frame': boundary_frame('State')},
+    'karnataka_districts': {'source': KARNATAKA_GPKG, 'layer': 'karnataka_districts',
+                            'frame': boundary_frame('DISTRICT')},
+    'karnataka_highways': {'source': KARNATAKA_GPKG, 'layer': 'karnataka_highways', 'frame': highway_frame},
+}
+# /<layer>/<z>/<x>/<y>.pbf, fire layers as /fires/<source>/<snapshot file>/<z>/<x>/<y>.pbf
+TILE_PATH = re.compile(r'^/(?P<layer>\w+|fires/\w+/[\w.]+)/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.pbf$')
+# Snapshot files of the current format, not their grids nor the latest pointer
+SNAPSHOT_NAME = re.compile(rf'^\w+\.v{SNAPSHOT_FORMAT}\.parquet$')
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def mercator(x, y):
+    lat = np.radians(np.clip(y, -85.05112878, 85.05112878))
+    return np.radians(x) * 6378137, np.log(np.tan(np.pi / 4 + lat / 2)) * 6378137
+
+
+def tile_bounds(z, x, y):
+    # Web Mercator metres of one tile
+    size = 2 * EARTH_HALF / 2 ** z
+    minx, maxy = -EARTH_HALF + x * size, EARTH_HALF - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def shape_index(gdf):
+    # Geometry in Web Mercator under an STRtree, and the properties of every feature
+    geoms = shapely.transform(gdf.geometry.to_crs(4326).to_numpy(),
+                              lambda coords: np.column_stack(mercator(coords[:, 0], coords[:, 1])))
+    attributes = gdf.drop(columns=gdf.geometry.name)
+    properties = attributes.astype(object).where(attributes.notna(), None).to_dict('records')
+    return {'geoms': geoms, 'tree': shapely.STRtree(geoms), 'properties': properties}
+
+
+def fire_point_index(fires, area_col):
+    # Fires sorted by Mercator x, for the same bbox search as the app's fire index
+    fires = fires[fires['x'].notna() & fires['y'].notna()]
+    x, y = mercator(fires['x'].to_numpy(dtype=float), fires['y'].to_numpy(dtype=float))
+    x_order = np.argsort(x, kind='stable')
+    return {'x_order': x_order, 'x_sorted': x[x_order], 'x': x, 'y': y, 'area': fires[area_col].to_numpy(dtype=float)}
+
+
+def layer_version(layer):
+    # The version a layer's tiles are cut from, its stored file for static layers and the snapshot for fires
+    if layer.startswith('fires/'):
+        return layer.split('/')[2]
+    spec = TILE_LAYERS[layer]
+    mtime, size = store_version(spec['source'], spec['layer'])
+    return f'{mtime}-{size}'
+
+
+def layer_index(layer, version):
+    key = (layer, version)
+    with _indexes_lock:
+        if key in _indexes:
+            return _indexes[key]
+    if layer.startswith('fires/'):
+        _, name, snapshot = layer.split('/')
+        index = fire_point_index(read_snapshot(Path(SNAPSHOT_DIR) / name / snapshot), SOURCES[name]['area_col'])
+        prune_fire_tiles(name)
+    else:
+        spec = TILE_LAYERS[layer]
+        index = shape_index(spec['frame'](read_boundary(spec['source'], spec['layer'])))
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.pop(next(iter(_indexes)))
+    return index
+
+
+def prune_fire_tiles(name):
+    # Tiles of snapshots the pipeline has pruned are not requested again
+    folder = TILE_DIR / 'fires' / name
+    if folder.exists():
+        for old in folder.iterdir():
+            if not (Path(SNAPSHOT_DIR) / name / old.name).exists():
+                shutil.rmtree(old, ignore_errors=True)
+
+
+def to_tile(geoms, bounds):
+    # Mercator metres to integer tile coordinates, y down, snapped so polygons stay valid on the grid
+    minx, miny, maxx, maxy = bounds
+    scale = EXTENT / (maxx - minx)
+    geoms = shapely.transform(geoms, lambda coords: np.column_stack([(coords[:, 0] - minx) * scale,
+                                                                     (maxy - coords[:, 1]) * scale]))
+    return shapely.set_precision(geoms, 1)
+
+
+def shape_features(index, bounds):
+    minx, miny, maxx, maxy = bounds
+    pad = (maxx - minx) * BUFFER / EXTENT
+    rows = index['tree'].query(shapely.box(minx - pad, miny - pad, maxx + pad, maxy + pad))
+    geoms = shapely.clip_by_rect(index['geoms'][np.sort(rows)], minx - pad, miny - pad, maxx + pad, maxy + pad)
+    # Detail under a tile coordinate is lost to the snapping anyway
+    geoms = to_tile(shapely.simplify(geoms, (maxx - minx) / EXTENT, preserve_topology=False), bounds)
+    return [{'geometry': geom, 'properties': index['properties'][row]}
+            for row, geom in zip(np.sort(rows), geoms) if not geom.is_empty]
+
+
+def fire_features(index, bounds):
+    # Fires merged into cells of FIRE_CELLS per tile side, at their mean position with their count and area,
+    # so a tile holds at most FIRE_CELLS squared points at any zoom
+    minx, miny, maxx, maxy = bounds
+    rows = fires_in_bbox(index, bounds)
+    scale = EXTENT / (maxx - minx)
+    tx, ty = (index['x'][rows] - minx) * scale, (maxy - index['y'][rows]) * scale
+    cell = EXTENT // FIRE_CELLS
+    cells = pd.DataFrame({'key': (tx // cell).astype(int) * FIRE_CELLS + (ty // cell).astype(int),
+                          'tx': tx, 'ty': ty, 'area': index['area'][rows]})
+    cells = cells.groupby('key').agg(fires=('tx', 'size'), tx=('tx', 'mean'), ty=('ty', 'mean'), area=('area', 'sum'))
+    return [{'geometry': shapely.Point(round(x), round(y)), 'properties': {'fires': int(n), 'area': round(float(a), 1)}}
+            for x, y, n, a in zip(cells['tx'], cells['ty'], cells['fires'], np.nan_to_num(cells['area']))]
+
+
+def cut_tile(layer, version, z, x, y):
+    # Only tile mode needs the encoder
+    import mapbox_vector_tile
+    bounds = tile_bounds(z, x, y)
+    index = layer_index(layer, version)
+    if layer.startswith('fires/'):
+        name, features = 'fires', fire_features(index, bounds)
+    else:
+        name, features = layer, shape_features(index, bounds)
+    return mapbox_vector_tile.encode([{'name': name, 'features': features}],
+                                     default_options={'extents': EXTENT, 'y_coord_down': True})
+
+
+def read_tile(layer, z, x, y, tile_dir=TILE_DIR):
+    # Tile bytes from the tile folder, cut and stored on first request
+    version = layer_version(layer)
+    path = Path(tile_dir) / layer / version / str(z) / str(x) / f'{y}.pbf'
+    if path.exists():
+        return path.read_bytes()
+    tile = cut_tile(layer, version, z, x, y)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_tile(path, tile)
+    return tile
+
+
+def write_tile(path, tile):
+    # Concurrent requests for one tile write the same bytes, the last rename wins
+    tmp = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+    tmp.write_bytes(tile)
+    os.replace(tmp, path)
+
+
+def tile_request(path):
+    # Tile bytes for a request path, None for paths that name no tile or no layer
+    match = TILE_PATH.match(path)
+    if match is None:
+        return None
+    layer, z, x, y = match['layer'], int(match['z']), int(match['x']), int(match['y'])
+    if z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return None
+    if layer.startswith('fires/'):
+        _, name, snapshot = layer.split('/')
+        if name not in SOURCES or not SNAPSHOT_NAME.match(snapshot):
+            return None
+        if not (Path(SNAPSHOT_DIR) / name / snapshot).is_file():
+            return None
+    elif layer not in TILE_LAYERS:
+        return None
+    return read_tile(layer, z, x, y)
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            tile = tile_request(self.path.split('?')[0])
+        except Exception:
+            # A layer that cannot be read or cut, the map leaves the tile out
+            traceback.print_exc()
+            self.send_error(500)
+            return
+        if tile is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.mapbox-vector-tile')
+        self.send_header('Content-Length', str(len(tile)))
+        # The map page is an iframe with its own origin, fire tile URLs change with every snapshot
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'max-age=86400' if self.path.startswith('/fires/') else 'max-age=300')
+        self.end_headers()
+        self.wfile.write(tile)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_tile_server(host=TILE_HOST, port=TILE_PORT):
+    # Serves tiles from a daemon thread of this process, returns the server or None when another
+    # dashboard process already serves the port, which cuts the same tiles into the same folder
+    try:
+        server = ThreadingHTTPServer((host, port), TileHandler)
+    except OSError:
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def tile_url(layer):
+    return f'{TILE_URL}/{layer}/{{z}}/{{x}}/{{y}}.pbf'
+
+
+def fire_layer(name, snapshot):
+    return f'fires/{name}/{Path(snapshot).name}'
+
+
+def seed(layer, max_zoom, tile_dir=TILE_DIR):
+    # Cuts every tile the layer reaches into up to max_zoom, returns the number of tiles
+    index = layer_index(layer, layer_version(layer))
+    if 'tree' in index:
+        minx, miny, maxx, maxy = shapely.total_bounds(index['geoms'])
+    elif not len(index['x']):
+        return 0
+    else:
+        minx, maxx = index['x_sorted'][[0, -1]]
+        miny, maxy = index['y'].min(), index['y'].max()
+    count = 0
+    for z in range(max_zoom + 1):
+        size = 2 * EARTH_HALF / 2 ** z
+        cols = range(int((minx + EARTH_HALF) // size), min(int((maxx + EARTH_HALF) // size), 2 ** z - 1) + 1)
+        rows = range(int((EARTH_HALF - maxy) // size), min(int((EARTH_HALF - miny) // size), 2 ** z - 1) + 1)
+        for x in cols:
+            for y in rows:
+                read_tile(layer, z, x, y, tile_dir)
+                count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cut vector tiles ahead of requests, or serve them.')
+    parser.add_argument('layers', nargs='*', default=list(TILE_LAYERS),
+                        help='layers to cut, the boundary and road layers by default, fires/<source> for the '
+                             'latest fire snapshot')
+    parser.add_argument('--max-zoom', type=int, default=8)
+    parser.add_argument('--serve', action='store_true', help='serve tiles on DASHBOARD_TILE_PORT instead')
+    args = parser.parse_args(argv)
+    if args.serve:
+        ThreadingHTTPServer((TILE_HOST, TILE_PORT), TileHandler).serve_forever()
+        return
+    for layer in args.layers:
+        if layer.startswith('fires/'):
+            layer = fire_layer(layer.split('/')[1], latest_snapshot(layer.split('/')[1]))
+        print(f'{layer}: {seed(layer, args.max_zoom)} tiles')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import contextlib
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from dashboard.disk_cache import CACHE_DIR
+
+# Tracing is on for every rerun with DASHBOARD_TRACE=1, or per rerun when the app asks for it (?debug=1).
+# Off, every call below returns after one thread-local lookup.
+def is_on(value):
+    # How DASHBOARD_TRACE and ?debug= are read: set, and not 0
+    return value not in (None, '', '0')
+
+
+TRACE_ENABLED = is_on(os.environ.get('DASHBOARD_TRACE'))
+# JSON lines (one per rerun) and Prometheus textfiles (one per app), override with DASHBOARD_TRACE_DIR
+TRACE_DIR = Path(os.environ.get('DASHBOARD_TRACE_DIR', CACHE_DIR / 'trace'))
+# Size at which an app's JSON lines move to <app>.jsonl.1, replacing the older ones, so at most twice this is kept.
+# Override with DASHBOARD_TRACE_MAX_BYTES
+TRACE_MAX_BYTES = int(os.environ.get('DASHBOARD_TRACE_MAX_BYTES', 50 * 1024 * 1024))
+
+# Streamlit runs every session's script in its own thread, so the current rerun is thread local
+_local = threading.local()
+# Cache hit/miss counters since the process started, for the Prometheus counters
+_cache_totals = {}
+_totals_lock = threading.Lock()
+
+
+def current_run():
+    return getattr(_local, 'run', None)
+
+
+def start_run(app, enabled=False):
+    # Opens the trace of one rerun, the clock of the first checkpoint starts here
+    if not (enabled or TRACE_ENABLED):
+        _local.run = None
+        return None
+    now = time.perf_counter()
+    _local.run = {'app': app, 'time': time.time(), 'start': now, 'lap': now,
+                  'stages': [], 'caches': [], 'html_bytes': None, 'calls': []}
+    return _local.run
+
+
+def checkpoint(name):
+    # Time since the previous checkpoint (or the start of the rerun) is recorded as the stage `name`
+    run = current_run()
+    if run is None:
+        return
+    now = time.perf_counter()
+    run['stages'].append({'stage': name, 'seconds': now - run['lap']})
+    run['lap'] = now
+
+
+@contextlib.contextmanager
+def stage(name):
+    # Times a block as its own stage, for code that is not a straight run of sections
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run = current_run()
+        if run is not None:
+            run['stages'].append({'stage': name, 'seconds': time.perf_counter() - start})
+            run['lap'] = time.perf_counter()
+
+
+def traced_cache(cache_decorator, name=None):
+    # Use in place of the cache decorator: a call that runs the function body is a miss, any other a hit
+    def decorator(func):
+        cache_name = name or func.__name__
+
+        @functools.wraps(func)
+        def body(*args, **kwargs):
+            # Runs inside the innermost traced call, loaders calling loaders each get their own frame
+            run = current_run()
+            if run is not None and run['calls']:
+                run['calls'][-1]['miss'] = True
+            return func(*args, **kwargs)
+
+        cached = cache_decorator(body)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            run = current_run()
+            if run is None:
+                return cached(*args, **kwargs)
+            run['calls'].append({'miss': False})
+            start = time.perf_counter()
+            try:
+                result = cached(*args, **kwargs)
+            finally:
+                outcome = 'miss' if run['calls'].pop()['miss'] else 'hit'
+            run['caches'].append({'cache': cache_name, 'result': outcome, 'seconds': time.perf_counter() - start})
+            with _totals_lock:
+                key = (run['app'], cache_name, outcome)
+                _cache_totals[key] = _cache_totals.get(key, 0) + 1
+            return result
+
+        wrapper.clear = getattr(cached, 'clear', None)
+        return wrapper
+    return decorator
+
+
+def record_html(html):
+    # Size of the HTML sent to the browser, returns the HTML so it can wrap the render call
+    run = current_run()
+    if run is not None:
+        run['html_bytes'] = (run['html_bytes'] or 0) + len(html.encode())
+    return html
+
+
+def finish_run(trace_dir=TRACE_DIR):
+    # Closes the rerun and exports it, returns the finished record for the debug panel
+    run = current_run()
+    if run is None:
+        return None
+    _local.run = None
+    record = {
+        'app': run['app'],
+        'time': run['time'],
+        'seconds': time.perf_counter() - run['start'],
+        'stages': run['stages'],
+        'caches': run['caches'],
+        'html_bytes': run['html_bytes'],
+    }
+    trace_dir = Path(trace_dir)
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    append_line(trace_dir / f'{run["app"]}.jsonl', json.dumps(record))
+    write_textfile(trace_dir / f'{run["app"]}.prom', prometheus_text(record))
+    return record
+
+
+def append_line(path, line, max_bytes=TRACE_MAX_BYTES):
+    # Sessions of several processes append to one file, a rotation another one already made is no error
+    try:
+        if path.stat().st_size >= max_bytes:
+            os.replace(path, path.with_name(f'{path.name}.1'))
+    except FileNotFoundError:
+        pass
+    with open(path, 'a') as f:
+        f.write(line + '\n')
+
+
+def prometheus_text(record):
+    app = record['app']
+    lines = [
+        '# HELP dashboard_run_seconds Duration of the last rerun.',
+        '# TYPE dashboard_run_seconds gauge',
+        f'dashboard_run_seconds{{app="{app}"}} {record["seconds"]:.6f}',
+        '# HELP dashboard_stage_seconds Duration of each stage of the last rerun.',
+        '# TYPE dashboard_stage_seconds gauge',
+    ]
+    stage_seconds = {}
+    for entry in record['stages']:
+        stage_seconds[entry['stage']] = stage_seconds.get(entry['stage'], 0) + entry['seconds']
+    lines += [f'dashboard_stage_seconds{{app="{app}",stage="{name}"}} {seconds:.6f}'
+              for name, seconds in stage_seconds.items()]
+    lines += [
+        '# HELP dashboard_cache_requests_total Cached loader calls since the server started, by result.',
+        '# TYPE dashboard_cache_requests_total counter',
+    ]
+    with _totals_lock:
+        totals = sorted(_cache_totals.items())
+    lines += [f'dashboard_cache_requests_total{{app="{key_app}",cache="{cache}",result="{outcome}"}} {count}'
+              for (key_app, cache, outcome), count in totals if key_app == app]
+    if record['html_bytes'] is not None:
+        lines += [
+            '# HELP dashboard_html_bytes Size of the HTML payload of the last rerun.',
+            '# TYPE dashboard_html_bytes gauge',
+            f'dashboard_html_bytes{{app="{app}"}} {record["html_bytes"]}',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path, text):
+    # The textfile collector must never read a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def debug_panel(container, record):
+    # Stage timings, cache results and payload size of the rerun that just finished
+    if record is None:
+        return
+    lines = [f'**Rerun** {record["seconds"] * 1000:.0f} ms']
+    lines += [f'{entry["stage"]}: {entry["seconds"] * 1000:.1f} ms' for entry in record['stages']]
+    lines += [f'{entry["cache"]} {entry["result"]}: {entry["seconds"] * 1000:.1f} ms' for entry in record['caches']]
+    if record['html_bytes'] is not None:
+        lines.append(f'HTML payload: {record["html_bytes"] / 1024:.0f} KB')
+    container.expander('Debug', expanded=True).markdown('  \n'.join(lines))
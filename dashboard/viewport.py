@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+# Map size the zoom is fitted to, the zoom range and how far past the region's bounds the map shows
+MAP_SIZE = (900, 600)
+ZOOM_RANGE = (2.5, 8)
+ZOOM_PADDING = 1
+VIEWPORT_MARGIN = 0.5
+
+
+def mercator_y(lat):
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def fit_zoom(geom, map_size=MAP_SIZE):
+    # Web mercator zoom that fits the geometry's bounds into the map
+    minx, miny, maxx, maxy = geom.bounds
+    lon_span = maxx - minx
+    if lon_span > 180:
+        # Regions across the antimeridian (Alaska) measured on 0-360 longitudes
+        shifted = shapely.transform(geom, lambda coords: np.c_[coords[:, 0] % 360, coords[:, 1]])
+        lon_span = shifted.bounds[2] - shifted.bounds[0]
+    width, height = map_size
+    lon_zoom = np.log2(width * 360 / (256 * lon_span))
+    lat_zoom = np.log2(height * 2 * np.pi / (256 * (mercator_y(maxy) - mercator_y(miny))))
+    return min(lon_zoom, lat_zoom)
+
+
+def region_catalog(boundaries_gdf, name_col):
+    # Bounds, centroid and zoom of every region, computed once per boundary dataset.
+    # Centroids are taken in an equal-area projection instead of on degrees.
+    centroids = boundaries_gdf.geometry.to_crs('EPSG:6933').centroid.to_crs(4326)
+    catalog = {}
+    for name, geom, centroid in zip(boundaries_gdf[name_col], boundaries_gdf.geometry, centroids):
+        zoom = np.clip(fit_zoom(geom) - ZOOM_PADDING, *ZOOM_RANGE)
+        catalog[name] = {
+            'bbox': tuple(float(b) for b in geom.bounds),
+            'centroid': (float(centroid.y), float(centroid.x)),
+            'zoom': round(float(zoom), 1),
+        }
+    return catalog
+
+
+def viewport_bbox(catalog, region, margin=VIEWPORT_MARGIN):
+    # Region bounds grown by a fraction of their size on every side
+    minx, miny, maxx, maxy = catalog[region]['bbox']
+    dx, dy = (maxx - minx) * margin, (maxy - miny) * margin
+    return (minx - dx, max(miny - dy, -90), maxx + dx, min(maxy + dy, 90))
+
+
+def region_summary(fires_idx, inside, catalog):
+    # Fire count per region for the fires outside the viewport, placed at the region centroids
+    outside = np.ones(len(fires_idx['regions']), dtype=bool)
+    outside[inside] = False
+    counts = pd.Series(fires_idx['regions'][outside]).value_counts()
+    return [[*catalog[region]['centroid'], region, int(count)] for region, count in counts.items()
+            if count and region in catalog]
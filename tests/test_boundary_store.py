@@ -0,0 +1,56 @@
+# Revalidation of remote boundary sources: run from the repository root with python -m pytest
+import pytest
+
+from dashboard import boundary_store
+
+URL = 'https://example.com/boundaries.gpkg'
+
+
+@pytest.fixture
+def path(tmp_path):
+    # A stored copy converted from the validator 'v1'
+    path = boundary_store.store_path(URL, 'districts', tmp_path)
+    path.write_bytes(b'stored')
+    boundary_store.write_source(path, 'v1')
+    return path
+
+
+@pytest.fixture
+def heads(monkeypatch):
+    # Validators the server answers with, one per HEAD request
+    heads = []
+
+    def remote_validator(url):
+        validator = heads.pop(0)
+        if isinstance(validator, Exception):
+            raise validator
+        return validator
+    monkeypatch.setattr(boundary_store, 'remote_validator', remote_validator)
+    return heads
+
+
+def test_not_checked_again_within_the_interval(path, heads):
+    # No HEAD request is answered
+    assert not boundary_store.is_stale(URL, path)
+
+
+@pytest.mark.parametrize('validator, stale', [('v1', False), ('v2', True), (None, True), (OSError(), False)])
+def test_stale_when_the_validator_changes(path, heads, validator, stale):
+    heads.append(validator)
+    assert boundary_store.is_stale(URL, path, check_seconds=0) == stale
+    # The check is recorded whatever its answer, the next one waits for the interval
+    assert not boundary_store.is_stale(URL, path)
+
+
+def test_stored_copy_is_kept_when_the_source_cannot_be_converted(path, heads, monkeypatch):
+    def convert(source, layer, store_dir):
+        raise OSError('download failed')
+    monkeypatch.setattr(boundary_store, 'convert', convert)
+    # Last checked long ago
+    boundary_store.write_json(boundary_store.source_path(path), {'validator': 'v1', 'checked': 0})
+    heads.append('v2')
+    assert boundary_store.stored(URL, 'districts', path.parent) == path
+    assert not heads
+    path.unlink()
+    with pytest.raises(OSError, match='download failed'):
+        boundary_store.stored(URL, 'districts', path.parent)
@@ -0,0 +1,46 @@
+# Area cube against the groupby, pivot and melt the pages ran per rerun: run from the repository root with
+# python -m pytest
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.cube import area_cube, region_areas
+from dashboard.pages import PAGES
+
+
+def baseline_areas(df, region_col, status_col, area_col, statuses, region, factor):
+    # The chain each page ran before the cube, unit applied to the summed areas
+    area_sdf = df.groupby([region_col, status_col])[area_col].sum().reset_index()
+    area_sdf = area_sdf.pivot(index=region_col, columns=status_col, values=area_col).fillna(0)
+    area_sdf.columns.name = None
+    area_sdf = area_sdf * factor
+    available_columns = [col for col in statuses if col in area_sdf.columns]
+    area_final = area_sdf.reset_index().melt(id_vars=[region_col], value_vars=available_columns,
+                                             var_name=status_col, value_name='Area')
+    return area_final[area_final[region_col] == region].drop(columns=region_col).reset_index(drop=True)
+
+
+def fires(page, n=500, seed=0):
+    # The page's statuses but the last, which never appears, and a region with no fires at all
+    rng = np.random.default_rng(seed)
+    area = rng.random(n) * 100
+    area[::50] = np.nan
+    return pd.DataFrame({page['region_col']: rng.choice(['A', 'B', 'C'], n),
+                         page['status_col']: rng.choice(page['statuses'][:-1], n), page['area_col']: area})
+
+
+@pytest.mark.parametrize('name', list(PAGES))
+def test_region_areas_match_the_pivot(name):
+    page = PAGES[name]
+    df = fires(page)
+    # One region with fires in a single status only
+    df.loc[df[page['region_col']] == 'C', page['status_col']] = page['statuses'][0]
+    args = (page['region_col'], page['status_col'], page['area_col'], page['statuses'])
+    cube = area_cube(df, *args)
+    for region in ['A', 'B', 'C', 'no fires']:
+        for factor in page['units'].values():
+            expected = baseline_areas(df, *args, region, factor)
+            actual = region_areas(cube, region, factor)
+            assert actual[page['status_col']].tolist() == expected[page['status_col']].tolist()
+            np.testing.assert_allclose(actual['Area'].to_numpy(dtype=float), expected['Area'].to_numpy(dtype=float))
+            assert actual['Area'].dropna().empty == expected['Area'].dropna().empty
@@ -0,0 +1,132 @@
+# Refreshes of the data service with stand-in publish and statistics steps: run from the repository root with
+# python -m pytest
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from dashboard.data_service import DataService
+
+
+def published(name, snapshot_dir):
+    return Path(snapshot_dir) / 'snapshot.parquet'
+
+
+def sums(name):
+    return 'sums'
+
+
+def failing(message):
+    def step(*args):
+        raise OSError(message)
+    return step
+
+
+def service(tmp_path, publish=published, statistics=sums, prerender=None):
+    return DataService(names=['canada'], snapshot_dir=tmp_path, publish=publish, statistics=statistics,
+                       prerender=prerender)
+
+
+def refresh(data):
+    # One refresh in this thread, as the service's thread runs a requested one
+    future = data.request('canada')
+    data._refresh('canada')
+    return future.result(timeout=0)
+
+
+def test_first_load_shows_the_statistics_until_published(tmp_path):
+    shown = []
+
+    def publish(name, snapshot_dir):
+        shown.append(data.current(name)['statistics'])
+        return published(name, snapshot_dir)
+    data = service(tmp_path, publish=publish)
+    refresh(data)
+    assert shown == ['sums']
+    assert data.current('canada')['snapshot'] == tmp_path / 'snapshot.parquet'
+    assert data.current('canada')['statistics'] is None
+
+
+def test_failed_statistics_still_publish(tmp_path):
+    data = service(tmp_path, statistics=failing('no statistics'))
+    refresh(data)
+    assert data.current('canada')['snapshot'] == tmp_path / 'snapshot.parquet'
+    assert data.current('canada')['error'] is None
+
+
+@pytest.mark.parametrize('statistics, shown', [(sums, 'sums'), (failing('no statistics'), None)])
+def test_failed_publish_keeps_the_record_with_its_error(tmp_path, statistics, shown):
+    data = service(tmp_path, publish=failing('no layer'), statistics=statistics)
+    refresh(data)
+    record = data.current('canada')
+    assert record['snapshot'] is None and record['statistics'] == shown
+    assert record['error'] == 'OSError: no layer'
+
+
+def rendered_pages(data):
+    # Drains the pre-render queue in this thread, as the service's second thread does
+    while data._unrendered:
+        data._render(data._unrendered.pop(0))
+
+
+def test_pages_are_pre_rendered_only_after_a_publish(tmp_path):
+    rendered = []
+
+    def prerender(name, snapshot):
+        rendered.append(snapshot)
+        raise OSError('no space left')
+    data = service(tmp_path, prerender=prerender)
+    refresh(data)
+    # Queued by the refresh, not rendered on its thread
+    assert rendered == [] and data._unrendered == ['canada']
+    rendered_pages(data)
+    assert rendered == [tmp_path / 'snapshot.parquet']
+    assert data.current('canada')['artifacts'] is None
+    # The refresh fails, the snapshot it kept is not rendered again
+    data._publish = failing('no layer')
+    refresh(data)
+    assert data._unrendered == []
+    data._publish = published
+    refresh(data)
+    rendered_pages(data)
+    assert len(rendered) == 2
+
+
+def test_queued_refreshes_do_not_wait_for_a_pre_render(tmp_path):
+    rendering, release = threading.Event(), threading.Event()
+
+    def prerender(name, snapshot):
+        rendering.set()
+        release.wait(10)
+        return {'pages': name}
+    data = DataService(names=['canada', 'us'], snapshot_dir=tmp_path, publish=published, statistics=sums,
+                       prerender=prerender).start()
+    try:
+        assert data.request('canada').result(timeout=10)['snapshot'] is not None
+        assert rendering.wait(10)
+        # Canada's pages are still rendering, the US publish goes ahead
+        assert data.request('us').result(timeout=10)['snapshot'] is not None
+        assert data.current('canada')['artifacts'] is None
+    finally:
+        release.set()
+    for _ in range(100):
+        if data.current('canada')['artifacts'] and data.current('us')['artifacts']:
+            break
+        time.sleep(0.05)
+    assert data.current('canada')['artifacts'] == {'pages': 'canada'}
+    assert data.current('us')['artifacts'] == {'pages': 'us'}
+
+
+def test_a_render_does_not_replace_a_newer_record(tmp_path):
+    data = service(tmp_path, prerender=lambda name, snapshot: {'pages': snapshot})
+    refresh(data)
+    rendered = data._prerender
+
+    def prerender(name, snapshot):
+        # A refresh publishes while the pages of the one before are rendered
+        refresh(data)
+        return rendered(name, snapshot)
+    data._prerender = prerender
+    data._render(data._unrendered.pop(0))
+    assert data.current('canada')['artifacts'] is None and data._unrendered == ['canada']
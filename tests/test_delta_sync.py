@@ -0,0 +1,95 @@
+# Incremental sync against the local stand-in layer: run from the repository root with python -m pytest
+import pandas as pd
+import pytest
+
+from benchmarks.fake_layer import FakeLayer
+from dashboard import delta_sync
+
+
+def fires(rows, **extra):
+    # rows are (OBJECTID, hectares, edit date)
+    ids, hectares, edited = zip(*rows)
+    return pd.DataFrame({'OBJECTID': ids, 'Agency': 'bc', 'Hectares__Ha_': hectares,
+                         'EditDate': pd.to_datetime(edited), **extra, 'x': -120.5, 'y': 50.5})
+
+
+def areas(sdf):
+    return sdf.set_index('OBJECTID')['Hectares__Ha_'].sort_index().to_dict()
+
+
+@pytest.fixture(autouse=True)
+def sync_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(delta_sync, 'SYNC_DIR', tmp_path)
+
+
+@pytest.fixture
+def layer():
+    with FakeLayer(fires([(1, 1.0, '2024-06-01 10:00'), (2, 2.0, '2024-06-01 10:00'), (3, 3.0, '2024-06-01 11:00')]),
+                   latency=0, max_record_count=2, edit_field='EditDate') as layer:
+        yield layer
+
+
+def id_wheres(layer):
+    return [query['where'] for query in layer.queries if query.get('returnIdsOnly') == 'true']
+
+
+def test_first_sync_downloads_the_layer(layer):
+    sdf, changes = delta_sync.sync_layer(layer.feature_layer, 'fires')
+    assert areas(sdf) == {1: 1.0, 2: 2.0, 3: 3.0}
+    assert changes == {'version': 1, 'base': None, 'ids': None}
+    assert id_wheres(layer) == ['1=1']
+
+
+def test_inserts_updates_and_deletes_are_merged(layer):
+    delta_sync.sync_layer(layer.feature_layer, 'fires')
+    # 2 grows, 3 is deleted, 4 is new
+    layer.set_frame(fires([(1, 1.0, '2024-06-01 10:00'), (2, 20.0, '2024-06-02 08:00'), (4, 4.0, '2024-06-02 09:00')]))
+    sdf, changes = delta_sync.sync_layer(layer.feature_layer, 'fires')
+    assert areas(sdf) == {1: 1.0, 2: 20.0, 4: 4.0}
+    assert changes['version'] == 2 and changes['base'] == 1
+    assert sorted(changes['ids']) == [2, 3, 4]
+    # The merged copy is what a full download returns
+    full, _ = delta_sync.full_query(layer.feature_layer, 'EditDate')
+    pd.testing.assert_frame_equal(sdf.sort_values('OBJECTID', ignore_index=True)[full.columns],
+                                  full.sort_values('OBJECTID', ignore_index=True))
+
+
+def test_changes_are_queried_from_the_watermark(layer):
+    delta_sync.sync_layer(layer.feature_layer, 'fires')
+    # Edited in the same second as the latest edit already synced, kept by the >=
+    layer.set_frame(fires([(1, 1.0, '2024-06-01 10:00'), (2, 2.0, '2024-06-01 10:00'), (3, 30.0, '2024-06-01 11:00')]))
+    sdf, changes = delta_sync.sync_layer(layer.feature_layer, 'fires')
+    assert areas(sdf) == {1: 1.0, 2: 2.0, 3: 30.0}
+    assert list(changes['ids']) == [3]
+    delta_sync.sync_layer(layer.feature_layer, 'fires')
+    assert id_wheres(layer) == ['1=1', "EditDate >= timestamp '2024-06-01 11:00:00'", '1=1',
+                                "EditDate >= timestamp '2024-06-01 11:00:00'", '1=1']
+
+
+def test_requested_fields_include_id_and_edit_date(layer):
+    sdf, _ = delta_sync.sync_layer(layer.feature_layer, 'fires', ['Hectares__Ha_'])
+    assert set(sdf.columns) == {'Hectares__Ha_', 'OBJECTID', 'EditDate', 'x', 'y'}
+    out_fields = {query['outFields'] for query in layer.queries if 'outFields' in query}
+    assert out_fields == {'Hectares__Ha_,OBJECTID,EditDate'}
+
+
+# The server adds a field, or drops one
+@pytest.mark.parametrize('before, after', [({}, {'Cause': 'human'}), ({'Cause': 'human'}, {})])
+def test_a_changed_schema_is_synced_in_full(layer, before, after):
+    layer.set_frame(fires([(1, 1.0, '2024-06-01 10:00'), (2, 2.0, '2024-06-01 10:00')], **before))
+    delta_sync.sync_layer(layer.feature_layer, 'fires')
+    layer.set_frame(fires([(1, 1.0, '2024-06-01 10:00'), (2, 5.0, '2024-06-02 10:00')], **after))
+    sdf, changes = delta_sync.sync_layer(layer.feature_layer, 'fires')
+    assert changes['base'] is None
+    assert areas(sdf) == {1: 1.0, 2: 5.0}
+    assert ('Cause' in sdf.columns) == bool(after)
+
+
+def test_layer_without_edit_tracking_is_synced_in_full(layer):
+    layer.edit_field = None
+    delta_sync.sync_layer(layer.feature_layer, 'fires')
+    layer.set_frame(fires([(1, 10.0, '2024-06-01 10:00')]))
+    sdf, changes = delta_sync.sync_layer(layer.feature_layer, 'fires')
+    assert areas(sdf) == {1: 10.0}
+    assert changes['base'] is None
+    assert id_wheres(layer) == ['1=1', '1=1']
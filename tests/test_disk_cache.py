@@ -0,0 +1,81 @@
+# Disk cache entries, expiry and eviction: run from the repository root with python -m pytest
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.disk_cache import MISS, disk_cache, evict, read_entry, write_entry
+
+
+def counted(calls):
+    def func(*args):
+        calls.append(args)
+        return args
+    return func
+
+
+def entries(cache_dir):
+    return sorted(path.name for path in cache_dir.iterdir())
+
+
+def test_entry_is_read_back_and_none_is_cached(tmp_path):
+    calls = []
+    cached = disk_cache(cache_dir=tmp_path)(lambda url: calls.append(url))
+    assert cached('a') is None and cached('a') is None
+    assert calls == ['a']
+    assert read_entry(tmp_path / 'absent.pkl', None, MISS) is MISS
+
+
+def test_expired_entry_is_recomputed(tmp_path):
+    calls = []
+    cached = disk_cache(ttl=60, cache_dir=tmp_path)(counted(calls))
+    cached('a')
+    [path] = tmp_path.glob('*.pkl')
+    # Written two minutes ago
+    written = time.time() - 120
+    os.utime(path, (written, written))
+    assert cached('a') == ('a',)
+    assert len(calls) == 2
+    assert path.stat().st_mtime > written
+
+
+def test_least_recently_read_entries_are_evicted(tmp_path):
+    now = time.time()
+    for age, name in [(30, 'a'), (20, 'b'), (10, 'c')]:
+        path = tmp_path / f'{name}.pkl'
+        write_entry(path, name * 100)
+        os.utime(path, (now - age, now - 60))
+    # Reading the oldest entry makes it the most recent
+    assert read_entry(tmp_path / 'a.pkl', None) == 'a' * 100
+    evict(tmp_path, 2 * (tmp_path / 'a.pkl').stat().st_size)
+    assert entries(tmp_path) == ['a.pkl', 'c.pkl']
+
+
+def test_failed_write_keeps_the_entry_it_would_replace(tmp_path):
+    path = tmp_path / 'entry.pkl'
+    write_entry(path, 'first')
+    with pytest.raises(Exception):
+        # Lambdas do not pickle
+        write_entry(path, lambda: None)
+    assert read_entry(path, None) == 'first'
+    assert entries(tmp_path) == ['entry.pkl']
+
+
+def test_unreadable_entry_is_a_miss_and_dropped(tmp_path):
+    calls = []
+    cached = disk_cache(cache_dir=tmp_path)(counted(calls))
+    cached('a')
+    [path] = tmp_path.glob('*.pkl')
+    path.write_bytes(b'truncated')
+    assert cached('a') == ('a',)
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize('arg', [pd.DataFrame({'a': range(1000)}), np.arange(1000), ['a'], ('a', np.arange(3))])
+def test_arguments_without_a_whole_repr_are_rejected(tmp_path, arg):
+    cached = disk_cache(cache_dir=tmp_path)(counted([]))
+    with pytest.raises(TypeError):
+        cached(arg)
+    cached('a', 1, 2.5, None, ('b', 3))
@@ -0,0 +1,78 @@
+# Paged fetch engine against the local fake layer: run from the repository root with python -m pytest
+from types import SimpleNamespace
+from urllib.error import HTTPError
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.fake_layer import FakeLayer
+from dashboard import fetch
+
+
+def fires(n, seed=0):
+    # Ids out of order and with gaps, as a layer with deletes has them
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'OBJECTID': rng.choice(np.arange(1, 10 * n), n, replace=False),
+        'Agency': rng.choice(['bc', 'ab', 'on'], n),
+        'Hectares__Ha_': rng.random(n) * 100,
+        'Start_Date': pd.Timestamp('2024-06-01') + pd.to_timedelta(rng.integers(0, 30, n), unit='D'),
+        'x': rng.uniform(-130, -60, n),
+        'y': rng.uniform(42, 65, n),
+    })
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Backoff delays post_json waits, without waiting them
+    sleeps = []
+    monkeypatch.setattr(fetch, 'time', SimpleNamespace(sleep=sleeps.append))
+    return sleeps
+
+
+def test_pages_are_assembled_in_id_order():
+    frame = fires(103)
+    with FakeLayer(frame, latency=0, max_record_count=10) as layer:
+        sdf = fetch.fetch_layer(layer.url, workers=4)
+        pages = [query for query in layer.queries if 'objectIds' in query]
+    expected = frame.sort_values('OBJECTID', ignore_index=True)
+    assert len(pages) == 11
+    assert sdf['OBJECTID'].tolist() == expected['OBJECTID'].tolist()
+    pd.testing.assert_frame_equal(sdf[['Agency', 'Hectares__Ha_', 'Start_Date']],
+                                  expected[['Agency', 'Hectares__Ha_', 'Start_Date']], check_dtype=False)
+    # Coordinates to the requested precision
+    assert np.abs(sdf['x'] - expected['x']).max() <= 10 ** -fetch.GEOMETRY_PRECISION
+
+
+def test_failed_page_is_retried_with_backoff(sleeps):
+    with FakeLayer(fires(30), latency=0, max_record_count=10) as layer:
+        layer.failing_pages = 2
+        sdf = fetch.fetch_layer(layer.url, workers=1)
+    assert len(sdf) == 30 and sdf['OBJECTID'].is_unique
+    assert layer.failed_pages == 2
+    assert sleeps == [0.5, 1.0]
+
+
+def test_page_failing_every_attempt_raises(sleeps):
+    with FakeLayer(fires(5), latency=0) as layer:
+        layer.failing_pages = 100
+        with pytest.raises(HTTPError):
+            fetch.fetch_layer(layer.url)
+    assert layer.failed_pages == fetch.RETRIES + 1
+    assert sleeps == [0.5, 1.0, 2.0]
+
+
+def test_query_error_in_the_body_is_retried(sleeps):
+    with FakeLayer(fires(5), latency=0) as layer:
+        with pytest.raises(OSError, match='invalid where clause'):
+            fetch.query_ids(layer.url, where='Start_Date > yesterday')
+    assert len(sleeps) == fetch.RETRIES
+
+
+def test_empty_layer_keeps_its_schema():
+    with FakeLayer(fires(5).iloc[:0], latency=0) as layer:
+        sdf = fetch.fetch_layer(layer.url, out_fields=['Agency', 'Start_Date'])
+    assert sdf.empty
+    assert list(sdf.columns) == ['Agency', 'Start_Date', 'x', 'y']
+    assert pd.api.types.is_datetime64_any_dtype(sdf['Start_Date'])
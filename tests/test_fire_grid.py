@@ -0,0 +1,93 @@
+# Incremental fire grid updates against grids built from scratch: run from the repository root with
+# python -m pytest
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard import pipeline
+from dashboard.fire_grid import CELL_OFFSET, CELL_ZOOMS, UPDATE_SHARE, build_grid, tile_xy, update_grid
+from dashboard.pipeline import snapshot_grid, write_snapshot
+
+AREA = 'Hectares__Ha_'
+
+
+def fires(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'OBJECTID': np.arange(1, n + 1),
+        # Dense enough that cells hold several fires, so updates add to and take from shared cells
+        'x': rng.uniform(-125, -115, n).astype('float32'),
+        'y': rng.uniform(48, 55, n).astype('float32'),
+        AREA: (rng.random(n) * 100).astype('float32'),
+    })
+
+
+def inserted(old):
+    new = fires(30, seed=1).assign(OBJECTID=lambda df: df['OBJECTID'] + len(old))
+    return pd.concat([old, new], ignore_index=True)
+
+
+def moved(old):
+    # Far enough to leave the cell at every zoom
+    new = old.copy()
+    new.loc[:29, 'x'] += np.float32(3)
+    return new
+
+
+def deleted(old):
+    return old.iloc[30:].reset_index(drop=True)
+
+
+def grown(old):
+    new = old.copy()
+    new.loc[:29, AREA] *= np.float32(2)
+    return new
+
+
+def emptied(old):
+    # Every fire in the first fire's finest cell goes, so the cell must go too
+    tx, ty = tile_xy(old['x'], old['y'], CELL_ZOOMS[-1] + CELL_OFFSET)
+    return old[(tx != tx[0]) | (ty != ty[0])].reset_index(drop=True)
+
+
+def every_change(old):
+    return grown(moved(deleted(inserted(old))))
+
+
+def assert_same_cells(actual, expected):
+    key = ['zoom', 'tx', 'ty']
+    actual = actual.sort_values(key, ignore_index=True)
+    expected = expected.sort_values(key, ignore_index=True)
+    pd.testing.assert_frame_equal(actual[[*key, 'fires']], expected[[*key, 'fires']], check_dtype=False)
+    for column in ['area', 'sum_x', 'sum_y']:
+        np.testing.assert_allclose(actual[column], expected[column], rtol=1e-9, atol=1e-6)
+
+
+def changed_rows(old, new):
+    # Old and new rows of every fire added, deleted or changed, as snapshot_grid picks them
+    merged = old.merge(new, on='OBJECTID', how='outer', suffixes=('_old', '_new'), indicator=True)
+    columns = ['x', 'y', AREA]
+    same = merged['_merge'].eq('both') & np.all([merged[f'{c}_old'] == merged[f'{c}_new'] for c in columns], axis=0)
+    ids = merged.loc[~same, 'OBJECTID']
+    return ids, old[old['OBJECTID'].isin(ids)], new[new['OBJECTID'].isin(ids)]
+
+
+@pytest.mark.parametrize('change', [inserted, moved, deleted, grown, emptied, every_change])
+def test_updated_grid_matches_a_rebuild(change):
+    old = fires()
+    new = change(old)
+    _, removed, added = changed_rows(old, new)
+    assert len(removed) or len(added)
+    assert_same_cells(update_grid(build_grid(old, AREA), removed, added, AREA), build_grid(new, AREA))
+
+
+def test_published_grid_matches_a_rebuild(tmp_path, monkeypatch):
+    old = fires()
+    write_snapshot(old, 'canada', tmp_path, grid=build_grid(old, AREA), sync_version=1)
+    new = every_change(old)
+    ids, _, _ = changed_rows(old, new)
+    # Under the share that is updated in place, which must not fall back to a rebuild
+    assert len(ids) <= len(new) * UPDATE_SHARE
+    monkeypatch.setattr(pipeline, 'build_grid', None)
+    grid = snapshot_grid('canada', new, {'version': 2, 'base': 1, 'ids': ids.to_numpy()}, AREA, tmp_path)
+    assert_same_cells(grid, build_grid(new, AREA))
@@ -0,0 +1,141 @@
+# Fire history deltas and rollups against the snapshots they were appended from: run from the repository root
+# with python -m pytest
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard import history
+from dashboard.pipeline import SOURCES
+
+SOURCE = SOURCES['canada']
+REGION, STATUS, AREA = SOURCE['region_col'], SOURCE['status_col'], SOURCE['area_col']
+# Two snapshots on the last day, its later one stands for the day
+OBSERVED = ['2025-07-01 12:00', '2025-07-02 12:00', '2025-07-03 08:00', '2025-07-03 20:00']
+
+
+def first_snapshot(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'OBJECTID': np.arange(1, n + 1),
+        REGION: rng.choice(['BC', 'AB', 'ON'], n),
+        STATUS: rng.choice(['Being Held', 'Out of Control', 'Under Control'], n),
+        AREA: (rng.random(n) * 100).astype('float32'),
+        'Start_Date': rng.choice(['2025-06-29', '2025-06-30', '2025-07-01'], n),
+    })
+
+
+def next_snapshot(fires, day, grown, controlled, deleted, added):
+    # Changes of one snapshot: ids grown, ids brought under control, ids deleted and the number of new fires
+    fires = fires.copy()
+    fires.loc[fires['OBJECTID'].isin(grown), AREA] *= np.float32(2)
+    fires.loc[fires['OBJECTID'].isin(controlled), STATUS] = 'Under Control'
+    fires = fires[~fires['OBJECTID'].isin(deleted)]
+    first_id = fires['OBJECTID'].max() + 1
+    new = first_snapshot(added, seed=first_id).assign(OBJECTID=np.arange(first_id, first_id + added),
+                                                       Start_Date=day)
+    return pd.concat([fires, new], ignore_index=True)
+
+
+@pytest.fixture
+def snapshots():
+    first = first_snapshot()
+    first.loc[first['OBJECTID'].isin([4, 5]), STATUS] = 'Out of Control'
+    second = next_snapshot(first, '2025-07-02', grown=[1, 2, 3], controlled=[4, 5], deleted=[6, 7], added=4)
+    third = next_snapshot(second, '2025-07-03', grown=[1, 8], controlled=[], deleted=[9, 61], added=2)
+    # Grown once more later the same day, and nothing else
+    fourth = next_snapshot(third, '2025-07-03', grown=[10], controlled=[], deleted=[], added=0)
+    return [first, second, third, fourth]
+
+
+@pytest.fixture
+def appended(snapshots, tmp_path):
+    return [history.append_snapshot('canada', fires, SOURCE, observed, tmp_path)
+            for fires, observed in zip(snapshots, OBSERVED)]
+
+
+def direct_totals(fires):
+    return (fires.groupby([REGION, STATUS], as_index=False)
+            .agg(fires=('OBJECTID', 'size'), area=(AREA, 'sum'))
+            .rename(columns={REGION: 'region', STATUS: 'status'}))
+
+
+def assert_same_totals(actual, expected):
+    key = ['region', 'status']
+    actual = actual.sort_values(key, ignore_index=True)
+    expected = expected.sort_values(key, ignore_index=True)
+    pd.testing.assert_frame_equal(actual[[*key, 'fires']], expected[[*key, 'fires']], check_dtype=False)
+    np.testing.assert_allclose(actual['area'], expected['area'], rtol=1e-6)
+
+
+def by_id(frame):
+    return frame.sort_values('OBJECTID', ignore_index=True)
+
+
+def test_only_changed_rows_are_appended(appended, tmp_path):
+    # Every fire, then 3 grown + 2 controlled + 2 deleted + 4 new, 2 grown + 2 deleted + 2 new, 1 grown
+    assert appended == [60, 11, 6, 1]
+    deltas = sorted((tmp_path / 'canada' / 'deltas').glob('date=*/*.parquet'))
+    assert [len(history.read_table(path)) for path in deltas] == appended
+    size = history.history_bytes('canada', tmp_path)
+    # An unchanged snapshot appends nothing
+    last = history.read_table(tmp_path / 'canada' / 'state.parquet')
+    assert history.append_snapshot('canada', last.rename(columns={'region': REGION, 'status': STATUS, 'area': AREA,
+                                                                  'start': 'Start_Date'}),
+                                   SOURCE, '2025-07-03 21:00', tmp_path) == 0
+    assert history.history_bytes('canada', tmp_path) == size
+
+
+def test_appends_at_the_same_time_keep_their_own_deltas(snapshots, tmp_path):
+    for fires in snapshots:
+        history.append_snapshot('canada', fires, SOURCE, OBSERVED[0], tmp_path)
+    assert len(list((tmp_path / 'canada' / 'deltas').glob('date=*/*.parquet'))) == len(snapshots)
+    state = history.rebuild('canada', tmp_path)
+    pd.testing.assert_frame_equal(by_id(state), by_id(history.history_frame(snapshots[-1], SOURCE)),
+                                  check_dtype=False)
+
+
+def test_deleted_fires_are_flagged_in_the_deltas(appended, tmp_path):
+    deltas = pd.concat(history.read_table(path)
+                       for path in sorted((tmp_path / 'canada' / 'deltas').glob('date=*/*.parquet')))
+    assert sorted(deltas.loc[deltas['deleted'], 'OBJECTID']) == [6, 7, 9, 61]
+
+
+def test_replayed_deltas_rebuild_the_state_and_rollups(snapshots, appended, tmp_path):
+    folder = tmp_path / 'canada'
+    names = ['state.parquet', 'daily.parquet', 'started.parquet']
+    live = {name: history.read_table(folder / name) for name in names}
+    for path in live:
+        (folder / path).unlink()
+    state = history.rebuild('canada', tmp_path)
+    # Strings read back from parquet are str, those replayed in memory object
+    pd.testing.assert_frame_equal(by_id(state), by_id(live['state.parquet']), check_dtype=False)
+    pd.testing.assert_frame_equal(by_id(state), by_id(history.history_frame(snapshots[-1], SOURCE)),
+                                  check_dtype=False)
+    for path in ['daily.parquet', 'started.parquet']:
+        key = ['day', 'region', 'status'] if path == 'daily.parquet' else ['start', 'region', 'status']
+        pd.testing.assert_frame_equal(history.read_table(folder / path).sort_values(key, ignore_index=True),
+                                      live[path].sort_values(key, ignore_index=True), check_like=True,
+                                      check_dtype=False)
+
+
+@pytest.mark.parametrize('days, end, days_shown', [(1, '2025-07-03', ['2025-07-03']),
+                                                   (2, '2025-07-03', ['2025-07-02', '2025-07-03']),
+                                                   (3, '2025-07-02', ['2025-07-01', '2025-07-02']),
+                                                   (30, '2025-07-03', ['2025-07-01', '2025-07-02', '2025-07-03'])])
+def test_area_history_is_each_days_last_snapshot(snapshots, appended, tmp_path, days, end, days_shown):
+    # The day's last snapshot: the first, the second and the fourth
+    last_of_day = {'2025-07-01': snapshots[0], '2025-07-02': snapshots[1], '2025-07-03': snapshots[3]}
+    daily = history.area_history('canada', days, end, tmp_path)
+    assert sorted(daily['day'].unique()) == days_shown
+    for day in days_shown:
+        assert_same_totals(daily[daily['day'] == day], direct_totals(last_of_day[day]))
+
+
+@pytest.mark.parametrize('days, end, first', [(1, '2025-07-03', '2025-07-03'), (3, '2025-07-03', '2025-07-01'),
+                                              (2, '2025-07-01', '2025-06-30'), (30, '2025-07-03', '2025-06-01')])
+def test_started_areas_are_the_current_fires_started_in_the_window(snapshots, appended, tmp_path, days, end,
+                                                                    first):
+    # Counted from the current snapshot, so fires deleted since the first must have dropped out of the rollup
+    current = snapshots[-1]
+    started = current[current['Start_Date'].between(first, end)]
+    assert_same_totals(history.started_areas('canada', days, end, tmp_path), direct_totals(started))
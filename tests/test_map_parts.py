@@ -0,0 +1,61 @@
+# Map pages composed from their cached parts: run from the repository root with python -m pytest
+import re
+
+import pytest
+
+from benchmarks.synthetic import us_frame
+from dashboard.boundaries import boundary_levels
+from dashboard.boundary_store import read_boundary
+from dashboard.fire_grid import build_grid
+from dashboard.map_parts import compose_map, layer_fragment, tile_base_map
+from dashboard.pages import PAGES, base_part, fire_part, selected_part
+from dashboard.pipeline import SOURCES, transform
+from dashboard.spatial_index import point_index
+from dashboard.viewport import region_catalog
+
+# Folium names every element after its kind and a hex id
+MAP_NAME = re.compile(r'\bmap_[0-9a-f]{32}\b')
+
+
+@pytest.fixture(scope='module')
+def parts(tmp_path_factory):
+    page, source = PAGES['us'], SOURCES['us']
+    boundaries_gdf = read_boundary(source['boundaries'], store_dir=tmp_path_factory.mktemp('boundaries'))
+    levels, catalog = boundary_levels(boundaries_gdf, 'State'), region_catalog(boundaries_gdf, 'State')
+    fires = transform(us_frame(2000, boundaries_gdf=boundaries_gdf), source, boundaries_gdf)
+    fires_idx = point_index(fires['x'], fires['y'], fires['State'])
+    base_html, map_name = base_part(page, levels, catalog, 'OpenStreetMap', 'Texas')
+    fragments = [*fire_part(page, fires, fires_idx, build_grid(fires, page['area_col']), catalog, 'Texas'),
+                 selected_part(page, levels, catalog, 'Texas')]
+    return base_html, map_name, fragments
+
+
+def check_composed(base_html, map_name, fragments):
+    html = compose_map(base_html, map_name, *fragments)
+    end = html.rindex('</html>')
+    # The map variable is declared by folium's script before the first fragment runs
+    declared = html.index(f'var {map_name} = L.map(')
+    for fragment in fragments:
+        call = f'<script>({fragment})({map_name});</script>'
+        assert html.count(call) == 1
+        assert declared < html.index(call) < end
+    # Every map the page names is the one the fragments are called on
+    assert set(MAP_NAME.findall(html)) == {map_name}
+    assert html[end:] == base_html[base_html.rindex('</html>'):]
+
+
+def test_page_parts_compose_onto_their_map(parts):
+    check_composed(*parts)
+
+
+def test_fragments_compose_onto_a_tile_map(parts):
+    base_html, map_name = tile_base_map('OpenStreetMap', 'http://localhost/us/{z}/{x}/{y}.pbf', 'us', 14)
+    fragments = [*parts[2], layer_fragment('L.marker([30, -100])')]
+    check_composed(base_html, map_name, fragments)
+
+
+def test_fragments_name_no_map_of_their_own(parts):
+    # Fragments are functions of the map, so a cached one composes onto any base page
+    for fragment in parts[2]:
+        assert fragment.startswith('function(map)')
+        assert not MAP_NAME.search(fragment)
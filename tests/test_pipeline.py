@@ -0,0 +1,29 @@
+# Snapshot files the pipeline publishes: run from the repository root with python -m pytest
+import time
+
+import pandas as pd
+
+from dashboard.pipeline import latest_snapshot, read_snapshot, write_snapshot
+
+
+def fires(area):
+    return pd.DataFrame({'OBJECTID': [1, 2], 'Hectares__Ha_': [area, area * 2]})
+
+
+def test_publishes_at_the_same_time_keep_their_own_files(tmp_path, monkeypatch):
+    # Every publish sees the same clock, as two processes within one microsecond would
+    monkeypatch.setattr(time, 'time_ns', lambda: 1_717_200_000_123_456_000)
+    paths = [write_snapshot(fires(area), 'canada', tmp_path) for area in [1.0, 2.0, 3.0]]
+    assert len(set(paths)) == 3
+    assert [path.name for path in paths] == sorted(path.name for path in paths)
+    assert paths[0].name == '20240601T000000123456Z.v2.parquet'
+    assert [read_snapshot(path)['Hectares__Ha_'].iloc[0] for path in paths] == [1.0, 2.0, 3.0]
+    assert latest_snapshot('canada', tmp_path) == paths[-1]
+    # Only the snapshots are left, no temp files
+    assert sorted(path.name for path in (tmp_path / 'canada').iterdir()) == sorted(
+        ['latest', *(path.name for path in paths)])
+
+
+def test_old_snapshots_are_pruned_in_publish_order(tmp_path):
+    paths = [write_snapshot(fires(area), 'canada', tmp_path, keep=2) for area in [1.0, 2.0, 3.0]]
+    assert not paths[0].exists() and paths[1].exists() and paths[2].exists()
@@ -0,0 +1,16 @@
+# Modules each app imports before its first element is drawn: run from the repository root with python -m pytest
+import os
+
+import pytest
+
+from benchmarks.startup_benchmark import APPS, FIRST_PAINT_UNWANTED, import_profile
+
+
+@pytest.mark.parametrize('path', list(APPS))
+def test_first_paint_imports_no_heavy_module(path, tmp_path):
+    # A cache of its own, so the run neither reads nor fills the user's
+    _, modules, first_paint, _ = import_profile(path, env={**os.environ, 'DASHBOARD_CACHE_DIR': str(tmp_path)})
+    assert 'streamlit' in first_paint
+    # arcgis included, no GIS() is built before the first element
+    assert not first_paint & set(FIRST_PAINT_UNWANTED)
+    assert not modules & set(APPS[path])
@@ -0,0 +1,77 @@
+# Server-side statistics against the local fake layer: run from the repository root with python -m pytest
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.fake_layer import FakeLayer
+from benchmarks.synthetic import canada_frame, us_frame
+from dashboard.boundary_store import read_boundary
+from dashboard.cube import area_cube
+from dashboard.fetch import fetch_layer, query_statistics
+from dashboard.pages import PAGES
+from dashboard.pipeline import SOURCES, fetch_statistics, transform
+
+FRAMES = {'canada': canada_frame, 'us': us_frame}
+SUMS = [('sum', 'Hectares__Ha_', 'area'), ('count', 'OBJECTID', 'fires')]
+
+
+def groups(n_groups, per_group=3):
+    ids = np.arange(1, n_groups * per_group + 1)
+    return pd.DataFrame({'OBJECTID': ids, 'Agency': [f'a{i // per_group:02d}' for i in ids - 1],
+                         'Hectares__Ha_': ids * 1.5, 'x': -120.0, 'y': 50.0})
+
+
+def expected(frame):
+    sums = frame.groupby('Agency').agg(area=('Hectares__Ha_', 'sum'), fires=('OBJECTID', 'count'))
+    return sums.reset_index()
+
+
+def statistics_queries(layer):
+    return [query for query in layer.queries if 'outStatistics' in query]
+
+
+def test_groups_are_paged():
+    frame = groups(10)
+    with FakeLayer(frame, latency=0, max_record_count=4) as layer:
+        stats = query_statistics(layer.url, ['Agency'], SUMS)
+    pd.testing.assert_frame_equal(stats.sort_values('Agency', ignore_index=True), expected(frame),
+                                  check_dtype=False)
+    assert len(statistics_queries(layer)) == 3
+
+
+def test_paging_stops_when_the_server_repeats_its_first_page():
+    with FakeLayer(groups(10), latency=0, max_record_count=4, statistics_paging=False) as layer:
+        stats = query_statistics(layer.url, ['Agency'], SUMS)
+    # Only the first page, once
+    assert stats['Agency'].tolist() == ['a00', 'a01', 'a02', 'a03']
+    assert len(statistics_queries(layer)) == 2
+
+
+@pytest.mark.parametrize('case', [str.upper, str.lower])
+def test_field_names_in_any_case(case):
+    frame = groups(3)
+    with FakeLayer(frame, latency=0, field_case=case) as layer:
+        stats = query_statistics(layer.url, ['Agency'], SUMS)
+    assert stats.notna().all().all()
+    pd.testing.assert_frame_equal(stats.sort_values('Agency', ignore_index=True), expected(frame),
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize('name', list(FRAMES))
+def test_statistics_cube_matches_the_snapshot_cube(name, tmp_path):
+    # Fires lie inside the region their code names, so the server's sums by code and the snapshot's by
+    # location are the same table
+    source, page = SOURCES[name], PAGES[name]
+    boundaries_gdf = read_boundary(source['boundaries'], store_dir=tmp_path)
+    cube_args = (source['region_col'], source['status_col'], source['area_col'], page['statuses'])
+    with FakeLayer(FRAMES[name](3000, boundaries_gdf=boundaries_gdf), latency=0) as layer:
+        stats_cube = area_cube(fetch_statistics(source, layer.url), *cube_args, count_col='fires')
+        fires = transform(fetch_layer(layer.url, out_fields=[*source['columns'], 'OBJECTID']), source, boundaries_gdf)
+    snapshot_cube = area_cube(fires, *cube_args)
+    assert stats_cube['regions'].keys() == snapshot_cube['regions'].keys()
+    for region, table in snapshot_cube['regions'].items():
+        stats_table = stats_cube['regions'][region]
+        assert stats_table[source['status_col']].tolist() == table[source['status_col']].tolist()
+        assert stats_table['Fires'].tolist() == table['Fires'].tolist()
+        # Snapshot areas are float32
+        np.testing.assert_allclose(stats_table['Area'], table['Area'], rtol=1e-5)
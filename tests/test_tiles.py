@@ -0,0 +1,40 @@
+# Tile endpoint requests for fire snapshots: run from the repository root with python -m pytest
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+
+from dashboard import tiles
+from dashboard.pipeline import SNAPSHOT_FORMAT
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiles, 'SNAPSHOT_DIR', tmp_path)
+    (tmp_path / 'canada').mkdir()
+    return tmp_path / 'canada'
+
+
+@pytest.fixture
+def server():
+    server = tiles.start_tile_server('127.0.0.1', 0)
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+@pytest.mark.parametrize('name', ['latest', f'20240601T000000Z.v{SNAPSHOT_FORMAT}.grid.parquet',
+                                  f'20240601T000000Z.v{SNAPSHOT_FORMAT - 1}.parquet'])
+def test_only_snapshot_files_are_served(snapshot_dir, name):
+    (snapshot_dir / name).write_bytes(b'not a snapshot')
+    assert tiles.tile_request(f'/fires/canada/{name}/0/0/0.pbf') is None
+
+
+def test_unreadable_snapshot_is_a_server_error(snapshot_dir, server):
+    name = f'20240601T000000Z.v{SNAPSHOT_FORMAT}.parquet'
+    (snapshot_dir / name).write_bytes(b'not a snapshot')
+    with pytest.raises(HTTPError) as error:
+        urlopen(f'{server}/fires/canada/{name}/0/0/0.pbf')
+    assert error.value.code == 500
+    with pytest.raises(HTTPError) as error:
+        urlopen(f'{server}/fires/canada/latest/0/0/0.pbf')
+    assert error.value.code == 404
@@ -0,0 +1,34 @@
+# Rerun traces and their files: run from the repository root with python -m pytest
+import json
+
+import pytest
+
+from dashboard import tracing
+
+
+@pytest.mark.parametrize('value, on', [(None, False), ('', False), ('0', False), ('1', True), ('true', True)])
+def test_flag_values(value, on):
+    assert tracing.is_on(value) == on
+
+
+def test_trace_lines_are_rotated_past_the_size_cap(tmp_path):
+    path = tmp_path / 'app.jsonl'
+    for i in range(10):
+        tracing.append_line(path, json.dumps({'run': i}), max_bytes=30)
+    lines = [json.loads(line)['run'] for line in path.read_text().splitlines()]
+    previous = [json.loads(line)['run'] for line in (tmp_path / 'app.jsonl.1').read_text().splitlines()]
+    # The newest runs are kept, in order, and nothing but the file and its one predecessor
+    assert previous + lines == list(range(previous[0], 10))
+    assert path.stat().st_size < 30 + len('{"run": 9}\n')
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['app.jsonl', 'app.jsonl.1']
+
+
+def test_finished_run_is_exported(tmp_path):
+    tracing.start_run('app', enabled=True)
+    tracing.checkpoint('load')
+    tracing.record_html('<html></html>')
+    record = tracing.finish_run(tmp_path)
+    assert [stage['stage'] for stage in record['stages']] == ['load'] and record['html_bytes'] == 13
+    assert json.loads((tmp_path / 'app.jsonl').read_text()) == record
+    assert 'dashboard_html_bytes{app="app"} 13' in (tmp_path / 'app.prom').read_text()
+    assert tracing.current_run() is None